@@ -1,22 +1,41 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request, g
 from flask_cors import CORS
-from flask_jwt_extended import JWTManager, create_access_token, set_access_cookies, unset_jwt_cookies, jwt_required, get_jwt_identity, get_csrf_token, get_jwt
+from flask_jwt_extended import JWTManager, create_access_token, set_access_cookies, unset_jwt_cookies, get_csrf_token
+from flask_jwt_extended.config import config as jwt_config
 from functools import wraps
-from datahandler.sqlite_handler import SQLiteHandler
-from exceptions import NotFoundError, InvalidInputError, DatabaseError
+from datahandler.backend import create_data_handler
+from datahandler.cache import CachedHandler
+from exceptions import NotFoundError, InvalidInputError, DatabaseError, ServiceBusyError, TooManyRequestsError, UnauthorizedError
+from metrics import metrics
+from encoding import JSON_MIMETYPE, negotiate, encode
 from imagekitio import ImageKit
+from imagekit_auth import ImageKitSigner, AuthParamsPool
+from ratelimit import RateLimiter, RedisBucketStore, RouteRateLimits
+from loadshed import LoadShedder
+from auth import VerifiedTokenCache
+from werkzeug.middleware.proxy_fix import ProxyFix
 from dotenv import load_dotenv
+import hashlib
+import hmac
+import json
+import math
 import os
 
 
-app = Flask(__name__)
-CORS(app, supports_credentials=True, origins=["http://localhost:5174", "http://localhost:5173", "https://pawliday-frontend.onrender.com"])
-data_manager = SQLiteHandler('pawliday.db')
+CORS_ORIGINS = ["http://localhost:5174", "http://localhost:5173", "https://pawliday-frontend.onrender.com"]
 
 
 load_dotenv()
 
 
+app = Flask(__name__)
+CORS(app, supports_credentials=True, origins=CORS_ORIGINS)
+# loaded after .env, which holds DATABASE_URL and IMAGEKIT_URL_ENDPOINT for the image variants
+data_manager = CachedHandler(create_data_handler())
+metrics.register_stats('cache', data_manager.stats)
+metrics.register_stats('read_routing', data_manager.router.stats)
+
+
 app.config['JWT_SECRET_KEY'] = os.environ.get('JWT_SECRET_KEY')
 app.config['JWT_ACCESS_LIFESPAN'] = {'hours': 24}
 app.config['JWT_REFRESH_LIFESPAN'] = {'days': 30}
@@ -28,6 +47,12 @@ app.config['JWT_COOKIE_SAMESITE'] = 'None'
 
 
 jwt = JWTManager(app)
+with app.app_context():
+    CSRF_PROTECT = jwt_config.cookie_csrf_protect
+    CSRF_METHODS = set(jwt_config.csrf_request_methods)
+    CSRF_HEADER_NAME = jwt_config.access_csrf_header_name
+token_cache = VerifiedTokenCache()
+metrics.register_stats('jwt_cache', token_cache.stats)
 
 
 imagekit = ImageKit(
@@ -35,6 +60,158 @@ imagekit = ImageKit(
     private_key=os.environ.get('IMAGEKIT_PRIVATE_KEY'),
     url_endpoint=os.environ.get('IMAGEKIT_URL_ENDPOINT')
 )
+auth_params_pool = AuthParamsPool(ImageKitSigner(imagekit))
+metrics.register_stats('auth_params', auth_params_pool.stats)
+
+
+# buckets are per process unless RATE_LIMIT_REDIS_URL shares them between workers
+bucket_store = RedisBucketStore(os.environ['RATE_LIMIT_REDIS_URL']) if os.environ.get('RATE_LIMIT_REDIS_URL') else None
+
+
+def rate_limiter(name, rate, burst):
+    """
+    A limiter configured by <NAME>_RATE and <NAME>_BURST, reported on
+    /api/metrics as pawliday_<name>_rate_limit_*.
+    """
+    limiter = RateLimiter(
+        rate=float(os.environ.get(f'{name.upper()}_RATE', rate)),
+        burst=int(os.environ.get(f'{name.upper()}_BURST', burst)),
+        store=bucket_store,
+        name=name
+    )
+    metrics.register_stats(f'{name}_rate_limit', limiter.stats)
+    return limiter
+
+
+auth_params_limiter = rate_limiter('auth_params', 1, 20)
+rate_limits = RouteRateLimits(
+    {
+        '/api/auth-params': [('ip', auth_params_limiter)],
+        # every attempt costs a bcrypt hash
+        '/api/login': [('ip', rate_limiter('login', 0.2, 10))],
+        '/api/registration': [('ip', rate_limiter('registration', 0.05, 5))],
+        '/api/logout': [],
+        '/api/wakeup': [],
+        '/api/metrics': [],
+    },
+    default=[('sitter', rate_limiter('sitter', 20, 100))]
+)
+load_shedder = LoadShedder()
+metrics.register_stats('load_shedding', load_shedder.stats)
+# health checks and scrapes are answered even while shedding
+LOAD_SHED_EXEMPT_ROUTES = {'/api/wakeup', '/api/metrics'}
+
+
+# behind a reverse proxy remote_addr is the proxy; trust that many X-Forwarded-For hops instead
+TRUSTED_PROXY_HOPS = int(os.environ.get('TRUSTED_PROXY_HOPS', 0))
+if TRUSTED_PROXY_HOPS:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_HOPS)
+
+
+def make_etag(sitter_id, resource, versions, next_after=None, mimetype=JSON_MIMETYPE):
+    digest = hashlib.sha256(f"{resource}:{sitter_id}:{next_after}".encode('utf-8'))
+    if mimetype != JSON_MIMETYPE:
+        digest.update(mimetype.encode('utf-8'))
+    for entity_id, version in versions:
+        digest.update(f":{entity_id}.{version}".encode('utf-8'))
+    return digest.hexdigest()[:32]
+
+
+def not_modified_response(sitter_id, resource, resource_id=None):
+    if not request.if_none_match:
+        return None
+    current = data_manager.get_versions(sitter_id=sitter_id, resource=resource, resource_id=resource_id, query_params=request.args.to_dict())
+    if not current["versions"]:
+        return None
+    etag = make_etag(sitter_id, resource, current["versions"], current["next_after"], negotiate(request.accept_mimetypes))
+    if not request.if_none_match.contains(etag):
+        return None
+    response = Response(status=304)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Accept')
+    return response
+
+
+def cacheable_response(body, sitter_id, resource, versions, next_after=None):
+    mimetype = negotiate(request.accept_mimetypes)
+    response = Response(encode(body, mimetype), mimetype=mimetype)
+    response.set_etag(make_etag(sitter_id, resource, versions, next_after, mimetype))
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Accept')
+    return response
+
+
+@app.before_request
+def start_request_metrics():
+    g.metrics_token = metrics.start_request()
+
+
+def request_auth():
+    """
+    The AuthContext of the request's access cookie, or None. The token is
+    verified at most once per request, and through token_cache at most once
+    per process. CSRF is left to auth_required.
+    """
+    if 'auth' not in g:
+        g.auth = token_cache.verify(request.cookies.get(app.config['JWT_ACCESS_COOKIE_NAME']))
+    return g.auth
+
+
+def auth_required(endpoint):
+    """
+    jwt_required() for cookie tokens, on top of request_auth: the route
+    reads the sitter as g.auth.sitter_id and answers 401 without a valid
+    token or, on writes, a matching X-CSRF-TOKEN header.
+    """
+    @wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        auth = request_auth()
+        if auth is None:
+            raise UnauthorizedError("Please Login")
+        if CSRF_PROTECT and request.method in CSRF_METHODS and not auth.csrf_matches(request.headers.get(CSRF_HEADER_NAME)):
+            raise UnauthorizedError("Please Login")
+        return endpoint(*args, **kwargs)
+    return wrapper
+
+
+@app.before_request
+def limit_requests():
+    if request.url_rule is None or request.method == 'OPTIONS':
+        return
+    route = request.url_rule.rule
+    auth = request_auth() if 'sitter' in rate_limits.scopes(route) else None
+    sitter_id = auth.sitter_id if auth is not None else None
+    retry_after = rate_limits.acquire(route, request.remote_addr, sitter_id)
+    if retry_after:
+        raise TooManyRequestsError("Too many requests, please try again later", retry_after)
+    if route not in LOAD_SHED_EXEMPT_ROUTES:
+        if not load_shedder.enter():
+            raise ServiceBusyError("Server is busy, please try again later")
+        g.load_shed_slot = True
+
+
+@app.teardown_request
+def release_load_shed_slot(exception):
+    if g.pop('load_shed_slot', False):
+        load_shedder.leave()
+
+
+@app.after_request
+def record_request_metrics(response):
+    metrics_token = g.pop('metrics_token', None)
+    if metrics_token is not None:
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        metrics.finish_request(metrics_token, route, request.method, response.status_code)
+    return response
+
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    metrics_token = os.environ.get('METRICS_TOKEN')
+    if metrics_token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {metrics_token}'):
+        return jsonify({"error": "Unauthorized"}), 401
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 
 @app.route('/api/wakeup', methods=['GET'])
@@ -44,7 +221,7 @@ def server_wakeup():
 
 @app.route('/api/auth-params', methods=['GET'])
 def get_auth_params():
-    auth_params = imagekit.get_authentication_parameters()
+    auth_params = auth_params_pool.take()
     return jsonify(auth_params)
 
 
@@ -73,31 +250,42 @@ def registration():
     return jsonify({"message": "Registration successfully. Please login."}), 201
     
 
+@app.route('/api/csrf-token', methods=['GET'])
+@auth_required
+def get_csrf_token_for_session():
+    csrf_token = g.auth.csrf
+    response = jsonify({"csrf_token": csrf_token})
+    response.headers['Cache-Control'] = 'no-store'
+    return response, 200
+
+
 @app.route('/api/sitter', methods=['GET'])
-@jwt_required()
+@auth_required
 def get_sitter():
-    sitter_id = get_jwt_identity()
+    sitter_id = g.auth.sitter_id
+    not_modified = not_modified_response(sitter_id, 'sitter')
+    if not_modified is not None:
+        return not_modified
     sitter = data_manager.get_sitter(sitter_id=sitter_id)
-    csrf_token = get_jwt()["csrf"]
-    response = jsonify({"sitter": sitter, "csrf_token": csrf_token})
+    response = cacheable_response({"sitter": sitter}, sitter_id, 'sitter', [(sitter['sitter_id'], sitter['version'])])
     return response, 200
 
 
 @app.route('/api/sitter/update', methods=['PUT'])
-@jwt_required()
+@auth_required
 def update_sitter():
-    sitter_id = get_jwt_identity()
+    sitter_id = g.auth.sitter_id
     updated_data = request.get_json()
     updated_sitter = data_manager.update_sitter(sitter_id=sitter_id, updated_data=updated_data)
-    csrf_token = get_jwt()["csrf"]
+    csrf_token = g.auth.csrf
     response = jsonify({"sitter": updated_sitter, "message": "Sitter profile successfully updated", "csrf_token": csrf_token})
     return response, 200
 
 
 @app.route('/api/sitter/delete', methods=['DELETE'])
-@jwt_required()
+@auth_required
 def delete_sitter():
-    sitter_id = get_jwt_identity()
+    sitter_id = g.auth.sitter_id
     data_manager.delete_sitter(sitter_id=sitter_id)
     response = jsonify({"message": "Sitter profile successfully deleted"})
     unset_jwt_cookies(response)
@@ -105,127 +293,266 @@ def delete_sitter():
 
 
 @app.route('/api/sitter/owners', methods=['GET'])
-@jwt_required()
+@auth_required
 def get_all_owners():
-    sitter_id = get_jwt_identity()
-    owners = data_manager.get_all_owners(sitter_id=sitter_id)
-    csrf_token = get_jwt()["csrf"]
-    response = jsonify({"owners": owners, "csrf_token": csrf_token})
+    sitter_id = g.auth.sitter_id
+    not_modified = not_modified_response(sitter_id, 'owners')
+    if not_modified is not None:
+        return not_modified
+    owners_page = data_manager.get_all_owners(sitter_id=sitter_id, query_params=request.args.to_dict())
+    versions = [(owner['owner_id'], owner['version']) for owner in owners_page['owners']]
+    response = cacheable_response(owners_page, sitter_id, 'owners', versions, owners_page['next_after'])
     return response, 200
 
 
 @app.route('/api/sitter/owners/<owner_id>', methods=['GET'])
-@jwt_required()
+@auth_required
 def get_owner(owner_id):
-    sitter_id = get_jwt_identity()
+    sitter_id = g.auth.sitter_id
+    not_modified = not_modified_response(sitter_id, 'owner', owner_id)
+    if not_modified is not None:
+        return not_modified
     owner = data_manager.get_owner(sitter_id=sitter_id, owner_id=owner_id)
-    csrf_token = get_jwt()["csrf"]
-    response = jsonify({"owner": owner, "csrf_token": csrf_token})
+    response = cacheable_response({"owner": owner}, sitter_id, 'owner', [(owner['owner_id'], owner['version'])])
     return response, 200
 
 
 @app.route('/api/sitters/owners/add', methods=['GET', 'POST'])
-@jwt_required()
+@auth_required
 def add_owner():
-    sitter_id = get_jwt_identity()
-    csrf_token = get_jwt()["csrf"]
+    sitter_id = g.auth.sitter_id
+    csrf_token = g.auth.csrf
     if request.method == 'POST':
         new_owner_data = request.get_json()
         created_owner = data_manager.add_owner(sitter_id=sitter_id, new_owner_data=new_owner_data)
         response = jsonify({"owner": created_owner, "message": "Owner successfully added", "csrf_token": csrf_token})
         return response, 201
-    owners = data_manager.get_all_owners(sitter_id)
-    response = jsonify({"owners": owners, "csrf_token": csrf_token})
+    owners_page = data_manager.get_all_owners(sitter_id=sitter_id, query_params=request.args.to_dict())
+    response = jsonify({**owners_page, "csrf_token": csrf_token})
     return response, 200
 
 
+@app.route('/api/sitter/owners/bulk', methods=['POST'])
+@auth_required
+def add_owners_bulk():
+    sitter_id = g.auth.sitter_id
+    new_owners_data = request.get_json()
+    result = data_manager.add_owners_bulk(sitter_id=sitter_id, new_owners_data=new_owners_data)
+    csrf_token = g.auth.csrf
+    response = jsonify({**result, "message": f"{len(result['created'])} owners successfully added", "csrf_token": csrf_token})
+    return response, 201 if result["created"] else 400
+
+
 @app.route('/api/sitter/owners/<owner_id>/update', methods=['PUT'])
-@jwt_required()
+@auth_required
 def update_owner(owner_id):
-    sitter_id = get_jwt_identity()
+    sitter_id = g.auth.sitter_id
     updated_data = request.get_json()
     updated_owner = data_manager.update_owner(sitter_id=sitter_id, owner_id=owner_id, updated_data=updated_data)
-    csrf_token = get_jwt()["csrf"]
+    csrf_token = g.auth.csrf
     response = jsonify({"owner": updated_owner, "message": "Owner successfully updated", "csrf_token": csrf_token})
     return response, 200
 
 
 @app.route('/api/sitter/owners/<owner_id>/delete', methods=['DELETE'])
-@jwt_required()
+@auth_required
 def delete_owner(owner_id):
-    sitter_id = get_jwt_identity()
+    sitter_id = g.auth.sitter_id
     data_manager.delete_owner(sitter_id=sitter_id, owner_id=owner_id)
-    csrf_token = get_jwt()["csrf"]
+    csrf_token = g.auth.csrf
     response = jsonify({"message": "Owner and matching dogs successfully deleted", "csrf_token": csrf_token})
     return response, 200
 
 
 @app.route('/api/sitter/dogs', methods=['GET'])
-@jwt_required()
+@auth_required
 def get_all_dogs():
-    sitter_id = get_jwt_identity()
-    dogs = data_manager.get_all_dogs(sitter_id=sitter_id)
-    csrf_token = get_jwt()["csrf"]
-    response = jsonify({"dogs": dogs, "csrf_token": csrf_token})
+    sitter_id = g.auth.sitter_id
+    not_modified = not_modified_response(sitter_id, 'dogs')
+    if not_modified is not None:
+        return not_modified
+    dogs_page = data_manager.get_all_dogs(sitter_id=sitter_id, query_params=request.args.to_dict())
+    versions = [(dog['dog_id'], dog['version']) for dog in dogs_page['dogs']]
+    response = cacheable_response(dogs_page, sitter_id, 'dogs', versions, dogs_page['next_after'])
     return response, 200
 
 
 @app.route('/api/sitter/dogs/<dog_id>', methods=['GET'])
-@jwt_required()
+@auth_required
 def get_dog(dog_id):
-    sitter_id = get_jwt_identity()
-    dog = data_manager.get_dog(sitter_id=sitter_id, dog_id=dog_id)
-    csrf_token = get_jwt()["csrf"]
-    response = jsonify({"dog": dog, "csrf_token": csrf_token})
+    sitter_id = g.auth.sitter_id
+    not_modified = not_modified_response(sitter_id, 'dog', dog_id)
+    if not_modified is not None:
+        return not_modified
+    dog = data_manager.get_dog(sitter_id=sitter_id, dog_id=dog_id, query_params=request.args.to_dict())
+    response = cacheable_response({"dog": dog}, sitter_id, 'dog', [(dog['dog_id'], dog['version'])])
     return response, 200
     
 
 @app.route('/api/sitter/owners/<owner_id>/dogs/add', methods=['GET', 'POST'])
-@jwt_required()
+@auth_required
 def add_dog(owner_id):
-    sitter_id = get_jwt_identity()
-    csrf_token = get_jwt()["csrf"]
+    sitter_id = g.auth.sitter_id
+    csrf_token = g.auth.csrf
     if request.method == 'POST':
         new_dog_data = request.get_json()
         created_dog = data_manager.add_dog(sitter_id=sitter_id, owner_id=owner_id, new_dog_data=new_dog_data)
         response = jsonify({"dog": created_dog, "message": "Dog successfully added", "csrf_token": csrf_token})
         return response, 201
-    owner_dogs = data_manager.get_owner_dogs(owner_id)
+    owner_dogs = data_manager.get_owner_dogs(sitter_id=sitter_id, owner_id=owner_id)
     response = jsonify({"owner_dogs": owner_dogs, "csrf_token": csrf_token})
     return response, 200
 
 
+@app.route('/api/sitter/owners/<owner_id>/dogs/bulk', methods=['POST'])
+@auth_required
+def add_dogs_bulk(owner_id):
+    sitter_id = g.auth.sitter_id
+    new_dogs_data = request.get_json()
+    result = data_manager.add_dogs_bulk(sitter_id=sitter_id, owner_id=owner_id, new_dogs_data=new_dogs_data)
+    csrf_token = g.auth.csrf
+    response = jsonify({**result, "message": f"{len(result['created'])} dogs successfully added", "csrf_token": csrf_token})
+    return response, 201 if result["created"] else 400
+
+
 @app.route('/api/sitter/dogs/<dog_id>/update', methods=['PUT'])
-@jwt_required()
+@auth_required
 def update_dog(dog_id):
-    sitter_id = get_jwt_identity()
+    sitter_id = g.auth.sitter_id
     updated_data = request.get_json()
     updated_dog = data_manager.update_dog(sitter_id=sitter_id, dog_id=dog_id, updated_data=updated_data)
-    csrf_token = get_jwt()["csrf"]
+    csrf_token = g.auth.csrf
     response = jsonify({"dog": updated_dog, "message": "Dog successfully updated", "csrf_token": csrf_token})
     return response, 200
 
 
 @app.route('/api/sitter/dogs/<dog_id>/delete', methods=['DELETE'])
-@jwt_required()
+@auth_required
 def delete_dog(dog_id):
-    sitter_id = get_jwt_identity()
+    sitter_id = g.auth.sitter_id
     data_manager.delete_dog(sitter_id=sitter_id, dog_id=dog_id)
-    csrf_token = get_jwt()["csrf"]
+    csrf_token = g.auth.csrf
     response = jsonify({"message": "Dog successfully deleted", "csrf_token": csrf_token})
     return response, 200
 
 
 @app.route('/api/sitter/owners/<owner_id>/dogs', methods=['GET'])
-@jwt_required()
+@auth_required
 def get_owner_dogs(owner_id):
-    sitter_id = get_jwt_identity()
-    owner_dogs = data_manager.get_owner_dogs(sitter_id=sitter_id, owner_id=owner_id)
-    csrf_token = get_jwt()["csrf"]
-    response = jsonify({"owner_dogs": owner_dogs, "csrf_token": csrf_token})
+    sitter_id = g.auth.sitter_id
+    not_modified = not_modified_response(sitter_id, 'owner_dogs', owner_id)
+    if not_modified is not None:
+        return not_modified
+    owner_dogs = data_manager.get_owner_dogs(sitter_id=sitter_id, owner_id=owner_id, query_params=request.args.to_dict())
+    response = cacheable_response({"owner_dogs": owner_dogs}, sitter_id, 'owner_dogs', [(dog['dog_id'], dog['version']) for dog in owner_dogs])
     return response, 200
     
 
+@app.route('/api/sitter/search', methods=['GET'])
+@auth_required
+def search():
+    sitter_id = g.auth.sitter_id
+    results = data_manager.search(sitter_id=sitter_id, query_params=request.args.to_dict())
+    return jsonify(results), 200
+
+
+@app.route('/api/sitter/skills', methods=['GET'])
+@auth_required
+def get_skill_matrix():
+    sitter_id = g.auth.sitter_id
+    skill_matrix = data_manager.get_skill_matrix(sitter_id=sitter_id)
+    return jsonify(skill_matrix), 200
+
+
+@app.route('/api/sitter/dogs/<dog_id>/skills', methods=['GET'])
+@auth_required
+def get_dog_skills(dog_id):
+    sitter_id = g.auth.sitter_id
+    dog_skills = data_manager.get_dog_skills(sitter_id=sitter_id, dog_id=dog_id)
+    return jsonify(dog_skills), 200
+
+
+@app.route('/api/sitter/dogs/<dog_id>/skills', methods=['PUT'])
+@auth_required
+def update_dog_skills(dog_id):
+    sitter_id = g.auth.sitter_id
+    skills_data = request.get_json()
+    result = data_manager.update_dog_skills(sitter_id=sitter_id, dog_id=dog_id, skills_data=skills_data)
+    csrf_token = g.auth.csrf
+    response = jsonify({**result, "message": f"{len(result['updated'])} skills successfully updated", "csrf_token": csrf_token})
+    return response, 200 if result["updated"] else 400
+
+
+@app.route('/api/sitter/stays', methods=['GET'])
+@auth_required
+def get_stays():
+    sitter_id = g.auth.sitter_id
+    stays_page = data_manager.get_stays(sitter_id=sitter_id, query_params=request.args.to_dict())
+    return jsonify(stays_page), 200
+
+
+@app.route('/api/sitter/stays/<stay_id>', methods=['GET'])
+@auth_required
+def get_stay(stay_id):
+    sitter_id = g.auth.sitter_id
+    stay = data_manager.get_stay(sitter_id=sitter_id, stay_id=stay_id)
+    return jsonify({"stay": stay}), 200
+
+
+@app.route('/api/sitter/stays/add', methods=['POST'])
+@auth_required
+def add_stay():
+    sitter_id = g.auth.sitter_id
+    new_stay_data = request.get_json()
+    created_stay = data_manager.add_stay(sitter_id=sitter_id, new_stay_data=new_stay_data)
+    csrf_token = g.auth.csrf
+    response = jsonify({"stay": created_stay, "message": "Stay successfully added", "csrf_token": csrf_token})
+    return response, 201
+
+
+@app.route('/api/sitter/stays/<stay_id>/update', methods=['PUT'])
+@auth_required
+def update_stay(stay_id):
+    sitter_id = g.auth.sitter_id
+    updated_data = request.get_json()
+    updated_stay = data_manager.update_stay(sitter_id=sitter_id, stay_id=stay_id, updated_data=updated_data)
+    csrf_token = g.auth.csrf
+    response = jsonify({"stay": updated_stay, "message": "Stay successfully updated", "csrf_token": csrf_token})
+    return response, 200
+
+
+@app.route('/api/sitter/stays/<stay_id>/delete', methods=['DELETE'])
+@auth_required
+def delete_stay(stay_id):
+    sitter_id = g.auth.sitter_id
+    data_manager.delete_stay(sitter_id=sitter_id, stay_id=stay_id)
+    csrf_token = g.auth.csrf
+    response = jsonify({"message": "Stay successfully deleted", "csrf_token": csrf_token})
+    return response, 200
+
+
+@app.route('/api/sitter/availability', methods=['GET'])
+@auth_required
+def get_availability():
+    sitter_id = g.auth.sitter_id
+    availability = data_manager.get_availability(sitter_id=sitter_id, query_params=request.args.to_dict())
+    return jsonify(availability), 200
+
+
+@app.route('/api/sitter/export', methods=['GET'])
+@auth_required
+def export_sitter_data():
+    sitter_id = g.auth.sitter_id
+    records = data_manager.export_sitter_data(sitter_id=sitter_id)
+    lines = (json.dumps({"type": record_type, "data": record}, default=str) + "\n" for record_type, record in records)
+    response = Response(lines, mimetype='application/x-ndjson')
+    # closing `lines` would not reach the records when the body is never sent
+    response.call_on_close(records.close)
+    response.headers['Content-Disposition'] = 'attachment; filename="pawliday-export.ndjson"'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response, 200
+
+
 @app.errorhandler(NotFoundError)
 def handle_not_found(e):
     return jsonify({"error": str(e)}), 404
@@ -241,19 +568,19 @@ def handle_db_error(e):
     return jsonify({"error": str(e)}), 503
 
 
-@jwt.unauthorized_loader
-def handle_missing_token(e):
-    return jsonify({"error": "Please Login"}), 401
+@app.errorhandler(ServiceBusyError)
+def handle_service_busy(e):
+    return jsonify({"error": str(e)}), 503, {"Retry-After": "1"}
 
 
-@jwt.invalid_token_loader
-def handle_invalid_token(e):
-    return jsonify({"error": "Please Login"}), 401
+@app.errorhandler(TooManyRequestsError)
+def handle_too_many_requests(e):
+    return jsonify({"error": str(e)}), 429, {"Retry-After": str(math.ceil(e.retry_after))}
 
 
-@jwt.expired_token_loader
-def handle_expired_token(jwt_header, jwt_payload):
-    return jsonify({"error": "Please Login"}), 401
+@app.errorhandler(UnauthorizedError)
+def handle_unauthorized(e):
+    return jsonify({"error": str(e)}), 401
 
 
 if __name__ == '__main__':
@@ -0,0 +1,425 @@
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route, Mount, Match
+from a2wsgi import WSGIMiddleware
+from flask_jwt_extended import create_access_token, get_csrf_token
+from flask_jwt_extended.config import config as jwt_config
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_etags, parse_accept_header
+from functools import wraps
+from datahandler.async_sqlite_handler import AsyncSQLiteHandler
+from datahandler.sqlite_handler import SQLiteHandler
+from exceptions import NotFoundError, InvalidInputError, DatabaseError, ServiceBusyError, TooManyRequestsError, UnauthorizedError
+from metrics import metrics
+from encoding import negotiate, encode
+from app import app as flask_app, data_manager as flask_data_manager, auth_params_pool, rate_limits, load_shedder, token_cache, make_etag, CORS_ORIGINS, LOAD_SHED_EXEMPT_ROUTES
+import json
+import math
+
+
+# Serves the hot routes natively on the event loop and hands every other
+# route to the Flask app, so both modes expose the same API. Tokens are
+# issued and decoded by flask_jwt_extended with the Flask app's config, so
+# cookies from either mode are accepted by the other. Run with:
+#   uvicorn asgi:app
+if not isinstance(flask_data_manager.handler, SQLiteHandler):
+    raise RuntimeError("asgi.py runs on SQLite only, serve other DATABASE_URL backends with app.py")
+data_manager = AsyncSQLiteHandler(flask_data_manager.db_file_name, password_hasher=flask_data_manager.password_hasher, image_variants=flask_data_manager.image_variants)
+
+
+with flask_app.app_context():
+    ACCESS_COOKIE_NAME = jwt_config.access_cookie_name
+    ACCESS_COOKIE_PATH = jwt_config.access_cookie_path
+    CSRF_COOKIE_NAME = jwt_config.access_csrf_cookie_name
+    CSRF_COOKIE_PATH = jwt_config.access_csrf_cookie_path
+    CSRF_HEADER_NAME = jwt_config.access_csrf_header_name
+    CSRF_METHODS = set(jwt_config.csrf_request_methods)
+    CSRF_PROTECT = jwt_config.cookie_csrf_protect
+    COOKIE_DOMAIN = jwt_config.cookie_domain
+    COOKIE_SECURE = jwt_config.cookie_secure
+    COOKIE_SAMESITE = jwt_config.cookie_samesite.lower() if jwt_config.cookie_samesite else None
+    COOKIE_MAX_AGE = jwt_config.cookie_max_age
+
+
+class RequestMetricsMiddleware:
+    """
+    Records native routes under their Flask rule, e.g. /api/sitter/dogs/<dog_id>,
+    so both modes share labels. Requests handed to the Flask app are recorded
+    by its own request hooks instead.
+    """
+    def __init__(self, app):
+        self.app = app
+
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        metrics_token = metrics.start_request()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            if isinstance(route, Route):
+                metrics.finish_request(metrics_token, flask_rule(route), scope["method"], status)
+            else:
+                metrics.discard_request(metrics_token)
+
+
+def flask_rule(route):
+    return route.path.replace('{', '<').replace('}', '>')
+
+
+def request_auth(request):
+    """
+    The AuthContext of the request's access cookie through app.py's
+    token_cache, verified at most once per request.
+    """
+    if 'pawliday.auth' not in request.scope:
+        access_token = request.cookies.get(ACCESS_COOKIE_NAME)
+        if not access_token:
+            request.scope['pawliday.auth'] = None
+        else:
+            with flask_app.app_context():
+                request.scope['pawliday.auth'] = token_cache.verify(access_token)
+    return request.scope['pawliday.auth']
+
+
+class RateLimitMiddleware:
+    """
+    app.py's per-route rate limits and load shedding for the native routes.
+    They share app.py's LoadShedder, so native and Flask requests queue for
+    the same slots. Requests handed to the Flask app are limited, and load
+    shed, by its own request hooks.
+    """
+    def __init__(self, app):
+        self.app = app
+
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["method"] != "OPTIONS":
+            route = next((route for route in routes if isinstance(route, Route) and route.matches(scope)[0] == Match.FULL), None)
+            if route is not None:
+                rule = flask_rule(route)
+                request = Request(scope)
+                auth = request_auth(request) if 'sitter' in rate_limits.scopes(rule) else None
+                sitter_id = auth.sitter_id if auth is not None else None
+                retry_after = rate_limits.acquire(rule, request.client.host if request.client else None, sitter_id)
+                if retry_after:
+                    # lets RequestMetricsMiddleware record the 429 under its route
+                    scope["route"] = route
+                    response = await handle_too_many_requests(request, TooManyRequestsError("Too many requests, please try again later", retry_after))
+                    return await response(scope, receive, send)
+                if rule not in LOAD_SHED_EXEMPT_ROUTES:
+                    if not await load_shedder.enter_async():
+                        scope["route"] = route
+                        response = await handle_service_busy(request, ServiceBusyError("Server is busy, please try again later"))
+                        return await response(scope, receive, send)
+                    try:
+                        # held until the response, streamed or not, is sent
+                        return await self.app(scope, receive, send)
+                    finally:
+                        load_shedder.leave()
+        await self.app(scope, receive, send)
+
+
+def jwt_required(endpoint):
+    @wraps(endpoint)
+    async def wrapper(request):
+        auth = request_auth(request)
+        if auth is None:
+            raise UnauthorizedError("Please Login")
+        if CSRF_PROTECT and request.method in CSRF_METHODS and not auth.csrf_matches(request.headers.get(CSRF_HEADER_NAME)):
+            raise UnauthorizedError("Please Login")
+        request.state.auth = auth
+        return await endpoint(request)
+    return wrapper
+
+
+async def read_json(request):
+    try:
+        return await request.json()
+    except ValueError:
+        raise InvalidInputError("Invalid input")
+
+
+async def not_modified_response(request, sitter_id, resource, resource_id=None):
+    if_none_match = request.headers.get('if-none-match')
+    if not if_none_match:
+        return None
+    current = await data_manager.get_versions(sitter_id=sitter_id, resource=resource, resource_id=resource_id, query_params=dict(request.query_params))
+    if not current["versions"]:
+        return None
+    etag = make_etag(sitter_id, resource, current["versions"], current["next_after"], response_mimetype(request))
+    if not parse_etags(if_none_match).contains(etag):
+        return None
+    return Response(status_code=304, headers={"ETag": f'"{etag}"', "Cache-Control": "private, no-cache", "Vary": "Accept"})
+
+
+def response_mimetype(request):
+    return negotiate(parse_accept_header(request.headers.get('accept'), MIMEAccept))
+
+
+def ndjson_line(record_type, record):
+    return json.dumps({"type": record_type, "data": record}, default=str) + "\n"
+
+
+def cacheable_response(request, body, sitter_id, resource, versions, next_after=None):
+    mimetype = response_mimetype(request)
+    etag = make_etag(sitter_id, resource, versions, next_after, mimetype)
+    return Response(encode(body, mimetype), media_type=mimetype, headers={"ETag": f'"{etag}"', "Cache-Control": "private, no-cache", "Vary": "Accept"})
+
+
+async def server_wakeup(request):
+    return JSONResponse({"message": "Server awake"})
+
+
+async def get_auth_params(request):
+    auth_params = auth_params_pool.take()
+    return JSONResponse(auth_params)
+
+
+async def login(request):
+    login_data = await read_json(request)
+    sitter = await data_manager.authenticate_sitter(login_data=login_data)
+    with flask_app.app_context():
+        access_token = create_access_token(identity=str(sitter['sitter_id']))
+        csrf_token = get_csrf_token(access_token)
+    response = JSONResponse({"message": "Login successfully", "csrf_token": csrf_token})
+    response.set_cookie(ACCESS_COOKIE_NAME, access_token, max_age=COOKIE_MAX_AGE, path=ACCESS_COOKIE_PATH, domain=COOKIE_DOMAIN, secure=COOKIE_SECURE, httponly=True, samesite=COOKIE_SAMESITE)
+    response.set_cookie(CSRF_COOKIE_NAME, csrf_token, max_age=COOKIE_MAX_AGE, path=CSRF_COOKIE_PATH, domain=COOKIE_DOMAIN, secure=COOKIE_SECURE, httponly=False, samesite=COOKIE_SAMESITE)
+    return response
+
+
+async def logout(request):
+    response = JSONResponse({"message": "Logout successfully"})
+    response.delete_cookie(ACCESS_COOKIE_NAME, path=ACCESS_COOKIE_PATH, domain=COOKIE_DOMAIN, secure=COOKIE_SECURE, httponly=True, samesite=COOKIE_SAMESITE)
+    response.delete_cookie(CSRF_COOKIE_NAME, path=CSRF_COOKIE_PATH, domain=COOKIE_DOMAIN, secure=COOKIE_SECURE, httponly=False, samesite=COOKIE_SAMESITE)
+    return response
+
+
+@jwt_required
+async def get_csrf_token_for_session(request):
+    return JSONResponse({"csrf_token": request.state.auth.csrf}, headers={"Cache-Control": "no-store"})
+
+
+@jwt_required
+async def get_sitter(request):
+    sitter_id = request.state.auth.sitter_id
+    not_modified = await not_modified_response(request, sitter_id, 'sitter')
+    if not_modified is not None:
+        return not_modified
+    sitter = await data_manager.get_sitter(sitter_id=sitter_id)
+    return cacheable_response(request, {"sitter": sitter}, sitter_id, 'sitter', [(sitter['sitter_id'], sitter['version'])])
+
+
+@jwt_required
+async def get_all_owners(request):
+    sitter_id = request.state.auth.sitter_id
+    not_modified = await not_modified_response(request, sitter_id, 'owners')
+    if not_modified is not None:
+        return not_modified
+    owners_page = await data_manager.get_all_owners(sitter_id=sitter_id, query_params=dict(request.query_params))
+    versions = [(owner['owner_id'], owner['version']) for owner in owners_page['owners']]
+    return cacheable_response(request, owners_page, sitter_id, 'owners', versions, owners_page['next_after'])
+
+
+@jwt_required
+async def get_owner(request):
+    sitter_id = request.state.auth.sitter_id
+    owner_id = request.path_params['owner_id']
+    not_modified = await not_modified_response(request, sitter_id, 'owner', owner_id)
+    if not_modified is not None:
+        return not_modified
+    owner = await data_manager.get_owner(sitter_id=sitter_id, owner_id=owner_id)
+    return cacheable_response(request, {"owner": owner}, sitter_id, 'owner', [(owner['owner_id'], owner['version'])])
+
+
+@jwt_required
+async def add_owner(request):
+    sitter_id = request.state.auth.sitter_id
+    csrf_token = request.state.auth.csrf
+    if request.method == 'POST':
+        new_owner_data = await read_json(request)
+        created_owner = await data_manager.add_owner(sitter_id=sitter_id, new_owner_data=new_owner_data)
+        return JSONResponse({"owner": created_owner, "message": "Owner successfully added", "csrf_token": csrf_token}, status_code=201)
+    owners_page = await data_manager.get_all_owners(sitter_id=sitter_id, query_params=dict(request.query_params))
+    return JSONResponse({**owners_page, "csrf_token": csrf_token})
+
+
+@jwt_required
+async def update_owner(request):
+    sitter_id = request.state.auth.sitter_id
+    updated_data = await read_json(request)
+    updated_owner = await data_manager.update_owner(sitter_id=sitter_id, owner_id=request.path_params['owner_id'], updated_data=updated_data)
+    return JSONResponse({"owner": updated_owner, "message": "Owner successfully updated", "csrf_token": request.state.auth.csrf})
+
+
+@jwt_required
+async def delete_owner(request):
+    sitter_id = request.state.auth.sitter_id
+    await data_manager.delete_owner(sitter_id=sitter_id, owner_id=request.path_params['owner_id'])
+    return JSONResponse({"message": "Owner and matching dogs successfully deleted", "csrf_token": request.state.auth.csrf})
+
+
+@jwt_required
+async def get_all_dogs(request):
+    sitter_id = request.state.auth.sitter_id
+    not_modified = await not_modified_response(request, sitter_id, 'dogs')
+    if not_modified is not None:
+        return not_modified
+    dogs_page = await data_manager.get_all_dogs(sitter_id=sitter_id, query_params=dict(request.query_params))
+    versions = [(dog['dog_id'], dog['version']) for dog in dogs_page['dogs']]
+    return cacheable_response(request, dogs_page, sitter_id, 'dogs', versions, dogs_page['next_after'])
+
+
+@jwt_required
+async def get_dog(request):
+    sitter_id = request.state.auth.sitter_id
+    dog_id = request.path_params['dog_id']
+    not_modified = await not_modified_response(request, sitter_id, 'dog', dog_id)
+    if not_modified is not None:
+        return not_modified
+    dog = await data_manager.get_dog(sitter_id=sitter_id, dog_id=dog_id, query_params=dict(request.query_params))
+    return cacheable_response(request, {"dog": dog}, sitter_id, 'dog', [(dog['dog_id'], dog['version'])])
+
+
+@jwt_required
+async def add_dog(request):
+    sitter_id = request.state.auth.sitter_id
+    owner_id = request.path_params['owner_id']
+    csrf_token = request.state.auth.csrf
+    if request.method == 'POST':
+        new_dog_data = await read_json(request)
+        created_dog = await data_manager.add_dog(sitter_id=sitter_id, owner_id=owner_id, new_dog_data=new_dog_data)
+        return JSONResponse({"dog": created_dog, "message": "Dog successfully added", "csrf_token": csrf_token}, status_code=201)
+    owner_dogs = await data_manager.get_owner_dogs(sitter_id=sitter_id, owner_id=owner_id)
+    return JSONResponse({"owner_dogs": owner_dogs, "csrf_token": csrf_token})
+
+
+@jwt_required
+async def update_dog(request):
+    sitter_id = request.state.auth.sitter_id
+    updated_data = await read_json(request)
+    updated_dog = await data_manager.update_dog(sitter_id=sitter_id, dog_id=request.path_params['dog_id'], updated_data=updated_data)
+    return JSONResponse({"dog": updated_dog, "message": "Dog successfully updated", "csrf_token": request.state.auth.csrf})
+
+
+@jwt_required
+async def delete_dog(request):
+    sitter_id = request.state.auth.sitter_id
+    await data_manager.delete_dog(sitter_id=sitter_id, dog_id=request.path_params['dog_id'])
+    return JSONResponse({"message": "Dog successfully deleted", "csrf_token": request.state.auth.csrf})
+
+
+@jwt_required
+async def get_owner_dogs(request):
+    sitter_id = request.state.auth.sitter_id
+    owner_id = request.path_params['owner_id']
+    not_modified = await not_modified_response(request, sitter_id, 'owner_dogs', owner_id)
+    if not_modified is not None:
+        return not_modified
+    owner_dogs = await data_manager.get_owner_dogs(sitter_id=sitter_id, owner_id=owner_id, query_params=dict(request.query_params))
+    return cacheable_response(request, {"owner_dogs": owner_dogs}, sitter_id, 'owner_dogs', [(dog['dog_id'], dog['version']) for dog in owner_dogs])
+
+
+@jwt_required
+async def get_availability(request):
+    sitter_id = request.state.auth.sitter_id
+    availability = await data_manager.get_availability(sitter_id=sitter_id, query_params=dict(request.query_params))
+    return JSONResponse(availability)
+
+
+@jwt_required
+async def export_sitter_data(request):
+    sitter_id = request.state.auth.sitter_id
+    records = data_manager.export_sitter_data(sitter_id=sitter_id)
+    # pull the sitter record first so a missing sitter still answers 404
+    first_record = await anext(records)
+
+    async def lines():
+        yield ndjson_line(*first_record)
+        async for record_type, record in records:
+            yield ndjson_line(record_type, record)
+
+    headers = {"Content-Disposition": 'attachment; filename="pawliday-export.ndjson"', "X-Accel-Buffering": "no"}
+    return StreamingResponse(lines(), media_type='application/x-ndjson', headers=headers)
+
+
+async def handle_not_found(request, e):
+    return JSONResponse({"error": str(e)}, status_code=404)
+
+
+async def handle_invalid_input(request, e):
+    return JSONResponse({"error": str(e)}, status_code=400)
+
+
+async def handle_db_error(request, e):
+    return JSONResponse({"error": str(e)}, status_code=503)
+
+
+async def handle_service_busy(request, e):
+    return JSONResponse({"error": str(e)}, status_code=503, headers={"Retry-After": "1"})
+
+
+async def handle_too_many_requests(request, e):
+    return JSONResponse({"error": str(e)}, status_code=429, headers={"Retry-After": str(math.ceil(e.retry_after))})
+
+
+async def handle_unauthorized(request, e):
+    return JSONResponse({"error": str(e)}, status_code=401)
+
+
+routes = [
+    Route('/api/wakeup', server_wakeup, methods=['GET']),
+    Route('/api/auth-params', get_auth_params, methods=['GET']),
+    Route('/api/login', login, methods=['POST']),
+    Route('/api/logout', logout, methods=['POST']),
+    Route('/api/csrf-token', get_csrf_token_for_session, methods=['GET']),
+    Route('/api/sitter', get_sitter, methods=['GET']),
+    Route('/api/sitter/owners', get_all_owners, methods=['GET']),
+    Route('/api/sitter/owners/{owner_id}', get_owner, methods=['GET']),
+    Route('/api/sitters/owners/add', add_owner, methods=['GET', 'POST']),
+    Route('/api/sitter/owners/{owner_id}/update', update_owner, methods=['PUT']),
+    Route('/api/sitter/owners/{owner_id}/delete', delete_owner, methods=['DELETE']),
+    Route('/api/sitter/dogs', get_all_dogs, methods=['GET']),
+    Route('/api/sitter/dogs/{dog_id}', get_dog, methods=['GET']),
+    Route('/api/sitter/owners/{owner_id}/dogs/add', add_dog, methods=['GET', 'POST']),
+    Route('/api/sitter/dogs/{dog_id}/update', update_dog, methods=['PUT']),
+    Route('/api/sitter/dogs/{dog_id}/delete', delete_dog, methods=['DELETE']),
+    Route('/api/sitter/owners/{owner_id}/dogs', get_owner_dogs, methods=['GET']),
+    Route('/api/sitter/availability', get_availability, methods=['GET']),
+    Route('/api/sitter/export', export_sitter_data, methods=['GET']),
+    # everything else (registration, sitter update/delete, bulk, stays) runs
+    # in the Flask app on a2wsgi's thread pool
+    Mount('/', app=WSGIMiddleware(flask_app)),
+]
+
+
+app = Starlette(
+    routes=routes,
+    middleware=[
+        Middleware(RequestMetricsMiddleware),
+        Middleware(CORSMiddleware, allow_origins=CORS_ORIGINS, allow_credentials=True, allow_methods=['*'], allow_headers=['*']),
+        # behind a proxy, run uvicorn with --proxy-headers so request.client is the caller
+        Middleware(RateLimitMiddleware),
+    ],
+    exception_handlers={
+        NotFoundError: handle_not_found,
+        InvalidInputError: handle_invalid_input,
+        DatabaseError: handle_db_error,
+        ServiceBusyError: handle_service_busy,
+        TooManyRequestsError: handle_too_many_requests,
+        UnauthorizedError: handle_unauthorized,
+    },
+)
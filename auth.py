@@ -0,0 +1,107 @@
+import hashlib
+import hmac
+import os
+import threading
+import time
+from collections import OrderedDict
+from flask_jwt_extended import decode_token
+from flask_jwt_extended.exceptions import JWTExtendedException
+from jwt.exceptions import PyJWTError
+from metrics import timed
+
+
+class AuthContext:
+    """
+    Who a request is from, as read from its verified access token once:
+    the sitter id as an int, ready for the data handler, and the CSRF value
+    the X-CSRF-TOKEN header has to match.
+    """
+    __slots__ = ('sitter_id', 'csrf', 'expires_at')
+
+    def __init__(self, sitter_id, csrf, expires_at):
+        self.sitter_id = sitter_id
+        self.csrf = csrf
+        self.expires_at = expires_at
+
+
+    @classmethod
+    def from_claims(cls, claims):
+        """
+        None unless the claims are those of an access token for a sitter
+        id, as create_access_token(identity=str(sitter_id)) issues them.
+        """
+        sitter_id = claims.get('sub')
+        if claims.get('type') != 'access' or not isinstance(sitter_id, str) or not sitter_id.isdigit():
+            return None
+        return cls(int(sitter_id), claims.get('csrf', ''), claims.get('exp'))
+
+
+    def csrf_matches(self, csrf_header):
+        # as bytes, since compare_digest rejects non-ASCII str
+        return hmac.compare_digest((csrf_header or '').encode('utf-8'), self.csrf.encode('utf-8'))
+
+
+class VerifiedTokenCache:
+    """
+    Access tokens whose signature and expiry were already checked, keyed by
+    the token's SHA-256 and kept until the token expires, so a returning
+    cookie costs a hash instead of an HMAC check and claims parsing. Only
+    valid tokens are stored and the `max_entries` least recently used are
+    dropped first. Tokens without an expiry are verified every time.
+    verify() needs the Flask app context for the JWT settings.
+    """
+    def __init__(self, max_entries=None, clock=time.time):
+        self.max_entries = max_entries if max_entries is not None else int(os.environ.get('JWT_CACHE_MAX_ENTRIES', 10000))
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+
+    def verify(self, token):
+        """
+        The AuthContext of `token`, or None when it is missing, invalid or
+        expired.
+        """
+        if not token:
+            return None
+        key = hashlib.sha256(token.encode('utf-8')).digest()
+        with self._lock:
+            auth = self._entries.get(key)
+            if auth is not None:
+                if auth.expires_at > self.clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return auth
+                del self._entries[key]
+            self.misses += 1
+        try:
+            with timed('jwt'):
+                auth = AuthContext.from_claims(decode_token(token))
+        except (PyJWTError, JWTExtendedException):
+            auth = None
+        if auth is None:
+            with self._lock:
+                self.rejected += 1
+            return None
+        if auth.expires_at is not None:
+            with self._lock:
+                self._entries[key] = auth
+                if len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return auth
+
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "rejected": self.rejected,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+            }
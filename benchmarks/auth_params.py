@@ -0,0 +1,73 @@
+import sys
+import os
+
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+
+import threading
+import time
+from imagekitio.utils.calculation import get_authenticated_params
+from imagekit_auth import LocalSigner, AuthParamsPool
+from ratelimit import RateLimiter
+
+
+REQUESTS = 20000
+THREADS = 8
+REPEATS = 5
+
+
+def sign_per_request():
+    # the endpoint before the pool: imagekitio makes a token, expiry and signature per call
+    return get_authenticated_params("", 0, LocalSigner().private_key)
+
+
+def best_of(call, requests):
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        for _ in range(requests):
+            call()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def threaded(call, threads, requests):
+    per_thread = requests // threads
+    workers = [threading.Thread(target=lambda: [call() for _ in range(per_thread)]) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - start
+
+
+def main():
+    signer = LocalSigner()
+    pool = AuthParamsPool(signer, size=64, lifetime=1800, min_remaining=600)
+    # big enough that no refill runs: what a request pays while the pool has tokens
+    prefilled = AuthParamsPool(signer, size=2 * REQUESTS * REPEATS, lifetime=1800, min_remaining=600)
+    prefilled.take()
+    limiter = RateLimiter(rate=1e9, burst=1e9, max_keys=10000)
+    tokens = {pool.take()["token"] for _ in range(REQUESTS)}
+    assert len(tokens) == REQUESTS, "a token was served twice"
+    variants = (
+        ("sign per request", lambda: best_of(sign_per_request, REQUESTS)),
+        ("pool take, signing included", lambda: best_of(pool.take, REQUESTS)),
+        ("pool take, pooled tokens only", lambda: best_of(lambda: prefilled.take(), REQUESTS)),
+        ("rate limiter, one client", lambda: best_of(lambda: limiter.acquire("203.0.113.7"), REQUESTS)),
+        (f"pool take, {THREADS} threads", lambda: threaded(pool.take, THREADS, REQUESTS)),
+    )
+    print(f"{REQUESTS} requests, best of {REPEATS}, local signer")
+    print(f"{'variant':<34}{'ms':>8}{'us/request':>12}")
+    for name, run in variants:
+        elapsed = run()
+        print(f"{name:<34}{elapsed * 1000:>8.2f}{elapsed * 1e6 / REQUESTS:>12.2f}")
+    print(pool.stats())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+import sys
+import os
+
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+
+import argparse
+import json
+
+
+# runs that differ in these are not timing the same work
+COMPARABLE_META = ('scale', 'seed', 'bcrypt_rounds')
+
+
+def load(path):
+    with open(path) as results_file:
+        return json.load(results_file)
+
+
+def compare(before, after, threshold, min_delta_ms):
+    """
+    Yields (name, before median, after median, change, verdict) for every
+    call in either run. A call only counts as a regression when its median
+    grew by more than `threshold` and by more than `min_delta_ms`, so
+    jitter on sub-millisecond calls does not fail the comparison.
+    """
+    for name in sorted(before["results"].keys() | after["results"].keys()):
+        old, new = before["results"].get(name), after["results"].get(name)
+        if old is None or new is None:
+            yield name, old and old["median_ms"], new and new["median_ms"], None, "added" if old is None else "removed"
+            continue
+        delta = new["median_ms"] - old["median_ms"]
+        change = delta / old["median_ms"] if old["median_ms"] else 0
+        if abs(delta) <= min_delta_ms or abs(change) <= threshold:
+            verdict = ""
+        else:
+            verdict = "REGRESSION" if delta > 0 else "faster"
+        yield name, old["median_ms"], new["median_ms"], change, verdict
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmarks.runner result files")
+    parser.add_argument('before')
+    parser.add_argument('after')
+    parser.add_argument('--threshold', type=float, default=0.15, help="relative median change that counts, 0.15 = 15 percent")
+    parser.add_argument('--min-delta-ms', type=float, default=0.1, help="smaller absolute changes are ignored")
+    args = parser.parse_args()
+    before, after = load(args.before), load(args.after)
+    for key in COMPARABLE_META:
+        if before["meta"].get(key) != after["meta"].get(key):
+            print(f"warning: {key} differs, {before['meta'].get(key)} vs {after['meta'].get(key)}")
+    print(f"{before['meta'].get('commit')} -> {after['meta'].get('commit')}")
+    print(f"{'call':<58}{'before ms':>10}{'after ms':>10}{'change':>9}")
+    regressions = 0
+    for name, old, new, change, verdict in compare(before, after, args.threshold, args.min_delta_ms):
+        regressions += verdict == "REGRESSION"
+        old_text = f"{old:.3f}" if old is not None else "-"
+        new_text = f"{new:.3f}" if new is not None else "-"
+        change_text = f"{change:+.0%}" if change is not None else ""
+        print(f"{name:<58}{old_text:>10}{new_text:>10}{change_text:>9}  {verdict}")
+    print(f"{regressions} regression(s)")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
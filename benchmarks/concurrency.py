@@ -0,0 +1,86 @@
+import sys
+import os
+
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+
+import argparse
+import random
+import time
+from multiprocessing import Pool
+from sqlalchemy import insert
+from benchmarks.scratch import scratch_handler
+from datahandler.models import Sitter, Owner, Dog
+from datahandler.passwords import PasswordHasher
+from datahandler.sqlite_engine import DEFAULT_ENGINE_PROFILE
+from datahandler.sqlite_handler import SQLiteHandler
+from exceptions import DatabaseError
+
+
+OWNERS = 20
+DOGS = 1000
+DOG = {"name": "Luna", "birth_date": "2017-03-15", "breed": "Mixed breed", "height": 55, "weight": 25, "food_per_day": 500, "gender": "female", "castrated": True, "character": "sensible", "sociable": True, "training": True, "img_url": "https://example.com/luna.jpg"}
+PROFILES = {
+    # what SQLiteHandler did before engine profiles: rollback journal, stock pool
+    "legacy": {setting: None for setting in DEFAULT_ENGINE_PROFILE},
+    "tuned": DEFAULT_ENGINE_PROFILE,
+}
+
+
+def run_worker(args):
+    db_file_name, profile, duration, write_ratio, seed = args
+    random.seed(seed)
+    handler = SQLiteHandler(db_file_name, password_hasher=PasswordHasher(rounds=4, workers=0), engine_profile=profile)
+    reads = writes = errors = 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        try:
+            if random.random() < write_ratio:
+                dog_id = random.randint(1, DOGS)
+                handler.update_dog(sitter_id=1, dog_id=dog_id, updated_data={**DOG, "chip_id": dog_id, "weight": random.randint(1, 60)})
+                writes += 1
+            else:
+                handler.get_all_dogs(sitter_id=1, query_params={"limit": 50, "after": random.randint(0, DOGS - 50)})
+                reads += 1
+        except DatabaseError:
+            errors += 1
+    handler.engine.dispose()
+    return reads, writes, errors
+
+
+def seed(handler):
+    with handler.engine.begin() as connection:
+        connection.execute(insert(Sitter), [{"first_name": "Emily", "last_name": "Johnson", "email": "emily.johnson@example.com", "password": "x"}])
+        connection.execute(insert(Owner), [
+            {"sitter_id": 1, "first_name": "Leo", "last_name": "Storm", "email": f"owner{i}@example.com", "phone_number": f"+4916324383{i:02d}"}
+            for i in range(OWNERS)
+        ])
+        connection.execute(insert(Dog), [{**DOG, "chip_id": i + 1, "owner_id": i % OWNERS + 1} for i in range(DOGS)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mixed read/write load from several processes against one SQLite file")
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--write-ratio', type=float, default=0.2)
+    args = parser.parse_args()
+
+    print(f"{args.workers} processes, {args.duration:.0f}s, {args.write_ratio:.0%} writes")
+    print(f"{'profile':<10}{'ops/s':>10}{'reads':>10}{'writes':>10}{'errors':>10}{'error rate':>12}")
+    for name, profile in PROFILES.items():
+        with scratch_handler(f'{name}.db', password_hasher=PasswordHasher(rounds=4, workers=0), engine_profile=profile) as handler:
+            seed(handler)
+            handler.engine.dispose()
+            jobs = [(f'{name}.db', profile, args.duration, args.write_ratio, worker) for worker in range(args.workers)]
+            with Pool(args.workers) as pool:
+                results = pool.map(run_worker, jobs)
+        reads, writes, errors = (sum(column) for column in zip(*results))
+        total = reads + writes + errors
+        print(f"{name:<10}{(reads + writes) / args.duration:>10.0f}{reads:>10}{writes:>10}{errors:>10}{errors / max(total, 1):>12.2%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,323 @@
+import sys
+import os
+
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+
+import argparse
+import itertools
+import random
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+from statistics import quantiles
+from sqlalchemy import create_engine, insert
+from sqlalchemy.exc import DBAPIError
+from benchmarks.datagen import generate, sitter_password_hash
+from benchmarks.scratch import scratch_handler, scratch_postgres_handler, local_postgres
+from datahandler.models import Skill
+from datahandler.passwords import PasswordHasher
+from exceptions import NotFoundError, InvalidInputError, DatabaseError, ServiceBusyError
+
+
+HANDLER_ERRORS = (NotFoundError, InvalidInputError, DatabaseError, ServiceBusyError)
+# renumbered when compared; chip_id is data and must come back as sent
+ID_KEYS = frozenset(('sitter_id', 'owner_id', 'dog_id', 'stay_id', 'skill_id', 'knowledge_id', 'next_after'))
+SITTER = {"first_name": "Emily", "last_name": "Johnson", "email": "emily.johnson@example.com", "password": "sitter-password"}
+OWNER = {"first_name": "Leo", "last_name": "Storm", "email": "leo.storm@example.com", "phone_number": "+49 163 2438301"}
+DOG = {"chip_id": 276098100000001, "name": "Luna", "birth_date": "2017-03-15", "breed": "Mixed breed", "height": 55, "weight": 25, "food_per_day": 500, "gender": "female", "castrated": True, "character": "sensible", "sociable": True, "training": True, "img_url": "https://ik.imagekit.io/demo/dogs/luna.jpg"}
+FIRST_BOOKING = date(2040, 1, 1)
+THROUGHPUT_SCALE = {"sitters": 20, "owners_per_sitter": 20, "dogs_per_owner": 2, "stays_per_dog": 4, "skills": 10, "skills_per_dog": 5}
+
+
+class Recorder:
+    """
+    Runs the scenario's calls and keeps a comparable outcome per step: the
+    result with ids renumbered in order of appearance and versions dropped,
+    or the error class and message. Ids are renumbered because a server
+    database may skip sequence values after a failed insert.
+    """
+    def __init__(self, handler):
+        self.handler = handler
+        self.outcomes = []
+        self.unexpected = []
+        self._ids = {}
+
+
+    def _id(self, kind, value):
+        return self._ids.setdefault(kind, {}).setdefault(value, len(self._ids[kind]) + 1)
+
+
+    def normalize(self, value, key=None):
+        if isinstance(value, dict):
+            return {item_key: self.normalize(item, item_key) for item_key, item in value.items() if item_key != 'version'}
+        if isinstance(value, (list, tuple)):
+            kind = key[:-1] if key and key.endswith('_ids') else key
+            return [self.normalize(item, kind) for item in value]
+        if isinstance(value, int) and not isinstance(value, bool) and key in ID_KEYS:
+            return self._id(key, value)
+        return value
+
+
+    def step(self, name, call, expect=None, unordered=False, transform=None):
+        """
+        expect is the error class the step must raise, None when it must
+        succeed. unordered results are sorted, for rankings that may break
+        ties differently per database. transform picks what to compare out
+        of the result.
+        """
+        result = None
+        try:
+            result = call(self.handler)
+            outcome = self.normalize(transform(result) if transform else result)
+            if unordered:
+                outcome = {key: sorted(items, key=repr) for key, items in outcome.items()}
+            error = None
+        except HANDLER_ERRORS as e:
+            outcome = {"error": type(e).__name__, "message": str(e)}
+            error = type(e)
+        if error is not expect:
+            self.unexpected.append((name, expect.__name__ if expect else "success", outcome))
+        self.outcomes.append((name, outcome))
+        return result
+
+
+def scenario(recorder):
+    """
+    Every AbstractDataHandler method on an empty database, with the error
+    paths app.py maps to 400 and 404.
+    """
+    step = recorder.step
+    with recorder.handler.engine.begin() as connection:
+        connection.execute(insert(Skill), [{"call": call} for call in ("sit", "down", "stay")])
+    sitter_id = step("add_sitter", lambda h: h.add_sitter(new_sitter_data=SITTER))["sitter_id"]
+    other_sitter_id = step("add_sitter (second)", lambda h: h.add_sitter(new_sitter_data={**SITTER, "email": "david.wilson@example.com"}))["sitter_id"]
+    step("add_sitter (email taken)", lambda h: h.add_sitter(new_sitter_data=SITTER), expect=InvalidInputError)
+    step("add_sitter (invalid)", lambda h: h.add_sitter(new_sitter_data={"email": "x"}), expect=InvalidInputError)
+    step("authenticate_sitter", lambda h: h.authenticate_sitter(login_data={"email": SITTER["email"], "password": SITTER["password"]}))
+    step("authenticate_sitter (wrong password)", lambda h: h.authenticate_sitter(login_data={"email": SITTER["email"], "password": "wrong-password"}), expect=InvalidInputError)
+    step("get_sitter", lambda h: h.get_sitter(sitter_id=sitter_id))
+    step("get_sitter (missing)", lambda h: h.get_sitter(sitter_id=999999), expect=NotFoundError)
+    step("get_sitter (not a number)", lambda h: h.get_sitter(sitter_id="abc"), expect=InvalidInputError)
+    step("update_sitter", lambda h: h.update_sitter(sitter_id=sitter_id, updated_data={"first_name": "Emma"}))
+    step("update_sitter (email taken)", lambda h: h.update_sitter(sitter_id=sitter_id, updated_data={"email": "david.wilson@example.com"}), expect=InvalidInputError)
+
+    owner_id = step("add_owner", lambda h: h.add_owner(sitter_id=str(sitter_id), new_owner_data=OWNER))["owner_id"]
+    step("add_owner (email taken)", lambda h: h.add_owner(sitter_id=sitter_id, new_owner_data={**OWNER, "phone_number": "+49 177 8297922"}), expect=InvalidInputError)
+    step("add_owner (missing sitter)", lambda h: h.add_owner(sitter_id=999999, new_owner_data={**OWNER, "email": "nobody@example.com", "phone_number": "+49 177 8297923"}), expect=NotFoundError)
+    step("add_owner (invalid phone)", lambda h: h.add_owner(sitter_id=sitter_id, new_owner_data={**OWNER, "phone_number": "123"}), expect=InvalidInputError)
+    step("add_owners_bulk", lambda h: h.add_owners_bulk(sitter_id=sitter_id, new_owners_data=[
+        {**OWNER, "first_name": "Finn", "email": "finn.wilder@example.com", "phone_number": "+49 177 8297922"},
+        {**OWNER, "first_name": "Zara", "email": "zara.nightshade@example.com", "phone_number": "+49 178 7069665"},
+        OWNER,
+        {"email": "broken"},
+    ]))
+    first_page = step("get_all_owners (page 1)", lambda h: h.get_all_owners(sitter_id=sitter_id, query_params={"limit": 2}))
+    step("get_all_owners (page 2)", lambda h: h.get_all_owners(sitter_id=sitter_id, query_params={"limit": 2, "after": first_page["next_after"]}))
+    step("get_all_owners (none)", lambda h: h.get_all_owners(sitter_id=other_sitter_id), expect=NotFoundError)
+    step("get_owner", lambda h: h.get_owner(sitter_id=sitter_id, owner_id=owner_id))
+    step("get_owner (other sitter)", lambda h: h.get_owner(sitter_id=other_sitter_id, owner_id=owner_id), expect=NotFoundError)
+    step("update_owner", lambda h: h.update_owner(sitter_id=sitter_id, owner_id=owner_id, updated_data={"last_name": "Stormborn"}))
+    step("update_owner (phone taken)", lambda h: h.update_owner(sitter_id=sitter_id, owner_id=owner_id, updated_data={"phone_number": "+49 177 8297922"}), expect=InvalidInputError)
+
+    dog_id = step("add_dog", lambda h: h.add_dog(sitter_id=sitter_id, owner_id=owner_id, new_dog_data=DOG))["dog_id"]
+    step("add_dog (chip taken)", lambda h: h.add_dog(sitter_id=sitter_id, owner_id=owner_id, new_dog_data=DOG), expect=InvalidInputError)
+    step("add_dog (other sitter's owner)", lambda h: h.add_dog(sitter_id=other_sitter_id, owner_id=owner_id, new_dog_data={**DOG, "chip_id": 276098100000009}), expect=NotFoundError)
+    step("add_dogs_bulk", lambda h: h.add_dogs_bulk(sitter_id=sitter_id, owner_id=owner_id, new_dogs_data=[
+        {**DOG, "chip_id": 276098100000002, "name": "Balu", "breed": "Labrador", "gender": "male"},
+        {**DOG, "chip_id": 276098100000003, "name": "Lucky", "breed": "Pug", "img_url": "https://cdn.example.com/lucky.jpg"},
+        DOG,
+    ]))
+    step("get_all_dogs", lambda h: h.get_all_dogs(sitter_id=sitter_id))
+    step("get_all_dogs (filtered, page)", lambda h: h.get_all_dogs(sitter_id=sitter_id, query_params={"gender": "female", "limit": 1}))
+    step("get_all_dogs (fields, thumb)", lambda h: h.get_all_dogs(sitter_id=sitter_id, query_params={"fields": "name,img_url", "variant": "thumb"}))
+    step("get_all_dogs (unknown field)", lambda h: h.get_all_dogs(sitter_id=sitter_id, query_params={"fields": "password"}), expect=InvalidInputError)
+    step("get_dog", lambda h: h.get_dog(sitter_id=sitter_id, dog_id=dog_id))
+    step("get_dog (other sitter)", lambda h: h.get_dog(sitter_id=other_sitter_id, dog_id=dog_id), expect=NotFoundError)
+    step("get_owner_dogs", lambda h: h.get_owner_dogs(sitter_id=sitter_id, owner_id=owner_id))
+    step("update_dog", lambda h: h.update_dog(sitter_id=sitter_id, dog_id=dog_id, updated_data={**DOG, "weight": 27, "img_url": "https://ik.imagekit.io/demo/dogs/luna2.jpg"}))
+    step("update_dog (chip taken)", lambda h: h.update_dog(sitter_id=sitter_id, dog_id=dog_id, updated_data={**DOG, "chip_id": 276098100000002}), expect=InvalidInputError)
+
+    step("update_dog_skills", lambda h: h.update_dog_skills(sitter_id=sitter_id, dog_id=dog_id, skills_data=[{"skill_id": 1, "knowledge": 3}, {"skill_id": 2, "knowledge": 5}, {"skill_id": 99, "knowledge": 1}]))
+    step("update_dog_skills (upsert)", lambda h: h.update_dog_skills(sitter_id=sitter_id, dog_id=dog_id, skills_data=[{"skill_id": 1, "knowledge": 7}, {"skill_id": 1, "knowledge": 8}]))
+    step("get_dog_skills", lambda h: h.get_dog_skills(sitter_id=sitter_id, dog_id=dog_id))
+    step("get_skill_matrix", lambda h: h.get_skill_matrix(sitter_id=sitter_id))
+    step("search (name prefix)", lambda h: h.search(sitter_id=sitter_id, query_params={"q": "lu"}), unordered=True)
+    step("search (phone as dialled)", lambda h: h.search(sitter_id=sitter_id, query_params={"q": "0163 243"}), unordered=True)
+    step("search (e-mail word)", lambda h: h.search(sitter_id=sitter_id, query_params={"q": "nightshade"}), unordered=True)
+    step("search (other sitter)", lambda h: h.search(sitter_id=other_sitter_id, query_params={"q": "lu"}), unordered=True)
+    step("search (no words)", lambda h: h.search(sitter_id=sitter_id, query_params={"q": "--"}), expect=InvalidInputError)
+
+    stay_id = step("add_stay", lambda h: h.add_stay(sitter_id=sitter_id, new_stay_data={"dog_id": dog_id, "checkin": "2024-07-01", "checkout": "2024-07-10"}))["stay_id"]
+    step("add_stay (overlap)", lambda h: h.add_stay(sitter_id=sitter_id, new_stay_data={"dog_id": dog_id, "checkin": "2024-07-09", "checkout": "2024-07-12"}), expect=InvalidInputError)
+    step("add_stay (back to back)", lambda h: h.add_stay(sitter_id=sitter_id, new_stay_data={"dog_id": dog_id, "checkin": "2024-07-10", "checkout": "2024-07-12"}))
+    step("add_stay (other sitter)", lambda h: h.add_stay(sitter_id=other_sitter_id, new_stay_data={"dog_id": dog_id, "checkin": "2024-08-01", "checkout": "2024-08-02"}), expect=NotFoundError)
+    step("update_stay", lambda h: h.update_stay(sitter_id=sitter_id, stay_id=stay_id, updated_data={"checkin": "2024-07-02", "checkout": "2024-07-10"}))
+    step("update_stay (overlap)", lambda h: h.update_stay(sitter_id=sitter_id, stay_id=stay_id, updated_data={"checkin": "2024-07-02", "checkout": "2024-07-11"}), expect=InvalidInputError)
+    step("get_stays", lambda h: h.get_stays(sitter_id=sitter_id, query_params={"start": "2024-07-05", "end": "2024-07-31"}))
+    step("get_stay", lambda h: h.get_stay(sitter_id=sitter_id, stay_id=stay_id))
+    step("get_availability", lambda h: h.get_availability(sitter_id=sitter_id, query_params={"from": "2024-06-30", "to": "2024-07-13"}))
+    step("get_versions (dogs)", lambda h: h.get_versions(sitter_id=sitter_id, resource='dogs', query_params={"limit": 2}), transform=lambda result: {"dog_ids": [row[0] for row in result["versions"]], "next_after": result["next_after"]})
+    step("export_sitter_data", lambda h: list(h.export_sitter_data(sitter_id=sitter_id)))
+
+    step("delete_stay", lambda h: h.delete_stay(sitter_id=sitter_id, stay_id=stay_id))
+    step("delete_stay (again)", lambda h: h.delete_stay(sitter_id=sitter_id, stay_id=stay_id), expect=NotFoundError)
+    step("delete_dog", lambda h: h.delete_dog(sitter_id=sitter_id, dog_id=dog_id))
+    step("get_dog_skills (deleted dog)", lambda h: h.get_dog_skills(sitter_id=sitter_id, dog_id=dog_id), expect=NotFoundError)
+    step("delete_owner", lambda h: h.delete_owner(sitter_id=sitter_id, owner_id=owner_id))
+    step("get_all_dogs (owner deleted)", lambda h: h.get_all_dogs(sitter_id=sitter_id), expect=NotFoundError)
+    step("delete_sitter", lambda h: h.delete_sitter(sitter_id=sitter_id))
+    step("get_all_owners (sitter deleted)", lambda h: h.get_all_owners(sitter_id=sitter_id), expect=NotFoundError)
+    step("delete_sitter (again)", lambda h: h.delete_sitter(sitter_id=sitter_id), expect=NotFoundError)
+
+
+def run_throughput(handler, threads, seconds, write_ratio):
+    """
+    threads share one handler, as the request threads of one app process
+    do, each acting for random generated sitters. Returns ops/s, error
+    count and p50/p99 latency in ms.
+    """
+    scale = THROUGHPUT_SCALE
+    generate(handler.engine, **scale, password_hash=sitter_password_hash(4))
+    owners, dogs = scale["owners_per_sitter"], scale["owners_per_sitter"] * scale["dogs_per_owner"]
+    latencies = []
+    errors = []
+    start_barrier = threading.Barrier(threads)
+    booking_numbers = itertools.count()
+
+    def worker(number):
+        rng = random.Random(number)
+        local_latencies = []
+        local_errors = 0
+        start_barrier.wait()
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            sitter_id = rng.randint(1, scale["sitters"])
+            owner_id = (sitter_id - 1) * owners + rng.randint(1, owners)
+            dog_id = (sitter_id - 1) * dogs + rng.randint(1, dogs)
+            started = time.perf_counter()
+            try:
+                if rng.random() < write_ratio:
+                    choice = rng.random()
+                    if choice < 1 / 3:
+                        handler.update_owner(sitter_id=sitter_id, owner_id=owner_id, updated_data={"first_name": rng.choice(("Leo", "Mia", "Finn"))})
+                    elif choice < 2 / 3:
+                        handler.update_dog_skills(sitter_id=sitter_id, dog_id=dog_id, skills_data=[{"skill_id": rng.randint(1, scale["skills"]), "knowledge": rng.randint(0, 10)}])
+                    else:
+                        # one night per stay, each on its own date past the generated stays
+                        checkin = FIRST_BOOKING + timedelta(days=2 * next(booking_numbers))
+                        handler.add_stay(sitter_id=sitter_id, new_stay_data={"dog_id": dog_id, "checkin": checkin.isoformat(), "checkout": (checkin + timedelta(days=1)).isoformat()})
+                else:
+                    choice = rng.random()
+                    if choice < 0.4:
+                        handler.get_all_dogs(sitter_id=sitter_id, query_params={"limit": 20})
+                    elif choice < 0.7:
+                        handler.get_dog(sitter_id=sitter_id, dog_id=dog_id)
+                    elif choice < 0.9:
+                        handler.get_stays(sitter_id=sitter_id, query_params={"limit": 20})
+                    else:
+                        handler.search(sitter_id=sitter_id, query_params={"q": rng.choice(("lu", "bal", "pug", "storm"))})
+            except HANDLER_ERRORS:
+                local_errors += 1
+            local_latencies.append(time.perf_counter() - started)
+        latencies.extend(local_latencies)
+        errors.append(local_errors)
+
+    workers = [threading.Thread(target=worker, args=(number,)) for number in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    percentiles = quantiles(latencies, n=100) if len(latencies) > 1 else [0] * 99
+    return len(latencies) / seconds, sum(errors), percentiles[49] * 1000, percentiles[98] * 1000
+
+
+@contextmanager
+def backend_handlers(postgres_url, sqlite_only=False):
+    """
+    Yields {name: factory} for every backend that can run here. A factory
+    is a context manager around a handler on a new, empty database. A
+    Postgres server that was asked for but cannot be reached ends the run.
+    """
+    password_hasher_kwargs = lambda: {"password_hasher": PasswordHasher(rounds=4, workers=0)}
+    backends = {"sqlite": lambda: scratch_handler('conformance.db', **password_hasher_kwargs())}
+    if sqlite_only:
+        yield backends
+        return
+    with (local_postgres() if postgres_url is None else _given(postgres_url)) as server_url:
+        if server_url is None:
+            print("postgres: skipped, pass --postgres-url or put initdb and pg_ctl on PATH")
+        else:
+            if postgres_url is not None:
+                _check_server(postgres_url)
+            backends["postgres"] = lambda: scratch_postgres_handler(server_url, **password_hasher_kwargs())
+        yield backends
+
+
+@contextmanager
+def _given(url):
+    yield url
+
+
+def _check_server(url):
+    try:
+        engine = create_engine(url)
+    except ImportError as error:
+        sys.exit(f"postgres: {error}, run `pip install \"psycopg[binary]\"`")
+    try:
+        with engine.connect():
+            pass
+    except DBAPIError as error:
+        sys.exit(f"postgres: cannot connect to {url}: {error.orig}")
+    finally:
+        engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the same handler scenario against every storage backend, compare the outcomes, then time a mixed load on each")
+    parser.add_argument('--postgres-url', help="server to create scratch databases on, e.g. postgresql+psycopg://postgres@localhost/postgres; without it a local cluster is started when initdb is available")
+    parser.add_argument('--sqlite-only', action='store_true', help="check SQLite alone; otherwise a run without Postgres does not pass")
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--write-ratio', type=float, default=0.2)
+    parser.add_argument('--skip-throughput', action='store_true')
+    args = parser.parse_args()
+    if args.sqlite_only and args.postgres_url:
+        parser.error("--sqlite-only and --postgres-url exclude each other")
+    failed = False
+    with backend_handlers(args.postgres_url, args.sqlite_only) as backends:
+        skipped = 'postgres' not in backends and not args.sqlite_only
+        reference = None
+        for name, factory in backends.items():
+            with factory() as handler:
+                recorder = Recorder(handler)
+                scenario(recorder)
+            for step_name, expected, outcome in recorder.unexpected:
+                print(f"{name}: {step_name} expected {expected}, got {outcome}")
+            mismatches = []
+            if reference is None:
+                reference = (name, recorder.outcomes)
+            else:
+                mismatches = [(step_name, expected, outcome) for (step_name, expected), (_, outcome) in zip(reference[1], recorder.outcomes) if expected != outcome]
+                for step_name, expected, outcome in mismatches:
+                    print(f"{name}: {step_name} differs from {reference[0]}:\n  {reference[0]}: {expected}\n  {name}: {outcome}")
+            failed = failed or bool(recorder.unexpected or mismatches)
+            print(f"{name}: {len(recorder.outcomes)} steps, {len(recorder.unexpected)} unexpected, {len(mismatches)} differing from {reference[0]}")
+        if not args.skip_throughput:
+            print(f"\n{args.threads} threads, {args.seconds:.0f}s, {args.write_ratio:.0%} writes")
+            print(f"{'backend':<10}{'ops/s':>10}{'errors':>10}{'p50 ms':>10}{'p99 ms':>10}")
+            for name, factory in backends.items():
+                with factory() as handler:
+                    ops, errors, p50, p99 = run_throughput(handler, args.threads, args.seconds, args.write_ratio)
+                print(f"{name:<10}{ops:>10.0f}{errors:>10}{p50:>10.2f}{p99:>10.2f}")
+    if skipped and not failed:
+        print("\nnot passed: postgres was not checked, pass --sqlite-only to check SQLite alone")
+    sys.exit(1 if failed else 2 if skipped else 0)
+
+
+if __name__ == '__main__':
+    main()
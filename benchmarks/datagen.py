@@ -0,0 +1,125 @@
+import sys
+import os
+
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+
+import argparse
+import random
+import time
+from datetime import date, timedelta
+from sqlalchemy import insert
+from datahandler.migrations import run_migrations
+from datahandler.models import Sitter, Owner, Dog, Stay, Skill, Knowledge
+from datahandler.passwords import PasswordHasher
+from datahandler.sqlite_engine import create_sqlite_engine
+
+
+SITTER_PASSWORD = "benchmark-password"
+SCALE = {
+    "sitters": 50,
+    "owners_per_sitter": 20,
+    "dogs_per_owner": 2,
+    "stays_per_dog": 4,
+    "skills": 10,
+    "skills_per_dog": 5,
+}
+FIRST_NAMES = ["Leo", "Finn", "Mia", "Lena", "Paul", "Lukas", "Anna", "Jonas", "Lea", "Max", "Emily", "Noah"]
+LAST_NAMES = ["Storm", "Wilder", "Müller", "Schmidt", "Weber", "Becker", "Hoffmann", "Koch", "Richter", "Johnson"]
+DOG_NAMES = ["Luna", "Bella", "Balu", "Lucky", "Rocky", "Sammy", "Nala", "Emma", "Charlie", "Bruno", "Maja", "Oskar", "Momo", "Koda"]
+BREEDS = ["Labrador", "Pug", "Boxer", "Beagle", "Mixed breed", "Poodle", "Dachshund", "Border Collie", "Bernese Mountain Dog", "Siberian Husky"]
+CHARACTERS = ["sensible", "playful", "lazy", "stubborn", "impulsive", "shy with strangers", "loves water"]
+CALLS = ["sit", "down", "stay", "come", "heel", "paw", "leave it", "drop it", "wait", "place", "spin", "fetch"]
+FIRST_STAY = date(2024, 1, 1)
+BATCH_SIZE = 5000
+
+
+def _insert(connection, model, rows):
+    for start in range(0, len(rows), BATCH_SIZE):
+        connection.execute(insert(model), rows[start:start + BATCH_SIZE])
+
+
+def generate(engine, sitters, owners_per_sitter, dogs_per_owner, stays_per_dog, skills, skills_per_dog, password_hash, seed=0):
+    """
+    Bulk-loads a synthetic data set into an empty, migrated database, SQLite
+    or PostgreSQL, in one transaction and returns the row counts. The same
+    arguments always produce the same rows, so runs against it can be
+    compared. Every sitter logs in with SITTER_PASSWORD; ids are assigned
+    densely from 1, owners of sitter s are ((s - 1) * owners_per_sitter + 1)
+    onwards, and so on.
+    """
+    rng = random.Random(seed)
+    sitter_rows, owner_rows, dog_rows, stay_rows, knowledge_rows = [], [], [], [], []
+    skill_rows = [{"skill_id": skill_id, "call": CALLS[(skill_id - 1) % len(CALLS)] + ("" if skill_id <= len(CALLS) else f" {skill_id}")} for skill_id in range(1, skills + 1)]
+    for sitter_id in range(1, sitters + 1):
+        sitter_rows.append({"sitter_id": sitter_id, "first_name": rng.choice(FIRST_NAMES), "last_name": rng.choice(LAST_NAMES), "email": f"sitter{sitter_id}@example.com", "password": password_hash})
+        for _ in range(owners_per_sitter):
+            owner_id = len(owner_rows) + 1
+            owner_rows.append({"owner_id": owner_id, "sitter_id": sitter_id, "first_name": rng.choice(FIRST_NAMES), "last_name": rng.choice(LAST_NAMES), "email": f"owner{owner_id}@example.com", "phone_number": f"+49163{owner_id:07d}"})
+            for _ in range(dogs_per_owner):
+                dog_id = len(dog_rows) + 1
+                dog_rows.append({
+                    "dog_id": dog_id, "chip_id": 276000000000000 + dog_id, "owner_id": owner_id, "name": rng.choice(DOG_NAMES),
+                    "birth_date": (date(2010, 1, 1) + timedelta(days=rng.randrange(5000))).isoformat(), "breed": rng.choice(BREEDS),
+                    "height": rng.randint(20, 75), "weight": rng.randint(3, 60), "food_per_day": rng.randrange(100, 900, 10),
+                    "gender": rng.choice(("female", "male")), "castrated": rng.random() < 0.5, "character": rng.choice(CHARACTERS),
+                    "sociable": rng.random() < 0.7, "training": rng.random() < 0.5,
+                    "img_url": f"https://cdn.pixabay.com/photo/dogs/{dog_id}_1280.jpg",
+                })
+                checkin = FIRST_STAY + timedelta(days=rng.randrange(30))
+                for _ in range(stays_per_dog):
+                    checkout = checkin + timedelta(days=rng.randint(1, 14))
+                    stay_rows.append({"dog_id": dog_id, "sitter_id": sitter_id, "checkin": checkin, "checkout": checkout})
+                    checkin = checkout + timedelta(days=rng.randint(0, 30))
+                for skill_id in rng.sample(range(1, skills + 1), min(skills_per_dog, skills)):
+                    knowledge_rows.append({"dog_id": dog_id, "skill_id": skill_id, "knowledge": rng.randint(0, 10)})
+    with engine.begin() as connection:
+        for model, rows in ((Sitter, sitter_rows), (Owner, owner_rows), (Dog, dog_rows), (Skill, skill_rows), (Stay, stay_rows), (Knowledge, knowledge_rows)):
+            _insert(connection, model, rows)
+        if connection.dialect.name == 'postgresql':
+            # explicit ids do not advance the serial sequences
+            for model in (Sitter, Owner, Dog, Skill):
+                table, key = model.__table__.name, model.__table__.primary_key.columns[0].name
+                connection.exec_driver_sql(f"SELECT setval(pg_get_serial_sequence('{table}', '{key}'), coalesce((SELECT max({key}) FROM {table}), 1))")
+    return {"sitters": len(sitter_rows), "owners": len(owner_rows), "dogs": len(dog_rows), "stays": len(stay_rows), "skills": len(skill_rows), "knowledges": len(knowledge_rows)}
+
+
+def add_scale_arguments(parser):
+    for name, default in SCALE.items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=int, default=default)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--bcrypt-rounds', type=int, default=4, help="cost of the shared sitter password hash")
+
+
+def scale_from(args):
+    return {name: getattr(args, name) for name in SCALE}
+
+
+def sitter_password_hash(rounds):
+    password_hasher = PasswordHasher(rounds=rounds, workers=0)
+    try:
+        return password_hasher.hash(SITTER_PASSWORD)
+    finally:
+        password_hasher.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic pawliday database")
+    parser.add_argument('path', help="database file to create, e.g. /tmp/bench/data/pawliday.db")
+    add_scale_arguments(parser)
+    args = parser.parse_args()
+    if os.path.exists(args.path):
+        parser.error(f"{args.path} already exists")
+    engine = create_sqlite_engine(f'sqlite:///{args.path}')
+    run_migrations(engine)
+    start = time.perf_counter()
+    counts = generate(engine, **scale_from(args), password_hash=sitter_password_hash(args.bcrypt_rounds), seed=args.seed)
+    engine.dispose()
+    print(', '.join(f"{count} {name}" for name, count in counts.items()), f"in {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == '__main__':
+    main()
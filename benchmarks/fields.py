@@ -0,0 +1,63 @@
+import sys
+import os
+
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+
+import json
+import time
+from sqlalchemy import insert
+from benchmarks.scratch import scratch_handler
+from datahandler.models import Sitter, Owner, Dog
+from datahandler.passwords import PasswordHasher
+from datahandler.schemas import MAX_PAGE_LIMIT
+from encoding import JSON_MIMETYPE, MSGPACK_MIMETYPES, OFFERED_MIMETYPES, encode, orjson
+
+
+DOGS = 5000
+REPEATS = 20
+OVERVIEW_FIELDS = "dog_id,name,breed,img_url"
+
+
+def flask_jsonify(body):
+    # what jsonify did per response: the stdlib encoder with sorted keys
+    return json.dumps(body, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+
+def best_of(call):
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    with scratch_handler(password_hasher=PasswordHasher(rounds=4, workers=0)) as handler:
+        with handler.engine.begin() as connection:
+            connection.execute(insert(Sitter), [{"first_name": "Emily", "last_name": "Johnson", "email": "emily.johnson@example.com", "password": "x"}])
+            connection.execute(insert(Owner), [{"sitter_id": 1, "first_name": "Leo", "last_name": "Storm", "email": "leo.storm@example.com", "phone_number": "+491632438301"}])
+            connection.execute(insert(Dog), [
+                {"chip_id": chip_id, "owner_id": 1, "name": "Luna", "birth_date": "2017-03-15", "breed": "Mixed breed", "height": 55, "weight": 25, "food_per_day": 500, "gender": "female", "castrated": True, "character": "sensible and playful, loves water", "sociable": True, "training": True, "img_url": "https://cdn.pixabay.com/photo/2019/04/05/13/56/shepherd-mongrel-4105106_1280.jpg"}
+                for chip_id in range(DOGS)
+            ])
+        print(f"page of {MAX_PAGE_LIMIT} of {DOGS} dogs, best of {REPEATS}")
+        print(f"{'fields':<28}{'encoding':<20}{'load ms':>9}{'encode ms':>11}{'bytes':>9}")
+        for fields in (None, OVERVIEW_FIELDS):
+            query_params = {"limit": MAX_PAGE_LIMIT, **({"fields": fields} if fields else {})}
+            load = best_of(lambda: handler.get_all_dogs(sitter_id=1, query_params=query_params))
+            page = handler.get_all_dogs(sitter_id=1, query_params=query_params)
+            encoders = [("jsonify (before)", flask_jsonify), (f"{'orjson' if orjson else 'json'}", lambda body: encode(body, JSON_MIMETYPE))]
+            if MSGPACK_MIMETYPES[0] in OFFERED_MIMETYPES:
+                encoders.append(("msgpack", lambda body: encode(body, MSGPACK_MIMETYPES[0])))
+            for name, encoder in encoders:
+                elapsed = best_of(lambda: encoder(page))
+                print(f"{fields or 'all':<28}{name:<20}{load * 1000:>9.2f}{elapsed * 1000:>11.2f}{len(encoder(page)):>9}")
+
+
+if __name__ == '__main__':
+    main()
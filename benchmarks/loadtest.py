@@ -0,0 +1,161 @@
+import sys
+import os
+
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+
+import argparse
+import asyncio
+import random
+import socket
+import subprocess
+import tempfile
+import time
+import httpx
+
+
+SERVERS = {
+    # the dev server the README runs, one process with a thread per request
+    "sync": ["-m", "flask", "--app", "app", "run", "--port", "{port}", "--with-threads"],
+    # one process, one event loop
+    "async": ["-m", "uvicorn", "asgi:app", "--port", "{port}", "--no-access-log", "--log-level", "warning"],
+}
+OWNERS = 20
+DOGS_PER_OWNER = 25
+DOG = {"name": "Luna", "birth_date": "2017-03-15", "breed": "Mixed breed", "height": 55, "weight": 25, "food_per_day": 500, "gender": "female", "castrated": True, "character": "sensible", "sociable": True, "training": True, "img_url": "https://example.com/luna.jpg"}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(mode, scratch_dir, port):
+    env = dict(os.environ)
+    env.setdefault('JWT_SECRET_KEY', 'loadtest-secret-key-that-is-long-enough-for-hs256')
+    env.setdefault('IMAGEKIT_PUBLIC_KEY', 'public_loadtest')
+    env.setdefault('IMAGEKIT_PRIVATE_KEY', 'private_loadtest')
+    env.setdefault('IMAGEKIT_URL_ENDPOINT', 'https://ik.imagekit.io/loadtest')
+    env.setdefault('BCRYPT_ROUNDS', '4')
+    # one sitter drives all the load, which its own rate limit would cap;
+    # load shedding stays on and its 503s count as errors
+    env.setdefault('SITTER_BURST', str(10 ** 9))
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [project_root, env.get('PYTHONPATH')]))
+    command = [sys.executable] + [part.format(port=port) for part in SERVERS[mode]]
+    server = subprocess.Popen(command, cwd=scratch_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f'http://127.0.0.1:{port}/api/wakeup', timeout=1)
+            return server
+        except httpx.TransportError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError(f"{mode} server did not start")
+
+
+def seed(base_url):
+    """
+    Registers a sitter with owners and dogs and returns the auth headers.
+    The JWT cookies are secure-only, so they are sent by hand over plain http.
+    """
+    with httpx.Client(base_url=base_url) as client:
+        client.post('/api/registration', json={"first_name": "Emily", "last_name": "Johnson", "email": "emily.johnson@example.com", "password": "sitter1"})
+        login = client.post('/api/login', json={"email": "emily.johnson@example.com", "password": "sitter1"})
+        cookies = {cookie.name: cookie.value for cookie in login.cookies.jar}
+        headers = {
+            "Cookie": "; ".join(f"{name}={value}" for name, value in cookies.items()),
+            "X-CSRF-TOKEN": cookies['csrf_access_token'],
+        }
+        owners = [{"first_name": "Leo", "last_name": "Storm", "email": f"owner{i}@example.com", "phone_number": f"+4916324383{i:02d}"} for i in range(OWNERS)]
+        client.post('/api/sitter/owners/bulk', json=owners, headers=headers)
+        for owner_id in range(1, OWNERS + 1):
+            dogs = [{**DOG, "chip_id": owner_id * 1000 + i} for i in range(DOGS_PER_OWNER)]
+            client.post(f'/api/sitter/owners/{owner_id}/dogs/bulk', json=dogs, headers=headers)
+    return headers
+
+
+def random_request():
+    roll = random.random()
+    if roll < 0.5:
+        return 'GET', f'/api/sitter/dogs?limit=50&after={random.randint(0, OWNERS * DOGS_PER_OWNER - 50)}'
+    if roll < 0.8:
+        return 'GET', f'/api/sitter/dogs/{random.randint(1, OWNERS * DOGS_PER_OWNER)}'
+    if roll < 0.95:
+        return 'GET', f'/api/sitter/owners/{random.randint(1, OWNERS)}'
+    return 'PUT', f'/api/sitter/owners/{random.randint(1, OWNERS)}/update'
+
+
+async def hold_idle_connection(port, deadline):
+    # a client that sends half a request line and then goes quiet, like a
+    # stalled mobile connection
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(b"GET /api/wakeup HTTP/1.1\r\nHost: 127.0.0.1\r\n")
+    await writer.drain()
+    await asyncio.sleep(max(deadline - time.perf_counter(), 0))
+    writer.close()
+
+
+async def drive(base_url, port, headers, concurrency, duration, idle_connections):
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async def client_loop(client):
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            method, url = random_request()
+            body = {"first_name": f"Leo{random.randint(0, 999)}"} if method == 'PUT' else None
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, url, json=body, headers=headers)
+                if response.status_code >= 500:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        idle = [asyncio.create_task(hold_idle_connection(port, deadline)) for _ in range(idle_connections)]
+        await asyncio.gather(*(client_loop(client) for _ in range(concurrency)))
+        await asyncio.gather(*idle, return_exceptions=True)
+    return latencies, errors
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(int(len(sorted_values) * fraction), len(sorted_values) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Requests/sec and latency of the Flask (sync) and Starlette (async) entry points")
+    parser.add_argument('--modes', nargs='+', choices=list(SERVERS), default=list(SERVERS))
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--idle-connections', type=int, default=0, help="stalled connections held open during the run")
+    args = parser.parse_args()
+
+    print(f"{args.concurrency} concurrent clients, {args.idle_connections} idle connections, {args.duration:.0f}s per mode")
+    print(f"{'mode':<8}{'requests':>10}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>10}")
+    for mode in args.modes:
+        with tempfile.TemporaryDirectory() as scratch_dir:
+            os.makedirs(os.path.join(scratch_dir, 'data'))
+            port = free_port()
+            server = start_server(mode, scratch_dir, port)
+            try:
+                base_url = f'http://127.0.0.1:{port}'
+                headers = seed(base_url)
+                latencies, errors = asyncio.run(drive(base_url, port, headers, args.concurrency, args.duration, args.idle_connections))
+            finally:
+                server.terminate()
+                server.wait()
+        latencies.sort()
+        print(f"{mode:<8}{len(latencies):>10}{len(latencies) / args.duration:>10.0f}{percentile(latencies, 0.5) * 1000:>10.1f}{percentile(latencies, 0.99) * 1000:>10.1f}{errors:>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+import sys
+import os
+
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+
+from sqlalchemy import insert
+from benchmarks.scratch import scratch_handler, StatementCounter
+from datahandler.models import Skill
+from datahandler.passwords import PasswordHasher
+from exceptions import NotFoundError
+
+
+OWNER = {"first_name": "Leo", "last_name": "Storm", "email": "leo.storm@example.com", "phone_number": "+49 163 2438301"}
+DOG = {"chip_id": 123456789012345, "name": "Luna", "birth_date": "2017-03-15", "breed": "Mixed breed", "height": 55, "weight": 25, "food_per_day": 500, "gender": "female", "castrated": True, "character": "sensible", "sociable": True, "training": True, "img_url": "https://cdn.pixabay.com/photo/2019/04/05/13/56/shepherd-mongrel-4105106_1280.jpg"}
+
+STAY = {"checkin": "2024-05-01", "checkout": "2024-05-05"}
+SKILLS = [{"skill_id": 1, "knowledge": 3}, {"skill_id": 2, "knowledge": 5}]
+
+
+def count_statements(counter, call):
+    counter.reset()
+    try:
+        call()
+    except NotFoundError:
+        pass
+    return counter.count
+
+
+def main():
+    with scratch_handler(password_hasher=PasswordHasher(rounds=4, workers=0)) as handler:
+        sitter = handler.add_sitter(new_sitter_data={"first_name": "Emily", "last_name": "Johnson", "email": "emily.johnson@example.com", "password": "sitter1"})
+        sitter_id = str(sitter['sitter_id'])
+        with handler.engine.begin() as connection:
+            connection.execute(insert(Skill), [{"call": "sit"}, {"call": "down"}])
+        counter = StatementCounter(handler.engine)
+
+        owner_id = None
+        dog_id = None
+
+        def add_owner():
+            nonlocal owner_id
+            owner_id = str(handler.add_owner(sitter_id=sitter_id, new_owner_data=OWNER)['owner_id'])
+
+        def add_dog():
+            nonlocal dog_id
+            dog_id = str(handler.add_dog(sitter_id=sitter_id, owner_id=owner_id, new_dog_data=DOG)['dog_id'])
+
+        calls = [
+            ("get_sitter", lambda: handler.get_sitter(sitter_id=sitter_id)),
+            ("update_sitter", lambda: handler.update_sitter(sitter_id=sitter_id, updated_data={"first_name": "Emma"})),
+            ("add_owner", add_owner),
+            ("get_all_owners", lambda: handler.get_all_owners(sitter_id=sitter_id)),
+            ("get_owner", lambda: handler.get_owner(sitter_id=sitter_id, owner_id=owner_id)),
+            ("update_owner", lambda: handler.update_owner(sitter_id=sitter_id, owner_id=owner_id, updated_data={"first_name": "Finn"})),
+            ("add_dog", add_dog),
+            ("get_all_dogs", lambda: handler.get_all_dogs(sitter_id=sitter_id)),
+            ("get_dog", lambda: handler.get_dog(sitter_id=sitter_id, dog_id=dog_id)),
+            ("get_owner_dogs", lambda: handler.get_owner_dogs(sitter_id=sitter_id, owner_id=owner_id)),
+            ("update_dog", lambda: handler.update_dog(sitter_id=sitter_id, dog_id=dog_id, updated_data=dict(DOG, name="Lu"))),
+            ("add_stay", lambda: handler.add_stay(sitter_id=sitter_id, new_stay_data=dict(STAY, dog_id=dog_id))),
+            ("get_stays", lambda: handler.get_stays(sitter_id=sitter_id)),
+            ("get_availability", lambda: handler.get_availability(sitter_id=sitter_id, query_params={"from": "2024-05-01", "to": "2024-05-31"})),
+            ("update_dog_skills", lambda: handler.update_dog_skills(sitter_id=sitter_id, dog_id=dog_id, skills_data=SKILLS)),
+            ("get_dog_skills", lambda: handler.get_dog_skills(sitter_id=sitter_id, dog_id=dog_id)),
+            ("get_skill_matrix", lambda: handler.get_skill_matrix(sitter_id=sitter_id)),
+            ("search", lambda: handler.search(sitter_id=sitter_id, query_params={"q": "lu"})),
+            ("get_dog (missing)", lambda: handler.get_dog(sitter_id=sitter_id, dog_id="999999")),
+            ("delete_dog", lambda: handler.delete_dog(sitter_id=sitter_id, dog_id=dog_id)),
+            ("delete_owner", lambda: handler.delete_owner(sitter_id=sitter_id, owner_id=owner_id)),
+            ("delete_sitter", lambda: handler.delete_sitter(sitter_id=sitter_id)),
+            ("get_sitter (deleted)", lambda: handler.get_sitter(sitter_id=sitter_id)),
+        ]
+        print(f"{'call':<24}statements")
+        for name, call in calls:
+            print(f"{name:<24}{count_statements(counter, call)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+import sys
+import os
+
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+
+import argparse
+import asyncio
+import threading
+import time
+from benchmarks.conformance import SITTER, OWNER, DOG, backend_handlers
+from benchmarks.scratch import scratch_handler
+from datahandler.async_sqlite_handler import AsyncSQLiteHandler
+from datahandler.cache import CachedHandler
+from datahandler.passwords import PasswordHasher
+from loadshed import LoadShedder
+
+
+def seed(handler):
+    sitter_id = handler.add_sitter(new_sitter_data=SITTER)['sitter_id']
+    owner_id = handler.add_owner(sitter_id=sitter_id, new_owner_data=OWNER)['owner_id']
+    dog_id = handler.add_dog(sitter_id=sitter_id, owner_id=owner_id, new_dog_data={**DOG, "name": "Rex"})['dog_id']
+    return sitter_id, owner_id, dog_id
+
+
+def add_owner_with_dog(handler, sitter_id):
+    owner_id = handler.add_owner(sitter_id=sitter_id, new_owner_data={**OWNER, "email": "mia.storm@example.com", "phone_number": "+49 163 2438302"})['owner_id']
+    handler.add_dog(sitter_id=sitter_id, owner_id=owner_id, new_dog_data={**DOG, "chip_id": DOG["chip_id"] + 1, "name": "Bo"})
+
+
+def orphaned_dogs(exported):
+    owner_ids = {record['owner_id'] for record_type, record in exported if record_type == 'owner'}
+    return [record['dog_id'] for record_type, record in exported if record_type == 'dog' and record['owner_id'] not in owner_ids]
+
+
+def cache_read_racing_write(backends):
+    """
+    A cache miss whose load is still running when update_dog invalidates
+    the dog must not store what it loaded.
+    """
+    with backends["sqlite"]() as handler:
+        sitter_id, _, dog_id = seed(handler)
+        cached = CachedHandler(handler)
+        loaded, resume = threading.Event(), threading.Event()
+
+        def slow_get_dog(**kwargs):
+            dog = type(handler).get_dog(handler, **kwargs)
+            loaded.set()
+            resume.wait()
+            return dog
+
+        handler.get_dog = slow_get_dog
+        reader = threading.Thread(target=cached.get_dog, kwargs={"sitter_id": sitter_id, "dog_id": dog_id})
+        reader.start()
+        loaded.wait()
+        cached.update_dog(sitter_id=sitter_id, dog_id=dog_id, updated_data={**DOG, "name": "Max"})
+        resume.set()
+        reader.join()
+        del handler.get_dog
+        name = cached.get_dog(sitter_id=sitter_id, dog_id=dog_id)['name']
+        return [] if name == "Max" else [f"get_dog after update_dog returned {name!r}, the database has 'Max'"]
+
+
+def export_racing_write(backends):
+    """
+    An owner and their dog added while an export streams must either both
+    be in it or neither, on every backend.
+    """
+    failures = []
+    for name, factory in backends.items():
+        with factory() as handler:
+            sitter_id, _, _ = seed(handler)
+            records = handler.export_sitter_data(sitter_id=sitter_id)
+            try:
+                # the sitter and the first owner, the owners query has run
+                exported = [next(records), next(records)]
+                add_owner_with_dog(handler, sitter_id)
+                exported.extend(records)
+            finally:
+                records.close()
+            if orphaned_dogs(exported):
+                failures.append(f"{name}: the export has dogs {orphaned_dogs(exported)} without their owner")
+    return failures
+
+
+def async_export_racing_write(backends):
+    """
+    export_racing_write through AsyncSQLiteHandler.
+    """
+    with scratch_handler('races.db', password_hasher=PasswordHasher(rounds=4, workers=0)) as handler:
+        sitter_id, _, _ = seed(handler)
+        async_handler = AsyncSQLiteHandler('races.db', password_hasher=handler.password_hasher)
+
+        async def export():
+            records = async_handler.export_sitter_data(sitter_id=sitter_id)
+            try:
+                exported = [await anext(records), await anext(records)]
+                await asyncio.to_thread(add_owner_with_dog, handler, sitter_id)
+                exported.extend([record async for record in records])
+            finally:
+                await records.aclose()
+                await async_handler.engine.dispose()
+            return exported
+
+        orphans = orphaned_dogs(asyncio.run(export()))
+        return [f"the export has dogs {orphans} without their owner"] if orphans else []
+
+
+def shed_waiting_requests(backends, waiting=300):
+    """
+    While every slot stays taken, requests queued on the event loop are
+    turned away once they have waited the interval, however many there
+    are. A slot handed back mid-queue goes to a waiting request.
+    """
+    shedder = LoadShedder(max_concurrent=1, target=0.05, interval=0.5)
+
+    async def timed_enter():
+        started = time.monotonic()
+        admitted = await shedder.enter_async()
+        return admitted, time.monotonic() - started
+
+    async def queue():
+        assert await shedder.enter_async()
+        shed = await asyncio.gather(*(timed_enter() for _ in range(waiting)))
+        # within the target, which is all an overloaded shedder waits
+        threading.Timer(0.02, shedder.leave).start()
+        handed_back = await timed_enter()
+        return shed, handed_back
+
+    shed, (admitted, waited) = asyncio.run(queue())
+    failures = []
+    slowest = max(seconds for _, seconds in shed)
+    if any(admitted for admitted, _ in shed) or slowest > shedder.interval + 0.2:
+        failures.append(f"{waiting} queued requests: {sum(admitted for admitted, _ in shed)} admitted, the slowest shed after {slowest:.2f}s, the interval is {shedder.interval}s")
+    if not admitted or waited > shedder.target:
+        failures.append(f"a slot handed back after 0.02s was {'taken' if admitted else 'missed'} after {waited:.2f}s")
+    return failures
+
+
+CHECKS = {
+    "cache_read_racing_write": cache_read_racing_write,
+    "export_racing_write": export_racing_write,
+    "async_export_racing_write": async_export_racing_write,
+    "shed_waiting_requests": shed_waiting_requests,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay interleavings of concurrent requests step by step and check the outcome")
+    parser.add_argument('--only', choices=list(CHECKS), nargs='+', help="run some of the checks")
+    parser.add_argument('--postgres-url', help="also replay the backend checks on a scratch database of this server, see benchmarks.conformance")
+    args = parser.parse_args()
+    failed = False
+    with backend_handlers(args.postgres_url, sqlite_only=args.postgres_url is None) as backends:
+        for name in args.only or CHECKS:
+            failures = CHECKS[name](backends)
+            for failure in failures:
+                print(f"{name}: {failure}")
+            print(f"{name}: {'failed' if failures else 'ok'}")
+            failed = failed or bool(failures)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,361 @@
+import sys
+import os
+
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+
+import argparse
+import json
+import platform
+import shutil
+import sqlite3
+import subprocess
+import tempfile
+import time
+from datetime import date, datetime, timedelta, timezone
+from statistics import median
+from benchmarks.datagen import SITTER_PASSWORD, add_scale_arguments, scale_from, sitter_password_hash, generate
+from datahandler.migrations import run_migrations
+from datahandler.passwords import PasswordHasher
+from datahandler.sqlite_engine import create_sqlite_engine
+
+
+OWNER = {"first_name": "Leo", "last_name": "Storm"}
+DOG = {"name": "Luna", "birth_date": "2017-03-15", "breed": "Mixed breed", "height": 55, "weight": 25, "food_per_day": 500, "gender": "female", "castrated": True, "character": "sensible", "sociable": True, "training": True, "img_url": "https://cdn.pixabay.com/photo/dogs/luna_1280.jpg"}
+BULK_ITEMS = 100
+SKILLS = [{"skill_id": 1, "knowledge": 3}, {"skill_id": 2, "knowledge": 5}]
+AVAILABILITY = {"from": "2024-02-01", "to": "2024-02-29"}
+
+
+class Targets:
+    """
+    Fresh emails, phone numbers, chip ids and stay dates for the writes, so
+    every run inserts new rows instead of tripping a unique constraint.
+    """
+    def __init__(self):
+        self.counter = 0
+
+
+    def next(self):
+        self.counter += 1
+        return self.counter
+
+
+    def owner(self):
+        n = self.next()
+        return {**OWNER, "email": f"bench.owner{n}@example.com", "phone_number": f"+49170{n:07d}"}
+
+
+    def dog(self):
+        return {**DOG, "chip_id": 900000000000000 + self.next()}
+
+
+    def stay_dates(self):
+        checkin = date(2030, 1, 1) + timedelta(days=10 * self.next())
+        return {"checkin": checkin.isoformat(), "checkout": (checkin + timedelta(days=3)).isoformat()}
+
+
+def measure(call, prepare, runs, warmup):
+    """
+    Times `call(prepare(i))` over warmup + runs iterations, leaving
+    `prepare` (creating the row a delete removes, logging in) untimed.
+    """
+    timings = []
+    for i in range(warmup + runs):
+        value = prepare(i) if prepare else i
+        start = time.perf_counter()
+        call(value)
+        elapsed = time.perf_counter() - start
+        if i >= warmup:
+            timings.append(elapsed * 1000)
+    if not timings:
+        return None
+    timings.sort()
+    return {
+        "median_ms": round(median(timings), 4),
+        "p95_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 4),
+        "min_ms": round(timings[0], 4),
+        "runs": len(timings),
+    }
+
+
+def first_ids(handler, sitter_id):
+    owner_id = handler.get_all_owners(sitter_id=sitter_id, query_params={"limit": 1})["owners"][0]["owner_id"]
+    dog_id = handler.get_owner_dogs(sitter_id=sitter_id, owner_id=owner_id)[0]["dog_id"]
+    stay_id = handler.get_stays(sitter_id=sitter_id, query_params={"limit": 1})["stays"][0]["stay_id"]
+    return owner_id, dog_id, stay_id
+
+
+def handler_cases(handler, scale):
+    """
+    (name, call, prepare, max_runs) for every SQLiteHandler method, run as
+    sitter 1. delete_sitter removes generated sitters from the last one down.
+    """
+    sitter_id = 1
+    owner_id, dog_id, stay_id = first_ids(handler, sitter_id)
+    targets = Targets()
+    victims = list(range(scale["sitters"], 1, -1))
+
+    def new_dog(i):
+        return handler.add_dog(sitter_id=sitter_id, owner_id=owner_id, new_dog_data=targets.dog())["dog_id"]
+
+    def new_owner(i):
+        new_owner_id = handler.add_owner(sitter_id=sitter_id, new_owner_data=targets.owner())["owner_id"]
+        handler.add_dogs_bulk(sitter_id=sitter_id, owner_id=new_owner_id, new_dogs_data=[targets.dog() for _ in range(scale["dogs_per_owner"])])
+        return new_owner_id
+
+    def new_stay(i):
+        return handler.add_stay(sitter_id=sitter_id, new_stay_data={"dog_id": dog_id, **targets.stay_dates()})["stay_id"]
+
+    return [
+        ("authenticate_sitter", lambda i: handler.authenticate_sitter(login_data={"email": "sitter1@example.com", "password": SITTER_PASSWORD}), None, None),
+        ("get_sitter", lambda i: handler.get_sitter(sitter_id=sitter_id), None, None),
+        ("add_sitter", lambda i: handler.add_sitter(new_sitter_data={"first_name": "Emily", "last_name": "Johnson", "email": f"bench.sitter{targets.next()}@example.com", "password": SITTER_PASSWORD}), None, None),
+        ("update_sitter", lambda i: handler.update_sitter(sitter_id=sitter_id, updated_data={"first_name": f"Emma{i}"}), None, None),
+        ("get_all_owners", lambda i: handler.get_all_owners(sitter_id=sitter_id), None, None),
+        ("get_owner", lambda i: handler.get_owner(sitter_id=sitter_id, owner_id=owner_id), None, None),
+        ("add_owner", lambda i: handler.add_owner(sitter_id=sitter_id, new_owner_data=targets.owner()), None, None),
+        ("add_owners_bulk", lambda i: handler.add_owners_bulk(sitter_id=sitter_id, new_owners_data=[targets.owner() for _ in range(BULK_ITEMS)]), None, None),
+        ("update_owner", lambda i: handler.update_owner(sitter_id=sitter_id, owner_id=owner_id, updated_data={"first_name": f"Finn{i}"}), None, None),
+        ("delete_owner", lambda target: handler.delete_owner(sitter_id=sitter_id, owner_id=target), new_owner, None),
+        ("get_all_dogs", lambda i: handler.get_all_dogs(sitter_id=sitter_id), None, None),
+        ("get_all_dogs (page of 50)", lambda i: handler.get_all_dogs(sitter_id=sitter_id, query_params={"limit": 50}), None, None),
+        ("get_dog", lambda i: handler.get_dog(sitter_id=sitter_id, dog_id=dog_id), None, None),
+        ("get_owner_dogs", lambda i: handler.get_owner_dogs(sitter_id=sitter_id, owner_id=owner_id), None, None),
+        ("add_dog", lambda i: handler.add_dog(sitter_id=sitter_id, owner_id=owner_id, new_dog_data=targets.dog()), None, None),
+        ("add_dogs_bulk", lambda i: handler.add_dogs_bulk(sitter_id=sitter_id, owner_id=owner_id, new_dogs_data=[targets.dog() for _ in range(BULK_ITEMS)]), None, None),
+        ("update_dog", lambda i: handler.update_dog(sitter_id=sitter_id, dog_id=dog_id, updated_data={**DOG, "chip_id": 800000000000000 + dog_id, "weight": 20 + i % 10}), None, None),
+        ("delete_dog", lambda target: handler.delete_dog(sitter_id=sitter_id, dog_id=target), new_dog, None),
+        ("get_skill_matrix", lambda i: handler.get_skill_matrix(sitter_id=sitter_id), None, None),
+        ("get_dog_skills", lambda i: handler.get_dog_skills(sitter_id=sitter_id, dog_id=dog_id), None, None),
+        ("update_dog_skills", lambda i: handler.update_dog_skills(sitter_id=sitter_id, dog_id=dog_id, skills_data=SKILLS), None, None),
+        ("search", lambda i: handler.search(sitter_id=sitter_id, query_params={"q": "lu"}), None, None),
+        ("get_stays", lambda i: handler.get_stays(sitter_id=sitter_id), None, None),
+        ("get_stay", lambda i: handler.get_stay(sitter_id=sitter_id, stay_id=stay_id), None, None),
+        ("add_stay", lambda i: handler.add_stay(sitter_id=sitter_id, new_stay_data={"dog_id": dog_id, **targets.stay_dates()}), None, None),
+        ("update_stay", lambda target: handler.update_stay(sitter_id=sitter_id, stay_id=target, updated_data=targets.stay_dates()), new_stay, None),
+        ("delete_stay", lambda target: handler.delete_stay(sitter_id=sitter_id, stay_id=target), new_stay, None),
+        ("get_availability", lambda i: handler.get_availability(sitter_id=sitter_id, query_params=AVAILABILITY), None, None),
+        ("get_versions (dogs)", lambda i: handler.get_versions(sitter_id=sitter_id, resource='dogs'), None, None),
+        ("export_sitter_data", lambda i: sum(1 for _ in handler.export_sitter_data(sitter_id=sitter_id)), None, None),
+        ("delete_sitter", lambda target: handler.delete_sitter(sitter_id=target), lambda i: victims[i], len(victims)),
+    ]
+
+
+class Client:
+    """
+    Flask test client logged in as one sitter, sending the CSRF header the
+    cookie-based JWT setup expects on writes.
+    """
+    def __init__(self, flask_app):
+        self.client = flask_app.test_client()
+        self.client.environ_base["wsgi.url_scheme"] = "https"
+
+
+    def login(self, sitter_id):
+        response = self.client.post('/api/login', json={"email": f"sitter{sitter_id}@example.com", "password": SITTER_PASSWORD})
+        assert response.status_code == 200, response.get_data(as_text=True)
+
+
+    def request(self, method, url, expected=(200, 201), **kwargs):
+        headers = kwargs.pop('headers', {})
+        csrf = self.client.get_cookie('csrf_access_token')
+        if csrf and method != 'GET':
+            headers['X-CSRF-TOKEN'] = csrf.value
+        response = self.client.open(url, method=method, headers=headers, **kwargs)
+        body = response.get_data()
+        assert response.status_code in expected, f"{method} {url} answered {response.status_code}: {body[:200]}"
+        return response
+
+
+def http_cases(client, handler, scale):
+    """
+    (rule, method, call, prepare, max_runs) for the routes of app.py, run as
+    sitter 1. The routes that end the session come last and log in untimed.
+    """
+    sitter_id = 1
+    owner_id, dog_id, stay_id = first_ids(handler, sitter_id)
+    targets = Targets()
+    victims = list(range(scale["sitters"], 1, -1))
+    request = client.request
+
+    def new_dog(i):
+        return request('POST', f'/api/sitter/owners/{owner_id}/dogs/add', json=targets.dog()).get_json()["dog"]["dog_id"]
+
+    def new_owner(i):
+        new_owner_id = request('POST', '/api/sitters/owners/add', json=targets.owner()).get_json()["owner"]["owner_id"]
+        request('POST', f'/api/sitter/owners/{new_owner_id}/dogs/bulk', json=[targets.dog() for _ in range(scale["dogs_per_owner"])])
+        return new_owner_id
+
+    def new_stay(i):
+        return request('POST', '/api/sitter/stays/add', json={"dog_id": dog_id, **targets.stay_dates()}).get_json()["stay"]["stay_id"]
+
+    def relogin(i):
+        client.login(sitter_id)
+
+    def login_victim(i):
+        client.login(victims[i])
+
+    def delete_victim(i):
+        request('DELETE', '/api/sitter/delete')
+        client.login(sitter_id)
+
+    return [
+        ('/api/wakeup', 'GET', lambda i: request('GET', '/api/wakeup'), None, None),
+        ('/api/metrics', 'GET', lambda i: request('GET', '/api/metrics'), None, None),
+        ('/api/auth-params', 'GET', lambda i: request('GET', '/api/auth-params'), None, None),
+        ('/api/registration', 'POST', lambda i: request('POST', '/api/registration', json={"first_name": "Emily", "last_name": "Johnson", "email": f"bench.sitter{targets.next()}@example.com", "password": SITTER_PASSWORD}), None, None),
+        ('/api/login', 'POST', lambda i: client.login(sitter_id), None, None),
+        ('/api/csrf-token', 'GET', lambda i: request('GET', '/api/csrf-token'), None, None),
+        ('/api/sitter', 'GET', lambda i: request('GET', '/api/sitter'), None, None),
+        ('/api/sitter/update', 'PUT', lambda i: request('PUT', '/api/sitter/update', json={"first_name": f"Emma{i}"}), None, None),
+        ('/api/sitter/owners', 'GET', lambda i: request('GET', '/api/sitter/owners'), None, None),
+        ('/api/sitter/owners/<owner_id>', 'GET', lambda i: request('GET', f'/api/sitter/owners/{owner_id}'), None, None),
+        ('/api/sitters/owners/add', 'GET', lambda i: request('GET', '/api/sitters/owners/add'), None, None),
+        ('/api/sitters/owners/add', 'POST', lambda i: request('POST', '/api/sitters/owners/add', json=targets.owner()), None, None),
+        ('/api/sitter/owners/bulk', 'POST', lambda i: request('POST', '/api/sitter/owners/bulk', json=[targets.owner() for _ in range(BULK_ITEMS)]), None, None),
+        ('/api/sitter/owners/<owner_id>/update', 'PUT', lambda i: request('PUT', f'/api/sitter/owners/{owner_id}/update', json={"first_name": f"Finn{i}"}), None, None),
+        ('/api/sitter/owners/<owner_id>/delete', 'DELETE', lambda target: request('DELETE', f'/api/sitter/owners/{target}/delete'), new_owner, None),
+        ('/api/sitter/dogs', 'GET', lambda i: request('GET', '/api/sitter/dogs'), None, None),
+        ('/api/sitter/dogs/<dog_id>', 'GET', lambda i: request('GET', f'/api/sitter/dogs/{dog_id}'), None, None),
+        ('/api/sitter/owners/<owner_id>/dogs/add', 'GET', lambda i: request('GET', f'/api/sitter/owners/{owner_id}/dogs/add'), None, None),
+        ('/api/sitter/owners/<owner_id>/dogs/add', 'POST', lambda i: request('POST', f'/api/sitter/owners/{owner_id}/dogs/add', json=targets.dog()), None, None),
+        ('/api/sitter/owners/<owner_id>/dogs/bulk', 'POST', lambda i: request('POST', f'/api/sitter/owners/{owner_id}/dogs/bulk', json=[targets.dog() for _ in range(BULK_ITEMS)]), None, None),
+        ('/api/sitter/dogs/<dog_id>/update', 'PUT', lambda i: request('PUT', f'/api/sitter/dogs/{dog_id}/update', json={**DOG, "chip_id": 800000000000000 + dog_id, "weight": 20 + i % 10}), None, None),
+        ('/api/sitter/dogs/<dog_id>/delete', 'DELETE', lambda target: request('DELETE', f'/api/sitter/dogs/{target}/delete'), new_dog, None),
+        ('/api/sitter/owners/<owner_id>/dogs', 'GET', lambda i: request('GET', f'/api/sitter/owners/{owner_id}/dogs'), None, None),
+        ('/api/sitter/search', 'GET', lambda i: request('GET', '/api/sitter/search?q=lu'), None, None),
+        ('/api/sitter/skills', 'GET', lambda i: request('GET', '/api/sitter/skills'), None, None),
+        ('/api/sitter/dogs/<dog_id>/skills', 'GET', lambda i: request('GET', f'/api/sitter/dogs/{dog_id}/skills'), None, None),
+        ('/api/sitter/dogs/<dog_id>/skills', 'PUT', lambda i: request('PUT', f'/api/sitter/dogs/{dog_id}/skills', json=SKILLS), None, None),
+        ('/api/sitter/stays', 'GET', lambda i: request('GET', '/api/sitter/stays'), None, None),
+        ('/api/sitter/stays/<stay_id>', 'GET', lambda i: request('GET', f'/api/sitter/stays/{stay_id}'), None, None),
+        ('/api/sitter/stays/add', 'POST', lambda i: request('POST', '/api/sitter/stays/add', json={"dog_id": dog_id, **targets.stay_dates()}), None, None),
+        ('/api/sitter/stays/<stay_id>/update', 'PUT', lambda target: request('PUT', f'/api/sitter/stays/{target}/update', json=targets.stay_dates()), new_stay, None),
+        ('/api/sitter/stays/<stay_id>/delete', 'DELETE', lambda target: request('DELETE', f'/api/sitter/stays/{target}/delete'), new_stay, None),
+        ('/api/sitter/availability', 'GET', lambda i: request('GET', '/api/sitter/availability?from={from}&to={to}'.format(**AVAILABILITY)), None, None),
+        ('/api/sitter/export', 'GET', lambda i: request('GET', '/api/sitter/export'), None, None),
+        ('/api/logout', 'POST', lambda i: request('POST', '/api/logout'), relogin, None),
+        ('/api/sitter/delete', 'DELETE', delete_victim, login_victim, len(victims)),
+    ]
+
+
+def run_cases(cases, runs, warmup, results, prefix):
+    for name, call, prepare, max_runs in cases:
+        case_runs = runs if max_runs is None else min(runs, max_runs - warmup)
+        result = measure(call, prepare, case_runs, warmup) if case_runs > 0 else None
+        if result is None:
+            print(f"{prefix} {name}: skipped, not enough data to run it")
+            continue
+        results[f"{prefix} {name}"] = result
+        print(f"{prefix + ' ' + name:<58}{result['median_ms']:>10.3f}{result['p95_ms']:>10.3f}")
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=project_root, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def scratch_copy(template, scratch_dir, name):
+    os.makedirs(os.path.join(scratch_dir, name, 'data'))
+    shutil.copyfile(template, os.path.join(scratch_dir, name, 'data', 'pawliday.db'))
+    return os.path.join(scratch_dir, name)
+
+
+def run_handler(workdir, scale, args, results):
+    from datahandler.sqlite_handler import SQLiteHandler
+    os.chdir(workdir)
+    handler = SQLiteHandler('pawliday.db', password_hasher=PasswordHasher(rounds=args.bcrypt_rounds, workers=0))
+    try:
+        run_cases(handler_cases(handler, scale), args.runs, args.warmup, results, 'handler')
+    finally:
+        handler.engine.dispose()
+        handler.password_hasher.shutdown()
+
+
+def run_http(workdir, scale, args, results):
+    os.chdir(workdir)
+    # app.py reads its configuration from the environment at import time
+    os.environ.setdefault('JWT_SECRET_KEY', 'benchmark-secret-key-that-is-long-enough-for-hs256')
+    os.environ.setdefault('IMAGEKIT_PUBLIC_KEY', 'public_benchmark')
+    os.environ.setdefault('IMAGEKIT_PRIVATE_KEY', 'private_benchmark')
+    os.environ.setdefault('IMAGEKIT_URL_ENDPOINT', 'https://ik.imagekit.io/benchmark')
+    os.environ['BCRYPT_ROUNDS'] = str(args.bcrypt_rounds)
+    # the per-client and per-sitter limits would turn repeated calls into 429s
+    for limit in ('AUTH_PARAMS', 'LOGIN', 'REGISTRATION', 'SITTER'):
+        os.environ[f'{limit}_BURST'] = str(10 ** 9)
+    os.environ.pop('METRICS_TOKEN', None)
+    from app import app as flask_app, data_manager
+    client = Client(flask_app)
+    client.login(1)
+    cases = http_cases(client, data_manager, scale)
+    covered = {(rule, method) for rule, method, *_ in cases}
+    uncovered = sorted(
+        f"{method} {rule.rule}" for rule in flask_app.url_map.iter_rules() if rule.endpoint != 'static'
+        for method in rule.methods - {'HEAD', 'OPTIONS'} if (rule.rule, method) not in covered
+    )
+    for route in uncovered:
+        print(f"http {route}: not benchmarked, add it to http_cases")
+    run_cases([(f"{method} {rule}", call, prepare, max_runs) for rule, method, call, prepare, max_runs in cases], args.runs, args.warmup, results, 'http')
+    return uncovered
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time every SQLiteHandler method and every app.py route on a synthetic data set")
+    add_scale_arguments(parser)
+    parser.add_argument('--runs', type=int, default=20, help="timed runs per call, after the warmup")
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--only', choices=('handler', 'http'), help="run one half of the suite")
+    parser.add_argument('--out', help="write the results as JSON, e.g. benchmarks/results/before.json")
+    args = parser.parse_args()
+    scale = scale_from(args)
+    results = {}
+    uncovered = []
+    previous_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        template = os.path.join(scratch_dir, 'template.db')
+        engine = create_sqlite_engine(f'sqlite:///{template}')
+        run_migrations(engine)
+        start = time.perf_counter()
+        counts = generate(engine, **scale, password_hash=sitter_password_hash(args.bcrypt_rounds), seed=args.seed)
+        engine.dispose()
+        print(', '.join(f"{count} {name}" for name, count in counts.items()), f"generated in {time.perf_counter() - start:.1f} s")
+        print(f"{'call':<58}{'median ms':>10}{'p95 ms':>10}")
+        try:
+            if args.only in (None, 'handler'):
+                run_handler(scratch_copy(template, scratch_dir, 'handler'), scale, args, results)
+            if args.only in (None, 'http'):
+                uncovered = run_http(scratch_copy(template, scratch_dir, 'http'), scale, args, results)
+        finally:
+            os.chdir(previous_cwd)
+    report = {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "scale": scale,
+            "seed": args.seed,
+            "bcrypt_rounds": args.bcrypt_rounds,
+            "runs": args.runs,
+            "warmup": args.warmup,
+            "rows": counts,
+        },
+        "results": results,
+        "uncovered_routes": uncovered,
+    }
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, 'w') as out:
+            json.dump(report, out, indent=2)
+        print(f"results written to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+import sys
+import os
+
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+
+import shutil
+import socket
+import subprocess
+import tempfile
+import uuid
+from contextlib import contextmanager
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from datahandler.sqlite_handler import SQLiteHandler
+from datahandler.postgres_handler import PostgresHandler
+
+
+@contextmanager
+def scratch_handler(db_file_name='bench.db', **handler_kwargs):
+    """
+    SQLiteHandler resolves its database under ./data, so benchmarks run from
+    a throwaway working directory and never touch data/pawliday.db.
+    """
+    previous_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        os.makedirs(os.path.join(scratch_dir, 'data'))
+        os.chdir(scratch_dir)
+        try:
+            handler = SQLiteHandler(db_file_name, **handler_kwargs)
+            try:
+                yield handler
+            finally:
+                handler.engine.dispose()
+                handler.password_hasher.shutdown()
+        finally:
+            os.chdir(previous_cwd)
+
+
+@contextmanager
+def local_postgres():
+    """
+    A throwaway PostgreSQL cluster in a temporary directory, listening on a
+    free port on localhost only, for when no server URL is given. Yields the
+    URL of its postgres database, or None when initdb and pg_ctl are not on
+    PATH. initdb refuses to run as root.
+    """
+    if not (shutil.which('initdb') and shutil.which('pg_ctl')):
+        yield None
+        return
+    with tempfile.TemporaryDirectory() as cluster_dir:
+        data_dir = os.path.join(cluster_dir, 'data')
+        # without -E the cluster follows the locale, SQL_ASCII under C, and
+        # psycopg then hands back bytes instead of str
+        initdb = subprocess.run(['initdb', '-D', data_dir, '-U', 'postgres', '--auth=trust', '--no-sync', '-E', 'UTF8', '--locale=C'], capture_output=True, text=True)
+        if initdb.returncode:
+            raise RuntimeError(f"initdb failed: {initdb.stderr.strip()}")
+        with socket.socket() as probe:
+            probe.bind(('127.0.0.1', 0))
+            port = probe.getsockname()[1]
+        options = f"-p {port} -c listen_addresses=127.0.0.1 -k {cluster_dir} -c fsync=off"
+        # the server logs to a file; sharing our pipes it would keep run() waiting for them to close
+        subprocess.run(['pg_ctl', '-D', data_dir, '-o', options, '-l', os.path.join(cluster_dir, 'server.log'), '-w', 'start'], check=True, capture_output=True)
+        try:
+            yield f'postgresql+psycopg://postgres@127.0.0.1:{port}/postgres'
+        finally:
+            subprocess.run(['pg_ctl', '-D', data_dir, '-m', 'immediate', 'stop'], capture_output=True)
+
+
+@contextmanager
+def scratch_postgres_handler(server_url, **handler_kwargs):
+    """
+    PostgresHandler on a new database created on the server behind
+    server_url and dropped afterwards, so runs never see each other's rows
+    or touch an existing database.
+    """
+    server_url = make_url(server_url)
+    database = f'pawliday_bench_{uuid.uuid4().hex[:12]}'
+    admin_engine = create_engine(server_url, isolation_level='AUTOCOMMIT')
+    try:
+        with admin_engine.connect() as connection:
+            connection.exec_driver_sql(f'CREATE DATABASE {database}')
+        try:
+            handler = PostgresHandler(server_url.set(database=database), **handler_kwargs)
+            try:
+                yield handler
+            finally:
+                handler.engine.dispose()
+                handler.password_hasher.shutdown()
+        finally:
+            with admin_engine.connect() as connection:
+                connection.exec_driver_sql(f'DROP DATABASE IF EXISTS {database} WITH (FORCE)')
+    finally:
+        admin_engine.dispose()
+
+
+class StatementCounter:
+    def __init__(self, engine):
+        self.statements = []
+        event.listen(engine, 'before_cursor_execute', self._record)
+
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+
+    def reset(self):
+        self.statements.clear()
+
+
+    @property
+    def count(self):
+        return len(self.statements)
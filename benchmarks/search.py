@@ -0,0 +1,89 @@
+import sys
+import os
+
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+
+import argparse
+import random
+import time
+from statistics import median
+from sqlalchemy import insert, or_
+from benchmarks.scratch import scratch_handler
+from datahandler.models import Sitter, Owner, Dog
+from datahandler.passwords import PasswordHasher
+from datahandler.sqlalchemy_handler import dog_serializer, owner_serializer
+
+
+NAMES = ["Luna", "Bella", "Balu", "Lucky", "Rocky", "Sammy", "Nala", "Emma", "Paula", "Charlie", "Bruno", "Maja", "Oskar", "Lotte", "Filou", "Amy"]
+BREEDS = ["Labrador", "Pug", "Boxer", "Beagle", "Mixed breed", "Poodle", "Dachshund", "Border Collie", "Shepherd", "Lucerne Hound"]
+CHARACTERS = ["sensible", "playful", "lazy and lovely", "shy with strangers", "loves water"]
+FIRST_NAMES = ["Leo", "Finn", "Mia", "Lena", "Paul", "Lukas", "Anna", "Jonas", "Lea", "Max"]
+LAST_NAMES = ["Storm", "Wilder", "Müller", "Schmidt", "Weber", "Becker", "Lucas", "Hoffmann", "Koch", "Richter"]
+QUERIES = ["lu", "luna", "bor col", "müller", "0163 00012", "lea weber", "lazy lov", "mia@exam"]
+REPEATS = 20
+
+
+def seed(handler, sitters, dogs):
+    random.seed(1)
+    owners = dogs // 2
+    with handler.engine.begin() as connection:
+        connection.execute(insert(Sitter), [
+            {"first_name": "Emily", "last_name": "Johnson", "email": f"sitter{i}@example.com", "password": "x"}
+            for i in range(sitters)
+        ])
+        connection.execute(insert(Owner), [
+            {"sitter_id": i % sitters + 1, "first_name": random.choice(FIRST_NAMES), "last_name": random.choice(LAST_NAMES), "email": f"{random.choice(FIRST_NAMES).lower()}{i}@example.com", "phone_number": f"+49163{i:07d}"}
+            for i in range(owners)
+        ])
+        connection.execute(insert(Dog), [
+            {"chip_id": i, "owner_id": i % owners + 1, "name": random.choice(NAMES), "birth_date": "2017-03-15", "breed": random.choice(BREEDS), "height": 55, "weight": 25, "food_per_day": 500, "gender": "female", "castrated": True, "character": random.choice(CHARACTERS), "sociable": True, "training": True, "img_url": "https://example.com/dog.jpg"}
+            for i in range(dogs)
+        ])
+
+
+def like_search(handler, sitter_id, query, limit):
+    # the same lookup without the index: every word as a substring of any column
+    words = query.split()
+    with handler.Session() as session:
+        dog_query = session.query(*dog_serializer.columns).join(Owner).filter(Owner.sitter_id == sitter_id)
+        owner_query = session.query(*owner_serializer.columns).filter(Owner.sitter_id == sitter_id)
+        for word in words:
+            dog_query = dog_query.filter(or_(Dog.name.ilike(f'%{word}%'), Dog.breed.ilike(f'%{word}%'), Dog.character.ilike(f'%{word}%')))
+            owner_query = owner_query.filter(or_(Owner.first_name.ilike(f'%{word}%'), Owner.last_name.ilike(f'%{word}%'), Owner.email.ilike(f'%{word}%'), Owner.phone_number.ilike(f'%{word}%')))
+        return dog_query.limit(limit).all(), owner_query.limit(limit).all()
+
+
+def median_ms(call):
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - start)
+    return median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FTS5 search vs LIKE scans over the sitter's dogs and owners")
+    parser.add_argument('--dogs', type=int, default=100000)
+    parser.add_argument('--sitters', type=int, default=1, help="rows are spread evenly over this many sitters")
+    parser.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args()
+    with scratch_handler(password_hasher=PasswordHasher(rounds=4, workers=0)) as handler:
+        start = time.perf_counter()
+        seed(handler, args.sitters, args.dogs)
+        print(f"{args.dogs} dogs, {args.dogs // 2} owners, {args.sitters} sitters, seeded and indexed in {time.perf_counter() - start:.1f} s")
+        print(f"median of {REPEATS}, limit {args.limit}")
+        print(f"{'q':<12}{'hits':>12}{'fts ms':>10}{'like ms':>10}")
+        for query in QUERIES:
+            results = handler.search(sitter_id=1, query_params={"q": query, "limit": args.limit})
+            fts = median_ms(lambda: handler.search(sitter_id=1, query_params={"q": query, "limit": args.limit}))
+            like = median_ms(lambda: like_search(handler, 1, query, args.limit))
+            print(f"{query:<12}{len(results['dogs']):>6}/{len(results['owners']):<5}{fts:>10.2f}{like:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+import sys
+import os
+
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+
+import time
+from sqlalchemy import insert
+from sqlalchemy.inspection import inspect
+from benchmarks.scratch import scratch_handler
+from datahandler.models import Sitter, Owner, Dog
+from datahandler.passwords import PasswordHasher
+from datahandler.serializers import SERIALIZERS, DERIVED_FIELDS
+
+
+ROWS = 10000
+REPEATS = 5
+
+
+def to_dict(obj):
+    # the reflection-based serializer SQLiteHandler used before the registry
+    dict_obj = {c.key: getattr(obj, c.key) for c in inspect(obj).mapper.column_attrs}
+    dict_obj.pop('password', None)
+    # the image variants are only served on request, the registry leaves them out
+    for key in DERIVED_FIELDS.get(type(obj), ()):
+        dict_obj.pop(key, None)
+    return dict_obj
+
+
+def best_of(call):
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    with scratch_handler(password_hasher=PasswordHasher(rounds=4, workers=0)) as handler:
+        with handler.engine.begin() as connection:
+            connection.execute(insert(Sitter), [{"first_name": "Emily", "last_name": "Johnson", "email": "emily.johnson@example.com", "password": "x"}])
+            connection.execute(insert(Owner), [{"sitter_id": 1, "first_name": "Leo", "last_name": "Storm", "email": "leo.storm@example.com", "phone_number": "+491632438301"}])
+            connection.execute(insert(Dog), [
+                {"chip_id": chip_id, "owner_id": 1, "name": "Luna", "birth_date": "2017-03-15", "breed": "Mixed breed", "height": 55, "weight": 25, "food_per_day": 500, "gender": "female", "castrated": True, "character": "sensible", "sociable": True, "training": True, "img_url": "https://example.com/luna.jpg"}
+                for chip_id in range(ROWS)
+            ])
+        dog_serializer = SERIALIZERS[Dog]
+
+        def orm_to_dict():
+            with handler.Session() as session:
+                return [to_dict(obj) for obj in session.query(Dog).all()]
+
+        def orm_registry():
+            with handler.Session() as session:
+                return [dog_serializer.from_obj(obj) for obj in session.query(Dog).all()]
+
+        def row_registry():
+            with handler.Session() as session:
+                return dog_serializer.from_rows(session.query(*dog_serializer.columns).all())
+
+        assert orm_to_dict() == row_registry()
+        baseline = best_of(orm_to_dict)
+        print(f"{ROWS} dog rows, best of {REPEATS}")
+        print(f"{'variant':<36}{'ms':>8}{'speedup':>10}")
+        for name, call in (("ORM objects + to_dict (before)", orm_to_dict), ("ORM objects + registry", orm_registry), ("Row tuples + registry (handler)", row_registry)):
+            elapsed = best_of(call)
+            print(f"{name:<36}{elapsed * 1000:>8.1f}{baseline / elapsed:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
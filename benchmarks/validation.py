@@ -0,0 +1,71 @@
+import sys
+import os
+
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+
+import time
+import phonenumbers
+from datahandler.schemas import OwnerSchema, DogSchema, list_adapter, normalize_phone_number, _normalize_phone_number
+
+
+ITEMS = 1000
+REPEATS = 5
+DISTINCT_PHONE_NUMBERS = 50
+
+
+OWNERS = [
+    {"first_name": "Leo", "last_name": "Storm", "email": f"leo.storm{index}@example.com", "phone_number": f"+49 163 24{index % DISTINCT_PHONE_NUMBERS:05d}"}
+    for index in range(ITEMS)
+]
+DOGS = [
+    {"chip_id": index, "name": "Luna", "birth_date": "2017-03-15", "breed": "Mixed breed", "height": 55, "weight": 25, "food_per_day": 500, "gender": "female", "castrated": True, "character": "sensible", "sociable": True, "training": True, "img_url": "https://example.com/luna.jpg"}
+    for index in range(ITEMS)
+]
+
+
+def uncached_phone_number(value):
+    # OwnerSchema's validator before the cache
+    number = phonenumbers.parse(value, "DE")
+    if not phonenumbers.is_valid_number(number):
+        raise ValueError("Invalid phone number for Germany")
+    return phonenumbers.format_number(number, phonenumbers.PhoneNumberFormat.E164)
+
+
+def best_of(call, setup=None):
+    timings = []
+    for _ in range(REPEATS):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    owner_adapter = list_adapter(OwnerSchema)
+    dog_adapter = list_adapter(DogSchema)
+    assert [owner.model_dump() for owner in owner_adapter.validate_python(OWNERS)] == [OwnerSchema(**owner).model_dump() for owner in OWNERS]
+    variants = (
+        ("phonenumbers per owner (before)", lambda: [uncached_phone_number(owner["phone_number"]) for owner in OWNERS], None),
+        ("normalize_phone_number, cold cache", lambda: [normalize_phone_number(owner["phone_number"]) for owner in OWNERS], _normalize_phone_number.cache_clear),
+        ("normalize_phone_number, warm cache", lambda: [normalize_phone_number(owner["phone_number"]) for owner in OWNERS], None),
+        ("OwnerSchema per item, cold cache", lambda: [OwnerSchema(**owner) for owner in OWNERS], _normalize_phone_number.cache_clear),
+        ("OwnerSchema per item, warm cache", lambda: [OwnerSchema(**owner) for owner in OWNERS], None),
+        ("OwnerSchema list adapter", lambda: owner_adapter.validate_python(OWNERS), None),
+        ("DogSchema per item", lambda: [DogSchema(**dog) for dog in DOGS], None),
+        ("DogSchema list adapter", lambda: dog_adapter.validate_python(DOGS), None),
+    )
+    print(f"{ITEMS} items ({DISTINCT_PHONE_NUMBERS} distinct phone numbers), best of {REPEATS}")
+    print(f"{'variant':<38}{'ms':>8}{'us/item':>10}")
+    for name, call, setup in variants:
+        elapsed = best_of(call, setup)
+        print(f"{name:<38}{elapsed * 1000:>8.2f}{elapsed * 1e6 / ITEMS:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -2,66 +2,186 @@ from abc import ABC, abstractmethod
 
 
 class AbstractDataHandler(ABC):
+    """
+    What app.py needs from a storage backend. Ids may arrive as strings from
+    the URL. Errors are raised as NotFoundError, InvalidInputError,
+    DatabaseError or ServiceBusyError from exceptions.py, which the routes
+    turn into 404, 400 and 503. List reads take the validated query string
+    as query_params and page with limit/after, returning next_after.
+    """
 
 
     @abstractmethod
-    def get_all_owners(self):
+    def authenticate_sitter(self, login_data):
         """
+        Returns the sitter for {"email", "password"}.
         """
         pass
 
-    
+
     @abstractmethod
-    def add_owner(self, name, email, phone_number):
-        """
-        """
+    def get_sitter(self, sitter_id):
+        pass
+
+
+    @abstractmethod
+    def add_sitter(self, new_sitter_data):
+        pass
+
+
+    @abstractmethod
+    def update_sitter(self, sitter_id, updated_data):
         pass
 
 
     @abstractmethod
-    def update_owner(self, owner_id, name, email, phone_number):
+    def delete_sitter(self, sitter_id):
         """
+        Deletes the sitter with their owners, dogs and stays.
         """
         pass
-    
+
 
     @abstractmethod
-    def delete_owner(self, owner_id):
+    def get_all_owners(self, sitter_id, query_params=None):
         """
+        Returns {"owners", "next_after"}.
         """
         pass
 
 
     @abstractmethod
-    def add_dog(self, chip_id, owner_id, name, birth_date, breed, height, weight, food_per_day, gender, castrated, character, sociable, training, img_url):
+    def get_owner(self, sitter_id, owner_id):
+        pass
+
+
+    @abstractmethod
+    def add_owner(self, sitter_id, new_owner_data):
+        pass
+
+
+    @abstractmethod
+    def add_owners_bulk(self, sitter_id, new_owners_data):
         """
+        Returns {"created", "errors"}, errors by index into new_owners_data.
         """
         pass
-    
-    
+
+
+    @abstractmethod
+    def update_owner(self, sitter_id, owner_id, updated_data):
+        pass
+
+
+    @abstractmethod
+    def delete_owner(self, sitter_id, owner_id):
+        pass
+
+
     @abstractmethod
-    def get_owner_dogs(self, owner_id):
+    def get_all_dogs(self, sitter_id, query_params=None):
         """
+        Returns {"dogs", "next_after"}.
         """
         pass
-        
+
+
+    @abstractmethod
+    def get_dog(self, sitter_id, dog_id, query_params=None):
+        pass
+
 
     @abstractmethod
-    def get_dog(self, dog_id):
+    def add_dog(self, sitter_id, owner_id, new_dog_data):
+        pass
+
+
+    @abstractmethod
+    def add_dogs_bulk(self, sitter_id, owner_id, new_dogs_data):
+        pass
+
+
+    @abstractmethod
+    def update_dog(self, sitter_id, dog_id, updated_data):
+        pass
+
+
+    @abstractmethod
+    def delete_dog(self, sitter_id, dog_id):
+        pass
+
+
+    @abstractmethod
+    def get_owner_dogs(self, sitter_id, owner_id, query_params=None):
+        pass
+
+
+    @abstractmethod
+    def get_skill_matrix(self, sitter_id):
+        pass
+
+
+    @abstractmethod
+    def get_dog_skills(self, sitter_id, dog_id):
+        pass
+
+
+    @abstractmethod
+    def update_dog_skills(self, sitter_id, dog_id, skills_data):
+        pass
+
+
+    @abstractmethod
+    def search(self, sitter_id, query_params=None):
         """
+        Returns {"dogs", "owners"} matching query_params["q"].
         """
         pass
 
 
     @abstractmethod
-    def update_dog(self, dog_id, chip_id, owner_id, name, birth_date, breed, height, weight, food_per_day, gender, castrated, character, sociable, training, img_url):
+    def get_stays(self, sitter_id, query_params=None):
+        pass
+
+
+    @abstractmethod
+    def get_stay(self, sitter_id, stay_id):
+        pass
+
+
+    @abstractmethod
+    def add_stay(self, sitter_id, new_stay_data):
+        pass
+
+
+    @abstractmethod
+    def update_stay(self, sitter_id, stay_id, updated_data):
+        pass
+
+
+    @abstractmethod
+    def delete_stay(self, sitter_id, stay_id):
+        pass
+
+
+    @abstractmethod
+    def get_availability(self, sitter_id, query_params=None):
+        pass
+
+
+    @abstractmethod
+    def get_versions(self, sitter_id, resource, resource_id=None, query_params=None):
         """
+        Returns the (id, version) pairs the matching read would return, for
+        ETags without loading whole rows.
         """
         pass
 
 
     @abstractmethod
-    def delete_dog(dog_id):
+    def export_sitter_data(self, sitter_id):
         """
+        Returns an iterator of (record_type, record) pairs, the sitter
+        first. Its close() frees the read, whether it was consumed or not.
         """
         pass
@@ -0,0 +1,239 @@
+import sys
+import os
+
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+
+from contextlib import nullcontext
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.exc import OperationalError, TimeoutError as PoolTimeoutError
+from pydantic import ValidationError
+from datahandler.abstract_handler import AbstractDataHandler
+from datahandler.models import Sitter
+from datahandler.schemas import LoginSchema, SitterSchema, UpdateSitterSchema
+from datahandler.passwords import PasswordHasher
+from datahandler.sqlite_engine import create_async_sqlite_engine
+from datahandler.sqlite_handler import SQLiteHandler
+from datahandler.replicas import ReplicaRouter
+from datahandler.sqlalchemy_handler import parse_id, export_statements, sitter_serializer, EXPORT_BATCH_SIZE
+from exceptions import NotFoundError, InvalidInputError, DatabaseError, ServiceBusyError
+
+
+class _RunSyncSession:
+    """
+    Stands in for a sessionmaker inside AsyncSession.run_sync: both
+    Session() and Session.begin() hand out the one sync session, and the
+    surrounding AsyncSession.begin() owns the transaction.
+    """
+    def __init__(self, session):
+        self.session = session
+
+
+    def __call__(self):
+        return nullcontext(self.session)
+
+
+    def begin(self):
+        return nullcontext(self.session)
+
+
+class _BoundHandler(SQLiteHandler):
+    def __init__(self, session, password_hasher, cascade_deletes, image_variants):
+        self.password_hasher = password_hasher
+        self.cascade_deletes = cascade_deletes
+        self.image_variants = image_variants
+        self.Session = _RunSyncSession(session)
+        # the async handler has no replicas, every read uses the one session
+        self.router = ReplicaRouter(self.Session, selection='round_robin', sticky_seconds=0, max_keys=0)
+
+
+class AsyncSQLiteHandler(AbstractDataHandler):
+    """
+    Async counterpart of SQLiteHandler on an aiosqlite engine. Queries and
+    error mapping are SQLiteHandler's own, run through AsyncSession.run_sync,
+    so both handlers answer identically. bcrypt is awaited on the password
+    pool instead of running inside a transaction.
+    """
+    def __init__(self, db_file_name, password_hasher=None, engine_profile=None, image_variants=None):
+        self.password_hasher = password_hasher or PasswordHasher()
+        # schema setup is synchronous and runs once, through the sync handler
+        schema_handler = SQLiteHandler(db_file_name, password_hasher=self.password_hasher, engine_profile=engine_profile, image_variants=image_variants)
+        schema_handler.engine.dispose()
+        self.cascade_deletes = schema_handler.cascade_deletes
+        self.image_variants = schema_handler.image_variants
+        self.engine = create_async_sqlite_engine(f'sqlite+aiosqlite:///data/{db_file_name}', engine_profile)
+        self.Session = async_sessionmaker(bind=self.engine, expire_on_commit=False)
+
+
+    async def _run_sync(self, call):
+        try:
+            async with self.Session.begin() as session:
+                return await session.run_sync(lambda sync_session: call(_BoundHandler(sync_session, self.password_hasher, self.cascade_deletes, self.image_variants)))
+        except (OperationalError, PoolTimeoutError):
+            raise DatabaseError("Database unavailable")
+
+
+    async def authenticate_sitter(self, login_data):
+        try:
+            valid_data = LoginSchema(**login_data)
+        except ValidationError:
+            raise InvalidInputError("Invalid input")
+        password_hash, sitter = await self._run_sync(lambda handler: handler._find_login(valid_data.email))
+        if not await self.password_hasher.verify_async(valid_data.password, password_hash):
+            raise InvalidInputError("Email or password is wrong")
+        if self.password_hasher.needs_rehash(password_hash):
+            try:
+                new_password_hash = await self.password_hasher.hash_async(valid_data.password)
+            except ServiceBusyError:
+                return sitter
+            await self._run_sync(lambda handler: handler._replace_password_hash(sitter['sitter_id'], password_hash, new_password_hash))
+        return sitter
+
+
+    async def get_sitter(self, sitter_id):
+        return await self._run_sync(lambda handler: handler.get_sitter(sitter_id=sitter_id))
+
+
+    async def add_sitter(self, new_sitter_data):
+        try:
+            valid_data = SitterSchema(**new_sitter_data)
+        except ValidationError:
+            raise InvalidInputError("Invalid input")
+        hashed_password = await self.password_hasher.hash_async(valid_data.password)
+        return await self._run_sync(lambda handler: handler._insert_sitter(valid_data, hashed_password))
+
+
+    async def update_sitter(self, sitter_id, updated_data):
+        try:
+            valid_updated_data = UpdateSitterSchema(**updated_data).model_dump(exclude_unset=True)
+        except ValidationError:
+            raise InvalidInputError("Invalid input")
+        if 'password' in valid_updated_data:
+            valid_updated_data['password'] = await self.password_hasher.hash_async(valid_updated_data['password'])
+        return await self._run_sync(lambda handler: handler._update_sitter_row(sitter_id, valid_updated_data))
+
+
+    async def delete_sitter(self, sitter_id):
+        return await self._run_sync(lambda handler: handler.delete_sitter(sitter_id=sitter_id))
+
+
+    async def get_all_owners(self, sitter_id, query_params=None):
+        return await self._run_sync(lambda handler: handler.get_all_owners(sitter_id=sitter_id, query_params=query_params))
+
+
+    async def get_owner(self, sitter_id, owner_id):
+        return await self._run_sync(lambda handler: handler.get_owner(sitter_id=sitter_id, owner_id=owner_id))
+
+
+    async def add_owner(self, sitter_id, new_owner_data):
+        return await self._run_sync(lambda handler: handler.add_owner(sitter_id=sitter_id, new_owner_data=new_owner_data))
+
+
+    async def add_owners_bulk(self, sitter_id, new_owners_data):
+        return await self._run_sync(lambda handler: handler.add_owners_bulk(sitter_id=sitter_id, new_owners_data=new_owners_data))
+
+
+    async def update_owner(self, sitter_id, owner_id, updated_data):
+        return await self._run_sync(lambda handler: handler.update_owner(sitter_id=sitter_id, owner_id=owner_id, updated_data=updated_data))
+
+
+    async def delete_owner(self, sitter_id, owner_id):
+        return await self._run_sync(lambda handler: handler.delete_owner(sitter_id=sitter_id, owner_id=owner_id))
+
+
+    async def get_all_dogs(self, sitter_id, query_params=None):
+        return await self._run_sync(lambda handler: handler.get_all_dogs(sitter_id=sitter_id, query_params=query_params))
+
+
+    async def get_dog(self, sitter_id, dog_id, query_params=None):
+        return await self._run_sync(lambda handler: handler.get_dog(sitter_id=sitter_id, dog_id=dog_id, query_params=query_params))
+
+
+    async def add_dog(self, sitter_id, owner_id, new_dog_data):
+        return await self._run_sync(lambda handler: handler.add_dog(sitter_id=sitter_id, owner_id=owner_id, new_dog_data=new_dog_data))
+
+
+    async def add_dogs_bulk(self, sitter_id, owner_id, new_dogs_data):
+        return await self._run_sync(lambda handler: handler.add_dogs_bulk(sitter_id=sitter_id, owner_id=owner_id, new_dogs_data=new_dogs_data))
+
+
+    async def update_dog(self, sitter_id, dog_id, updated_data):
+        return await self._run_sync(lambda handler: handler.update_dog(sitter_id=sitter_id, dog_id=dog_id, updated_data=updated_data))
+
+
+    async def delete_dog(self, sitter_id, dog_id):
+        return await self._run_sync(lambda handler: handler.delete_dog(sitter_id=sitter_id, dog_id=dog_id))
+
+
+    async def get_owner_dogs(self, sitter_id, owner_id, query_params=None):
+        return await self._run_sync(lambda handler: handler.get_owner_dogs(sitter_id=sitter_id, owner_id=owner_id, query_params=query_params))
+
+
+    async def get_skill_matrix(self, sitter_id):
+        return await self._run_sync(lambda handler: handler.get_skill_matrix(sitter_id=sitter_id))
+
+
+    async def get_dog_skills(self, sitter_id, dog_id):
+        return await self._run_sync(lambda handler: handler.get_dog_skills(sitter_id=sitter_id, dog_id=dog_id))
+
+
+    async def update_dog_skills(self, sitter_id, dog_id, skills_data):
+        return await self._run_sync(lambda handler: handler.update_dog_skills(sitter_id=sitter_id, dog_id=dog_id, skills_data=skills_data))
+
+
+    async def search(self, sitter_id, query_params=None):
+        return await self._run_sync(lambda handler: handler.search(sitter_id=sitter_id, query_params=query_params))
+
+
+    async def get_stays(self, sitter_id, query_params=None):
+        return await self._run_sync(lambda handler: handler.get_stays(sitter_id=sitter_id, query_params=query_params))
+
+
+    async def get_stay(self, sitter_id, stay_id):
+        return await self._run_sync(lambda handler: handler.get_stay(sitter_id=sitter_id, stay_id=stay_id))
+
+
+    async def add_stay(self, sitter_id, new_stay_data):
+        return await self._run_sync(lambda handler: handler.add_stay(sitter_id=sitter_id, new_stay_data=new_stay_data))
+
+
+    async def update_stay(self, sitter_id, stay_id, updated_data):
+        return await self._run_sync(lambda handler: handler.update_stay(sitter_id=sitter_id, stay_id=stay_id, updated_data=updated_data))
+
+
+    async def delete_stay(self, sitter_id, stay_id):
+        return await self._run_sync(lambda handler: handler.delete_stay(sitter_id=sitter_id, stay_id=stay_id))
+
+
+    async def get_availability(self, sitter_id, query_params=None):
+        return await self._run_sync(lambda handler: handler.get_availability(sitter_id=sitter_id, query_params=query_params))
+
+
+    async def get_versions(self, sitter_id, resource, resource_id=None, query_params=None):
+        return await self._run_sync(lambda handler: handler.get_versions(sitter_id=sitter_id, resource=resource, resource_id=resource_id, query_params=query_params))
+
+
+    async def export_sitter_data(self, sitter_id):
+        """
+        Async generator over the same records as SQLiteHandler.export_sitter_data,
+        streamed from one snapshot in EXPORT_BATCH_SIZE batches.
+        """
+        sitter_id = parse_id(sitter_id, "sitter_id")
+        try:
+            async with self.Session() as session:
+                # one snapshot for every query, as in SQLiteHandler._begin_snapshot
+                await (await session.connection()).exec_driver_sql('BEGIN')
+                sitter_row = (await session.execute(select(*sitter_serializer.columns).where(Sitter.sitter_id == sitter_id))).first()
+                if not sitter_row:
+                    raise NotFoundError("No sitter found")
+                yield "sitter", sitter_serializer.from_row(sitter_row)
+                for record_type, serializer, statement in export_statements(sitter_id):
+                    result = await session.stream(statement.execution_options(yield_per=EXPORT_BATCH_SIZE))
+                    async for row in result:
+                        yield record_type, serializer.from_row(row)
+        except (OperationalError, PoolTimeoutError):
+            raise DatabaseError("Database unavailable")
@@ -0,0 +1,43 @@
+import os
+from sqlalchemy.engine import make_url
+from datahandler.sqlite_handler import SQLiteHandler
+from datahandler.postgres_handler import PostgresHandler
+
+
+DEFAULT_SQLITE_FILE = 'pawliday.db'
+
+
+def _sqlite_file_name(url):
+    # SQLiteHandler keeps its databases in data/
+    if not url.database or os.path.dirname(os.path.normpath(url.database)) != 'data':
+        raise ValueError("SQLite DATABASE_URL must look like sqlite:///data/<file>")
+    return os.path.basename(url.database)
+
+
+def _postgres_url(url):
+    if url.drivername == 'postgresql':
+        # SQLAlchemy would default to psycopg2
+        return url.set(drivername='postgresql+psycopg')
+    return url
+
+
+def create_data_handler(database_url=None, replica_urls=None, **handler_kwargs):
+    """
+    The handler for DATABASE_URL: unset for data/pawliday.db,
+    sqlite:///data/<file> for another SQLite file, or postgresql://...
+    for PostgresHandler (needs `pip install "psycopg[binary]"`).
+    DATABASE_REPLICA_URLS, comma-separated and on the same backend, adds
+    read replicas. handler_kwargs go to the handler, e.g. password_hasher.
+    """
+    database_url = database_url if database_url is not None else os.environ.get('DATABASE_URL')
+    if replica_urls is None:
+        replica_urls = [replica_url.strip() for replica_url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if replica_url.strip()]
+    replica_urls = [make_url(replica_url) for replica_url in replica_urls]
+    url = make_url(database_url) if database_url else make_url(f'sqlite:///data/{DEFAULT_SQLITE_FILE}')
+    if any(replica_url.get_backend_name() != url.get_backend_name() for replica_url in replica_urls):
+        raise ValueError("DATABASE_REPLICA_URLS must use the backend of DATABASE_URL")
+    if url.get_backend_name() == 'sqlite':
+        return SQLiteHandler(_sqlite_file_name(url), replica_file_names=[_sqlite_file_name(replica_url) for replica_url in replica_urls], **handler_kwargs)
+    if url.get_backend_name() == 'postgresql':
+        return PostgresHandler(_postgres_url(url), replica_urls=[_postgres_url(replica_url) for replica_url in replica_urls], **handler_kwargs)
+    raise ValueError(f"Unsupported DATABASE_URL backend {url.get_backend_name()}")
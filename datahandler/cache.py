@@ -0,0 +1,324 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from datahandler.abstract_handler import AbstractDataHandler
+from datahandler.sqlalchemy_handler import parse_id
+
+
+def _copy(value):
+    if isinstance(value, dict):
+        return {key: _copy(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_copy(item) for item in value]
+    return value
+
+
+class LRUCache:
+    """
+    Size-bounded LRU with a TTL. Keys are (sitter_id, entity, id) tuples and
+    a per-sitter key index keeps invalidation proportional to one sitter's
+    entries instead of the whole cache. Every invalidation also moves the
+    sitter's generation on, so a value loaded before it is not stored
+    after it.
+    """
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.stale_sets = 0
+        self._entries = OrderedDict()
+        self._keys_by_sitter = {}
+        # one int per sitter that ever wrote, never pruned: a dropped entry
+        # would read as an old generation again
+        self._generations = {}
+        self._lock = threading.Lock()
+
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return _copy(value)
+
+
+    def generation(self, sitter_id):
+        with self._lock:
+            return self._generations.get(sitter_id, 0)
+
+
+    def set(self, key, value, generation=None):
+        """
+        Stores `value` unless the sitter was invalidated since
+        `generation`, as read before `value` was loaded.
+        """
+        with self._lock:
+            if generation is not None and self._generations.get(key[0], 0) != generation:
+                self.stale_sets += 1
+                return
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self._entries[key] = (time.monotonic() + self.ttl, _copy(value))
+            self._keys_by_sitter.setdefault(key[0], set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+
+
+    def invalidate(self, sitter_id, entity=None, entity_id=None, predicate=None):
+        with self._lock:
+            self._generations[sitter_id] = self._generations.get(sitter_id, 0) + 1
+            for key in list(self._keys_by_sitter.get(sitter_id, ())):
+                if entity is not None and key[1] != entity:
+                    continue
+                if entity_id is not None and key[2] != entity_id:
+                    continue
+                if predicate is not None and not predicate(self._entries[key][1]):
+                    continue
+                self._remove(key)
+
+
+    def _remove(self, key):
+        del self._entries[key]
+        sitter_keys = self._keys_by_sitter[key[0]]
+        sitter_keys.discard(key)
+        if not sitter_keys:
+            del self._keys_by_sitter[key[0]]
+
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "stale_sets": self.stale_sets,
+                "size": len(self._entries),
+                "max_entries": self.max_entries
+            }
+
+
+class CachedHandler(AbstractDataHandler):
+    """
+    Read-through cache in front of another data handler for the owner and
+    dog lookups. Writes made through this handler invalidate exactly the
+    entries they touch. Other processes' writes are only seen once the TTL
+    runs out, so keep CACHE_TTL_SECONDS short when running several workers.
+    """
+    def __init__(self, handler, max_entries=None, ttl=None):
+        self.handler = handler
+        self.cache = LRUCache(
+            max_entries=max_entries if max_entries is not None else int(os.environ.get('CACHE_MAX_ENTRIES', 10000)),
+            ttl=ttl if ttl is not None else float(os.environ.get('CACHE_TTL_SECONDS', 30))
+        )
+
+
+    def __getattr__(self, name):
+        return getattr(self.handler, name)
+
+
+    def _cached(self, key, load):
+        value = self.cache.get(key)
+        if value is None:
+            # read first: a write that invalidates while load() runs may
+            # have made the loaded value stale
+            generation = self.cache.generation(key[0])
+            value = load()
+            self.cache.set(key, value, generation)
+        return value
+
+
+    def authenticate_sitter(self, login_data):
+        return self.handler.authenticate_sitter(login_data=login_data)
+
+
+    def get_sitter(self, sitter_id):
+        return self.handler.get_sitter(sitter_id=sitter_id)
+
+
+    def add_sitter(self, new_sitter_data):
+        return self.handler.add_sitter(new_sitter_data=new_sitter_data)
+
+
+    def update_sitter(self, sitter_id, updated_data):
+        return self.handler.update_sitter(sitter_id=sitter_id, updated_data=updated_data)
+
+
+    def get_all_owners(self, sitter_id, query_params=None):
+        return self.handler.get_all_owners(sitter_id=sitter_id, query_params=query_params)
+
+
+    def add_owner(self, sitter_id, new_owner_data):
+        return self.handler.add_owner(sitter_id=sitter_id, new_owner_data=new_owner_data)
+
+
+    def add_owners_bulk(self, sitter_id, new_owners_data):
+        return self.handler.add_owners_bulk(sitter_id=sitter_id, new_owners_data=new_owners_data)
+
+
+    def get_owner(self, sitter_id, owner_id):
+        sitter_id = parse_id(sitter_id, "sitter_id")
+        owner_id = parse_id(owner_id, "owner_id")
+        return self._cached(
+            (sitter_id, 'owner', owner_id),
+            lambda: self.handler.get_owner(sitter_id=sitter_id, owner_id=owner_id)
+        )
+
+
+    def update_owner(self, sitter_id, owner_id, updated_data):
+        sitter_id = parse_id(sitter_id, "sitter_id")
+        owner_id = parse_id(owner_id, "owner_id")
+        updated_owner = self.handler.update_owner(sitter_id=sitter_id, owner_id=owner_id, updated_data=updated_data)
+        self.cache.invalidate(sitter_id, 'owner', owner_id)
+        return updated_owner
+
+
+    def delete_owner(self, sitter_id, owner_id):
+        sitter_id = parse_id(sitter_id, "sitter_id")
+        owner_id = parse_id(owner_id, "owner_id")
+        self.handler.delete_owner(sitter_id=sitter_id, owner_id=owner_id)
+        self.cache.invalidate(sitter_id, 'owner', owner_id)
+        self.cache.invalidate(sitter_id, 'owner_dogs', owner_id)
+        self.cache.invalidate(sitter_id, 'dogs')
+        # dogs loaded without their owner_id (fields=...) are dropped too
+        self.cache.invalidate(sitter_id, 'dog', predicate=lambda dog: dog.get('owner_id', owner_id) == owner_id)
+
+
+    def get_all_dogs(self, sitter_id, query_params=None):
+        sitter_id = parse_id(sitter_id, "sitter_id")
+        params_key = tuple(sorted((query_params or {}).items()))
+        return self._cached(
+            (sitter_id, 'dogs', params_key),
+            lambda: self.handler.get_all_dogs(sitter_id=sitter_id, query_params=query_params)
+        )
+
+
+    def get_dog(self, sitter_id, dog_id, query_params=None):
+        sitter_id = parse_id(sitter_id, "sitter_id")
+        dog_id = parse_id(dog_id, "dog_id")
+        params_key = tuple(sorted((query_params or {}).items()))
+        return self._cached(
+            (sitter_id, 'dog', dog_id, params_key),
+            lambda: self.handler.get_dog(sitter_id=sitter_id, dog_id=dog_id, query_params=query_params)
+        )
+
+
+    def get_owner_dogs(self, sitter_id, owner_id, query_params=None):
+        sitter_id = parse_id(sitter_id, "sitter_id")
+        owner_id = parse_id(owner_id, "owner_id")
+        params_key = tuple(sorted((query_params or {}).items()))
+        return self._cached(
+            (sitter_id, 'owner_dogs', owner_id, params_key),
+            lambda: self.handler.get_owner_dogs(sitter_id=sitter_id, owner_id=owner_id, query_params=query_params)
+        )
+
+
+    def add_dog(self, sitter_id, owner_id, new_dog_data):
+        sitter_id = parse_id(sitter_id, "sitter_id")
+        owner_id = parse_id(owner_id, "owner_id")
+        created_dog = self.handler.add_dog(sitter_id=sitter_id, owner_id=owner_id, new_dog_data=new_dog_data)
+        self.cache.invalidate(sitter_id, 'dogs')
+        self.cache.invalidate(sitter_id, 'owner_dogs', owner_id)
+        return created_dog
+
+
+    def add_dogs_bulk(self, sitter_id, owner_id, new_dogs_data):
+        sitter_id = parse_id(sitter_id, "sitter_id")
+        owner_id = parse_id(owner_id, "owner_id")
+        result = self.handler.add_dogs_bulk(sitter_id=sitter_id, owner_id=owner_id, new_dogs_data=new_dogs_data)
+        if result["created"]:
+            self.cache.invalidate(sitter_id, 'dogs')
+            self.cache.invalidate(sitter_id, 'owner_dogs', owner_id)
+        return result
+
+
+    def update_dog(self, sitter_id, dog_id, updated_data):
+        sitter_id = parse_id(sitter_id, "sitter_id")
+        dog_id = parse_id(dog_id, "dog_id")
+        updated_dog = self.handler.update_dog(sitter_id=sitter_id, dog_id=dog_id, updated_data=updated_data)
+        self.cache.invalidate(sitter_id, 'dog', dog_id)
+        self.cache.invalidate(sitter_id, 'dogs')
+        self.cache.invalidate(sitter_id, 'owner_dogs', updated_dog['owner_id'])
+        return updated_dog
+
+
+    def delete_dog(self, sitter_id, dog_id):
+        sitter_id = parse_id(sitter_id, "sitter_id")
+        dog_id = parse_id(dog_id, "dog_id")
+        self.handler.delete_dog(sitter_id=sitter_id, dog_id=dog_id)
+        self.cache.invalidate(sitter_id, 'dog', dog_id)
+        self.cache.invalidate(sitter_id, 'dogs')
+        self.cache.invalidate(sitter_id, 'owner_dogs', predicate=lambda dogs: any(dog['dog_id'] == dog_id for dog in dogs))
+
+
+    def delete_sitter(self, sitter_id):
+        sitter_id = parse_id(sitter_id, "sitter_id")
+        self.handler.delete_sitter(sitter_id=sitter_id)
+        self.cache.invalidate(sitter_id)
+
+
+    def get_skill_matrix(self, sitter_id):
+        return self.handler.get_skill_matrix(sitter_id=sitter_id)
+
+
+    def get_dog_skills(self, sitter_id, dog_id):
+        return self.handler.get_dog_skills(sitter_id=sitter_id, dog_id=dog_id)
+
+
+    def update_dog_skills(self, sitter_id, dog_id, skills_data):
+        return self.handler.update_dog_skills(sitter_id=sitter_id, dog_id=dog_id, skills_data=skills_data)
+
+
+    def search(self, sitter_id, query_params=None):
+        return self.handler.search(sitter_id=sitter_id, query_params=query_params)
+
+
+    def get_stays(self, sitter_id, query_params=None):
+        return self.handler.get_stays(sitter_id=sitter_id, query_params=query_params)
+
+
+    def get_stay(self, sitter_id, stay_id):
+        return self.handler.get_stay(sitter_id=sitter_id, stay_id=stay_id)
+
+
+    def add_stay(self, sitter_id, new_stay_data):
+        return self.handler.add_stay(sitter_id=sitter_id, new_stay_data=new_stay_data)
+
+
+    def update_stay(self, sitter_id, stay_id, updated_data):
+        return self.handler.update_stay(sitter_id=sitter_id, stay_id=stay_id, updated_data=updated_data)
+
+
+    def delete_stay(self, sitter_id, stay_id):
+        return self.handler.delete_stay(sitter_id=sitter_id, stay_id=stay_id)
+
+
+    def get_availability(self, sitter_id, query_params=None):
+        return self.handler.get_availability(sitter_id=sitter_id, query_params=query_params)
+
+
+    def get_versions(self, sitter_id, resource, resource_id=None, query_params=None):
+        return self.handler.get_versions(sitter_id=sitter_id, resource=resource, resource_id=resource_id, query_params=query_params)
+
+
+    def export_sitter_data(self, sitter_id):
+        return self.handler.export_sitter_data(sitter_id=sitter_id)
+
+
+    def stats(self):
+        return self.cache.stats()
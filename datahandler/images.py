@@ -0,0 +1,75 @@
+import os
+from abc import ABC, abstractmethod
+
+
+# stored next to img_url, which stays the full-size image
+IMAGE_VARIANTS = ('thumb', 'card')
+
+
+class ImageVariantBuilder(ABC):
+    """
+    Turns a dog's full-size img_url into smaller variants when the dog is
+    saved. A variant the builder cannot produce is None, and readers fall
+    back to img_url.
+    """
+    @abstractmethod
+    def build(self, img_url):
+        """
+        Returns {variant: url or None} for every name in IMAGE_VARIANTS.
+        """
+        pass
+
+
+class NoImageVariants(ImageVariantBuilder):
+    def build(self, img_url):
+        return dict.fromkeys(IMAGE_VARIANTS)
+
+
+class ImageKitVariants(ImageVariantBuilder):
+    """
+    ImageKit transformation URLs, e.g. <endpoint>/tr:w-160,h-160/dogs/luna.jpg.
+    Images outside the endpoint are only transformed when `web_proxy` is
+    set, i.e. the ImageKit account has a web proxy origin that fetches
+    <endpoint>/<absolute url>.
+    """
+    TRANSFORMATIONS = {
+        'thumb': 'w-160,h-160,fo-auto',
+        'card': 'w-640,h-480,fo-auto',
+    }
+
+
+    def __init__(self, url_endpoint, web_proxy=False, transformations=None):
+        self.url_endpoint = url_endpoint.rstrip('/')
+        self.web_proxy = web_proxy
+        self.transformations = transformations or self.TRANSFORMATIONS
+
+
+    def _path(self, img_url):
+        if img_url.startswith(self.url_endpoint + '/'):
+            return img_url[len(self.url_endpoint) + 1:]
+        if self.web_proxy and img_url.startswith(('https://', 'http://')):
+            return img_url
+        return None
+
+
+    def build(self, img_url):
+        path = self._path(img_url) if img_url else None
+        if path is None:
+            return dict.fromkeys(IMAGE_VARIANTS)
+        variants = {}
+        for variant in IMAGE_VARIANTS:
+            transformation = f"tr:{self.transformations[variant]}"
+            first, _, rest = path.partition('/')
+            if first.startswith('tr:') and rest:
+                # chained after the transformation the url already carries
+                variants[variant] = f"{self.url_endpoint}/{first}:{transformation[3:]}/{rest}"
+            else:
+                variants[variant] = f"{self.url_endpoint}/{transformation}/{path}"
+        return variants
+
+
+def default_image_variants():
+    url_endpoint = os.environ.get('IMAGEKIT_URL_ENDPOINT')
+    if not url_endpoint:
+        return NoImageVariants()
+    return ImageKitVariants(url_endpoint, web_proxy=os.environ.get('IMAGEKIT_WEB_PROXY', '').lower() in ('1', 'true', 'on'))
@@ -0,0 +1,178 @@
+from sqlalchemy.inspection import inspect
+from sqlalchemy.schema import CreateTable
+from datahandler.models import Base, Sitter, Owner, Dog
+
+
+def _create_tables(connection):
+    Base.metadata.create_all(connection)
+
+
+def _add_version_columns(connection):
+    inspector = inspect(connection)
+    for table in (Sitter.__table__, Owner.__table__, Dog.__table__):
+        if 'version' not in {column['name'] for column in inspector.get_columns(table.name)}:
+            connection.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN version INTEGER NOT NULL DEFAULT 0')
+
+
+def _missing_cascades(inspector, table):
+    """
+    True when a foreign key the model declares with ON DELETE CASCADE
+    exists in the database without it.
+    """
+    existing = {
+        tuple(foreign_key['constrained_columns']): (foreign_key.get('options') or {}).get('ondelete')
+        for foreign_key in inspector.get_foreign_keys(table.name)
+    }
+    for constraint in table.foreign_key_constraints:
+        if constraint.ondelete and (existing.get(tuple(constraint.column_keys)) or '').upper() != constraint.ondelete.upper():
+            return True
+    return False
+
+
+def _orphan_deletes(table):
+    # rows whose parent is already gone, left behind while foreign keys were off
+    for constraint in table.foreign_key_constraints:
+        column = constraint.column_keys[0]
+        referred = constraint.elements[0].column
+        yield f'DELETE FROM {table.name} WHERE {column} NOT IN (SELECT {referred.name} FROM {referred.table.name})'
+
+
+def _add_cascading_foreign_keys(connection):
+    """
+    SQLite cannot alter a constraint, so tables whose foreign keys lack
+    ON DELETE CASCADE are rebuilt: create the new table, copy the rows, drop
+    the old one and rename. _create_indexes puts their indexes back.
+    """
+    inspector = inspect(connection)
+    tables = [table for table in Base.metadata.sorted_tables if _missing_cascades(inspector, table)]
+    if not tables:
+        return
+    for table in Base.metadata.sorted_tables:
+        for statement in _orphan_deletes(table):
+            connection.exec_driver_sql(statement)
+    for table in tables:
+        new_name = f'_new_{table.name}'
+        create_table = str(CreateTable(table).compile(dialect=connection.dialect)).replace(f'CREATE TABLE {table.name} ', f'CREATE TABLE {new_name} ', 1)
+        existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+        columns = ', '.join(column.name for column in table.columns if column.name in existing_columns)
+        connection.exec_driver_sql(create_table)
+        connection.exec_driver_sql(f'INSERT INTO {new_name} ({columns}) SELECT {columns} FROM {table.name}')
+        connection.exec_driver_sql(f'DROP TABLE {table.name}')
+        connection.exec_driver_sql(f'ALTER TABLE {new_name} RENAME TO {table.name}')
+
+
+def _remove_duplicate_skills(connection):
+    # one knowledge level per dog and skill, the latest row wins
+    connection.exec_driver_sql('DELETE FROM knowledges WHERE knowledge_id NOT IN (SELECT max(knowledge_id) FROM knowledges GROUP BY dog_id, skill_id)')
+
+
+def _create_indexes(connection):
+    # the unique indexes can only be built once their duplicates are gone
+    _remove_duplicate_skills(connection)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
+
+def _unique_dog_skills(connection):
+    connection.exec_driver_sql('DROP INDEX IF EXISTS ix_knowledges_dog_id_skill_id')
+    _create_indexes(connection)
+
+
+# FTS5 indexes: table, key, searchable columns and how to find a row's sitter
+SEARCH_INDEXES = {
+    'dogs_search': ('dogs', 'dog_id', ('name', 'breed', 'character'), '(SELECT sitter_id FROM owners WHERE owner_id = {row}.owner_id)'),
+    'owners_search': ('owners', 'owner_id', ('first_name', 'last_name', 'email', 'phone_number'), '{row}.sitter_id'),
+}
+
+
+def _create_search_indexes(connection):
+    """
+    Each search table holds its own copy of the searchable columns plus the
+    row's sitter_id as a token, so a search intersects the sitter's rows
+    with the matching words inside the index. Triggers keep the copies in
+    sync; deletes go by rowid because a dog removed by a cascade can no
+    longer look up its owner. prefix='2 3' adds prefix indexes so short
+    prefixes do not expand over the whole vocabulary.
+    """
+    for search_table, (table, key, columns, sitter) in SEARCH_INDEXES.items():
+        column_list = ', '.join(columns)
+        insert_new = (
+            f"INSERT INTO {search_table}(rowid, {column_list}, sitter_id) "
+            f"VALUES (new.{key}, {', '.join(f'new.{column}' for column in columns)}, {sitter.format(row='new')});"
+        )
+        delete_old = f"DELETE FROM {search_table} WHERE rowid = old.{key};"
+        connection.exec_driver_sql(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {search_table} USING fts5({column_list}, sitter_id, "
+            f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+        connection.exec_driver_sql(f"CREATE TRIGGER IF NOT EXISTS {search_table}_insert AFTER INSERT ON {table} BEGIN {insert_new} END")
+        connection.exec_driver_sql(f"CREATE TRIGGER IF NOT EXISTS {search_table}_delete AFTER DELETE ON {table} BEGIN {delete_old} END")
+        connection.exec_driver_sql(f"CREATE TRIGGER IF NOT EXISTS {search_table}_update AFTER UPDATE ON {table} BEGIN {delete_old} {insert_new} END")
+        connection.exec_driver_sql(f"DELETE FROM {search_table}")
+        connection.exec_driver_sql(
+            f"INSERT INTO {search_table}(rowid, {column_list}, sitter_id) "
+            f"SELECT {key}, {column_list}, {sitter.format(row=table)} FROM {table}"
+        )
+
+
+def _add_image_variant_columns(connection):
+    # filled in by SQLiteHandler.refresh_image_variants, readers fall back to img_url meanwhile
+    existing_columns = {column['name'] for column in inspect(connection).get_columns(Dog.__table__.name)}
+    for name in ('img_thumb_url', 'img_card_url'):
+        if name not in existing_columns:
+            connection.exec_driver_sql(f'ALTER TABLE {Dog.__table__.name} ADD COLUMN {name} VARCHAR')
+
+
+# Append only: PRAGMA user_version records how many of these a database has
+# applied. Every step must also be a no-op on a database create_all just built.
+MIGRATIONS = (
+    _create_tables,
+    _add_version_columns,
+    _add_cascading_foreign_keys,
+    _create_indexes,
+    _unique_dog_skills,
+    _create_search_indexes,
+    _add_image_variant_columns,
+)
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def schema_version(engine):
+    with engine.connect() as connection:
+        return connection.exec_driver_sql('PRAGMA user_version').scalar()
+
+
+def run_migrations(engine):
+    """
+    Brings the database up to SCHEMA_VERSION. A current database costs one
+    PRAGMA read. Otherwise the pending migrations run in one IMMEDIATE
+    transaction, so workers starting together apply them once, with foreign
+    key enforcement off as SQLite requires for table rebuilds. The
+    transaction commits only when PRAGMA foreign_key_check comes back clean.
+    Returns the names of the applied migrations.
+    """
+    if schema_version(engine) >= SCHEMA_VERSION:
+        return []
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+        foreign_keys = connection.exec_driver_sql('PRAGMA foreign_keys').scalar()
+        connection.exec_driver_sql('PRAGMA foreign_keys=OFF')
+        try:
+            connection.exec_driver_sql('BEGIN IMMEDIATE')
+            try:
+                version = connection.exec_driver_sql('PRAGMA user_version').scalar()
+                pending = MIGRATIONS[version:]
+                for migration in pending:
+                    migration(connection)
+                violations = connection.exec_driver_sql('PRAGMA foreign_key_check').fetchall()
+                if violations:
+                    raise RuntimeError(f"foreign key violations after migrating to version {SCHEMA_VERSION}: {violations[:5]}")
+                connection.exec_driver_sql(f'PRAGMA user_version={max(version, SCHEMA_VERSION)}')
+                connection.exec_driver_sql('COMMIT')
+            except BaseException:
+                if connection.connection.driver_connection.in_transaction:
+                    connection.exec_driver_sql('ROLLBACK')
+                raise
+        finally:
+            connection.exec_driver_sql(f'PRAGMA foreign_keys={foreign_keys}')
+    return [migration.__name__.lstrip('_') for migration in pending]
@@ -1,8 +1,17 @@
-from sqlalchemy import Column, Integer, String, Date, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, BigInteger, String, Date, Boolean, ForeignKey, Index
 from sqlalchemy.orm import declarative_base
+import time
 
 
 Base = declarative_base()
+# chip ids and versions outgrow a 32 bit INTEGER on server databases; SQLite
+# keeps INTEGER, which is 64 bit there and what existing tables were built with
+BigInt = BigInteger().with_variant(Integer, 'sqlite')
+
+
+def new_version():
+    # microsecond timestamps stay below 2**53, so JavaScript clients read them exactly
+    return time.time_ns() // 1000
 
 
 class Sitter(Base):
@@ -14,6 +23,7 @@ class Sitter(Base):
     last_name = Column(String(255), nullable=False)
     email = Column(String(255), nullable=False, unique=True)
     password = Column(String(255), nullable=False)
+    version = Column(BigInt, nullable=False, default=new_version, onupdate=new_version)
 
 
     def __repr__(self):
@@ -21,19 +31,24 @@ class Sitter(Base):
         sitter_id = {self.sitter_id},
         first_name = {self.first_name},
         last_name = {self.last_name},
-        email = {self.email})'''
+        email = {self.email},
+        version = {self.version})'''
 
 
 class Owner(Base):
     """
     """
     __tablename__ = 'owners'
+    __table_args__ = (
+        Index('ix_owners_sitter_id_owner_id', 'sitter_id', 'owner_id'),
+    )
     owner_id = Column(Integer, primary_key=True, autoincrement=True, nullable=False)
-    sitter_id = Column(ForeignKey('sitters.sitter_id'), nullable=False)
+    sitter_id = Column(ForeignKey('sitters.sitter_id', ondelete='CASCADE'), nullable=False)
     first_name = Column(String(255), nullable=False)
     last_name = Column(String(255), nullable=False)
     email = Column(String(255), nullable=False, unique=True)
     phone_number = Column(String(20), nullable=False, unique=True)
+    version = Column(BigInt, nullable=False, default=new_version, onupdate=new_version)
 
 
     def __repr__(self):
@@ -42,16 +57,23 @@ class Owner(Base):
         first_name = {self.first_name},
         last_name = {self.last_name},
         email = {self.email},
-        phone_number = {self.phone_number})'''
+        phone_number = {self.phone_number},
+        version = {self.version})'''
 
 
 class Dog(Base):
     """
     """
     __tablename__ = 'dogs'
+    __table_args__ = (
+        Index('ix_dogs_owner_id_dog_id', 'owner_id', 'dog_id'),
+        Index('ix_dogs_owner_id_breed_dog_id', 'owner_id', 'breed', 'dog_id'),
+        Index('ix_dogs_owner_id_gender_dog_id', 'owner_id', 'gender', 'dog_id'),
+        Index('ix_dogs_owner_id_sociable_training_dog_id', 'owner_id', 'sociable', 'training', 'dog_id'),
+    )
     dog_id = Column(Integer, primary_key=True, autoincrement=True, nullable=False)
-    chip_id = Column(Integer, nullable=False, unique=True)
-    owner_id = Column(ForeignKey('owners.owner_id'), nullable=False)
+    chip_id = Column(BigInt, nullable=False, unique=True)
+    owner_id = Column(ForeignKey('owners.owner_id', ondelete='CASCADE'), nullable=False)
     name = Column(String(255), nullable=False)
     birth_date = Column(String(255), nullable=False)
     breed = Column(String(255), nullable=False)
@@ -64,6 +86,9 @@ class Dog(Base):
     sociable = Column(Boolean, nullable=False)
     training = Column(Boolean, nullable=False)
     img_url = Column(String)
+    img_thumb_url = Column(String)
+    img_card_url = Column(String)
+    version = Column(BigInt, nullable=False, default=new_version, onupdate=new_version)
 
 
     def __repr__(self):
@@ -82,7 +107,10 @@ class Dog(Base):
         character = {self.character},
         sociable = {self.sociable},
         training = {self.training},
-        img_url = {self.img_url})'''
+        img_url = {self.img_url},
+        img_thumb_url = {self.img_thumb_url},
+        img_card_url = {self.img_card_url},
+        version = {self.version})'''
 
 
 class Skill(Base):
@@ -103,9 +131,13 @@ class Knowledge(Base):
     """
     """
     __tablename__ = 'knowledges'
+    __table_args__ = (
+        Index('uq_knowledges_dog_id_skill_id', 'dog_id', 'skill_id', unique=True),
+        Index('ix_knowledges_skill_id', 'skill_id'),
+    )
     knowledge_id = Column(Integer, primary_key=True, autoincrement=True, nullable=False)
-    dog_id = Column(ForeignKey('dogs.dog_id'), nullable=False)
-    skill_id = Column(ForeignKey('skills.skill_id'), nullable=False)
+    dog_id = Column(ForeignKey('dogs.dog_id', ondelete='CASCADE'), nullable=False)
+    skill_id = Column(ForeignKey('skills.skill_id', ondelete='CASCADE'), nullable=False)
     knowledge = Column(Integer, nullable=False)
     
 
@@ -121,9 +153,13 @@ class Stay(Base):
     """
     """
     __tablename__ = 'stays'
+    __table_args__ = (
+        Index('ix_stays_sitter_id_checkin_checkout', 'sitter_id', 'checkin', 'checkout'),
+        Index('ix_stays_dog_id_checkin_checkout', 'dog_id', 'checkin', 'checkout'),
+    )
     stay_id = Column(Integer, primary_key=True, autoincrement=True, nullable=False)
-    dog_id = Column(ForeignKey('dogs.dog_id'), nullable=False)
-    sitter_id = Column(ForeignKey('sitters.sitter_id'), nullable=False)
+    dog_id = Column(ForeignKey('dogs.dog_id', ondelete='CASCADE'), nullable=False)
+    sitter_id = Column(ForeignKey('sitters.sitter_id', ondelete='CASCADE'), nullable=False)
     checkin = Column(Date, nullable=False)
     checkout = Column(Date, nullable=False)
 
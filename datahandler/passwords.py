@@ -0,0 +1,138 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from bcrypt import hashpw, gensalt, checkpw
+from exceptions import ServiceBusyError
+from metrics import timed
+
+
+# the pool starts on the first login, when request threads and open
+# connections are already running; a forked worker would inherit their locks
+POOL_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+
+def _hash_password(password, rounds):
+    return hashpw(password.encode('utf-8'), gensalt(rounds)).decode('utf-8')
+
+
+def _check_password(password, password_hash):
+    return checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
+
+
+def hash_rounds(password_hash):
+    # bcrypt hashes look like $2b$12$<salt+digest>; the third field is the cost
+    try:
+        return int(password_hash.split('$')[2])
+    except (IndexError, ValueError):
+        return None
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt in a process pool so request threads never burn CPU on it.
+    At most workers + queue_size jobs are in flight; beyond that, and when
+    a job waits longer than timeout seconds, ServiceBusyError is raised so
+    the API can answer 503 right away. workers=0 hashes inline, still
+    bounded by the same number of slots.
+    """
+    def __init__(self, rounds=None, workers=None, queue_size=None, timeout=None):
+        self.rounds = rounds if rounds is not None else int(os.environ.get('BCRYPT_ROUNDS', 12))
+        self.workers = workers if workers is not None else int(os.environ.get('BCRYPT_POOL_WORKERS', os.cpu_count() or 1))
+        self.queue_size = queue_size if queue_size is not None else int(os.environ.get('BCRYPT_POOL_QUEUE', 2 * max(self.workers, 1)))
+        self.timeout = timeout if timeout is not None else float(os.environ.get('BCRYPT_POOL_TIMEOUT', 5))
+        self._slots = threading.BoundedSemaphore(max(self.workers, 1) + self.queue_size)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+
+    def _get_executor(self):
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context(POOL_START_METHOD))
+            return self._executor
+
+
+    def _run_inline(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise ServiceBusyError("Server busy, please try again")
+        try:
+            return fn(*args)
+        finally:
+            self._slots.release()
+
+
+    def _submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise ServiceBusyError("Server busy, please try again")
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except BrokenProcessPool:
+            self._slots.release()
+            self._reset_executor()
+            raise ServiceBusyError("Server busy, please try again")
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+
+    def _run(self, fn, *args):
+        with timed('bcrypt'):
+            if self.workers == 0:
+                return self._run_inline(fn, *args)
+            future = self._submit(fn, *args)
+            try:
+                return future.result(timeout=self.timeout)
+            except FutureTimeoutError:
+                raise ServiceBusyError("Server busy, please try again")
+            except BrokenProcessPool:
+                self._reset_executor()
+                raise ServiceBusyError("Server busy, please try again")
+
+
+    async def _run_async(self, fn, *args):
+        # awaits the pool instead of blocking, so the event loop keeps serving
+        # other requests while bcrypt runs
+        with timed('bcrypt'):
+            if self.workers == 0:
+                return self._run_inline(fn, *args)
+            future = self._submit(fn, *args)
+            try:
+                return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+            except asyncio.TimeoutError:
+                raise ServiceBusyError("Server busy, please try again")
+            except BrokenProcessPool:
+                self._reset_executor()
+                raise ServiceBusyError("Server busy, please try again")
+
+
+    def _reset_executor(self):
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+    def hash(self, password):
+        return self._run(_hash_password, password, self.rounds)
+
+
+    def verify(self, password, password_hash):
+        return self._run(_check_password, password, password_hash)
+
+
+    async def hash_async(self, password):
+        return await self._run_async(_hash_password, password, self.rounds)
+
+
+    async def verify_async(self, password, password_hash):
+        return await self._run_async(_check_password, password, password_hash)
+
+
+    def needs_rehash(self, password_hash):
+        return hash_rounds(password_hash) != self.rounds
+
+
+    def shutdown(self):
+        self._reset_executor()
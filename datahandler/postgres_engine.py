@@ -0,0 +1,40 @@
+from sqlalchemy import create_engine
+from datahandler.sqlite_engine import engine_profile_from_env
+from metrics import instrument_engine
+
+
+DEFAULT_POSTGRES_PROFILE = {
+    "pool_size": 10,
+    "max_overflow": 20,
+    "pool_timeout": 10,
+    # seconds; connections older than this are replaced before proxies or
+    # the server drop them
+    "pool_recycle": 1800,
+    # milliseconds a statement may run before the server cancels it
+    "statement_timeout": 5000,
+}
+
+POOL_SETTINGS = ("pool_size", "max_overflow", "pool_timeout", "pool_recycle")
+
+
+def postgres_profile_from_env():
+    """
+    DEFAULT_POSTGRES_PROFILE overridden by POSTGRES_<SETTING> environment
+    variables, e.g. POSTGRES_POOL_SIZE=20.
+    """
+    return engine_profile_from_env(DEFAULT_POSTGRES_PROFILE, prefix='POSTGRES')
+
+
+def create_postgres_engine(url, profile=None):
+    """
+    Pooled engine for a postgresql+psycopg:// URL. Connections are checked
+    with a ping on checkout, so a server restart costs a reconnect instead
+    of a failed request. Settings set to None are left at the default.
+    """
+    profile = profile if profile is not None else postgres_profile_from_env()
+    engine_kwargs = {setting: profile[setting] for setting in POOL_SETTINGS if profile.get(setting) is not None}
+    if profile.get("statement_timeout") is not None:
+        engine_kwargs["connect_args"] = {"options": f"-c statement_timeout={profile['statement_timeout']}"}
+    engine = create_engine(url, pool_pre_ping=True, **engine_kwargs)
+    instrument_engine(engine)
+    return engine
@@ -0,0 +1,128 @@
+import sys
+import os
+
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+
+from sqlalchemy import select, func, literal_column
+from sqlalchemy.dialects.postgresql import insert as postgres_insert
+from sqlalchemy.exc import OperationalError, TimeoutError as PoolTimeoutError
+from sqlalchemy.inspection import inspect
+from datahandler.models import Base, Owner, Dog
+from datahandler.sqlalchemy_handler import SQLAlchemyHandler, owner_serializer
+from datahandler.postgres_engine import create_postgres_engine
+from exceptions import DatabaseError
+
+
+# any constant works, it only has to be the same for every worker
+SCHEMA_LOCK_ID = 7357
+# 'simple' neither stems nor drops stop words, like the FTS5 unicode61 tokenizer
+SEARCH_CONFIG = literal_column("'simple'::regconfig")
+
+
+def search_vector(*weighted_columns):
+    """
+    tsvector over (column, weight) pairs. Runs of non-word characters
+    become spaces first, so e-mail addresses split into words and phone
+    numbers into one digit string, as in the SQLite index.
+    """
+    vectors = [
+        func.setweight(func.to_tsvector(SEARCH_CONFIG, func.regexp_replace(column, literal_column(pattern), literal_column("' '"), literal_column("'g'"))), literal_column(f"'{weight}'"))
+        for column, weight, pattern in weighted_columns
+    ]
+    vector = vectors[0]
+    for other in vectors[1:]:
+        vector = vector.op('||')(other)
+    return vector
+
+
+WORDS = r"'\W+'"
+DIGITS_ONLY = r"'\D+'"
+
+
+def search_query(words):
+    return func.to_tsquery(SEARCH_CONFIG, ' & '.join('(' + ' | '.join(f'{prefix}:*' for prefix in prefixes) + ')' for prefixes in words))
+
+
+def create_schema(engine):
+    """
+    Creates the tables and indexes of the models. An advisory lock makes
+    workers starting together wait for the first one. Server databases are
+    always built from the current models; migrations.py only upgrades
+    SQLite files. Returns ['create_tables'] when any table was new.
+    """
+    try:
+        with engine.begin() as connection:
+            connection.execute(select(func.pg_advisory_xact_lock(SCHEMA_LOCK_ID)))
+            existing_tables = set(inspect(connection).get_table_names())
+            Base.metadata.create_all(connection)
+            return ['create_tables'] if set(Base.metadata.tables) - existing_tables else []
+    except (OperationalError, PoolTimeoutError):
+        raise DatabaseError("Database unavailable")
+
+
+class PostgresHandler(SQLAlchemyHandler):
+    """
+    SQLAlchemyHandler on PostgreSQL through psycopg, for when one SQLite
+    writer is not enough: writers only wait for each other on the same rows,
+    and the connection pool is sized by POSTGRES_POOL_SIZE and
+    POSTGRES_MAX_OVERFLOW. replica_urls point at streaming replicas of the
+    same database, each with a pool of its own.
+    """
+    def __init__(self, url, password_hasher=None, engine_profile=None, image_variants=None, replica_urls=(), replica_selection=None):
+        super().__init__(
+            create_postgres_engine(url, engine_profile),
+            password_hasher=password_hasher,
+            image_variants=image_variants,
+            replica_engines=[create_postgres_engine(replica_url, engine_profile) for replica_url in replica_urls],
+            replica_selection=replica_selection
+        )
+
+
+    def _migrate(self):
+        return create_schema(self.engine)
+
+
+    def _upsert(self, model):
+        return postgres_insert(model)
+
+
+    def _begin_snapshot(self, session):
+        # READ COMMITTED takes a new snapshot per statement; the pool puts the
+        # connection back to its default level when the session closes
+        session.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+
+
+    def _lock_dog_stays(self, session, dog_id):
+        session.execute(select(Dog.dog_id).where(Dog.dog_id == dog_id).with_for_update())
+
+
+    def _search_rows(self, session, sitter_id, words, limit, dog_columns):
+        """
+        Ranks the sitter's rows with ts_rank on a tsvector built per query.
+        The sitter's rows come off the owner and dog indexes first, so only
+        those are tokenized. Weights follow the SQLite bm25 weights.
+        """
+        query = search_query(words)
+        dog_vector = search_vector((Dog.name, 'A', WORDS), (Dog.breed, 'B', WORDS), (Dog.character, 'C', WORDS))
+        dog_rows = (
+            session.query(*dog_columns)
+            .select_from(Dog)
+            .join(Owner)
+            .filter(Owner.sitter_id == sitter_id, dog_vector.op('@@')(query))
+            .order_by(func.ts_rank(dog_vector, query).desc(), Dog.dog_id)
+            .limit(limit)
+            .all()
+        )
+        owner_vector = search_vector((Owner.first_name, 'A', WORDS), (Owner.last_name, 'A', WORDS), (Owner.email, 'B', WORDS), (Owner.phone_number, 'B', DIGITS_ONLY))
+        owner_rows = (
+            session.query(*owner_serializer.columns)
+            .filter(Owner.sitter_id == sitter_id, owner_vector.op('@@')(query))
+            .order_by(func.ts_rank(owner_vector, query).desc(), Owner.owner_id)
+            .limit(limit)
+            .all()
+        )
+        return dog_rows, owner_rows
@@ -0,0 +1,128 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+SELECTIONS = ('round_robin', 'least_busy')
+
+
+class _Replica:
+    __slots__ = ('Session', 'in_flight', 'reads')
+
+    def __init__(self, Session):
+        self.Session = Session
+        self.in_flight = 0
+        self.reads = 0
+
+
+class ReplicaRouter:
+    """
+    Sends reads to read replicas and writes to the primary. Replicas are
+    picked round robin or, with least_busy, by the fewest reads in flight.
+    For `sticky_seconds` after a write, that sitter's reads stay on the
+    primary so they see the write even while the replicas lag. Writes are
+    only remembered per process, for the `max_keys` most recent sitters.
+    Without replicas every read goes to the primary.
+    """
+    def __init__(self, primary, replicas=(), selection=None, sticky_seconds=None, max_keys=None, clock=time.monotonic):
+        self.primary = primary
+        self.replicas = [_Replica(Session) for Session in replicas]
+        self.selection = selection if selection is not None else os.environ.get('READ_REPLICA_SELECTION', 'round_robin')
+        if self.selection not in SELECTIONS:
+            raise ValueError(f"Unknown replica selection {self.selection}, expected one of {', '.join(SELECTIONS)}")
+        self.sticky_seconds = sticky_seconds if sticky_seconds is not None else float(os.environ.get('READ_YOUR_WRITES_SECONDS', 2))
+        self.max_keys = max_keys if max_keys is not None else int(os.environ.get('READ_YOUR_WRITES_MAX_KEYS', 10000))
+        self.clock = clock
+        self.primary_reads = 0
+        self.sticky_reads = 0
+        self._next = 0
+        self._written = OrderedDict()
+        self._lock = threading.Lock()
+
+
+    def record_write(self, key):
+        if not self.replicas or self.sticky_seconds <= 0:
+            return
+        with self._lock:
+            self._written.pop(key, None)
+            self._written[key] = self.clock() + self.sticky_seconds
+            if len(self._written) > self.max_keys:
+                self._written.popitem(last=False)
+
+
+    def acquire(self, key):
+        """
+        The replica `key`'s next read goes to, or None for the primary.
+        A replica must be handed back through release().
+        """
+        with self._lock:
+            if not self.replicas:
+                self.primary_reads += 1
+                return None
+            sticky_until = self._written.get(key)
+            if sticky_until is not None:
+                if sticky_until > self.clock():
+                    self.primary_reads += 1
+                    self.sticky_reads += 1
+                    return None
+                del self._written[key]
+            if self.selection == 'least_busy':
+                # scanning from the round robin position spreads ties evenly
+                count = len(self.replicas)
+                replica = min((self.replicas[(self._next + offset) % count] for offset in range(count)), key=lambda candidate: candidate.in_flight)
+            else:
+                replica = self.replicas[self._next % len(self.replicas)]
+            self._next += 1
+            replica.in_flight += 1
+            replica.reads += 1
+            return replica
+
+
+    def release(self, replica):
+        if replica is not None:
+            with self._lock:
+                replica.in_flight -= 1
+
+
+    def session_factory(self, replica):
+        return self.primary if replica is None else replica.Session
+
+
+    @contextmanager
+    def read(self, key):
+        """
+        A read transaction for `key`, on a replica or the primary.
+        """
+        replica = self.acquire(key)
+        try:
+            with self.session_factory(replica).begin() as session:
+                yield session
+        finally:
+            self.release(replica)
+
+
+    @contextmanager
+    def write(self, key):
+        """
+        A transaction on the primary. Once it ends, `key` reads from the
+        primary for sticky_seconds.
+        """
+        try:
+            with self.primary.begin() as session:
+                yield session
+        finally:
+            self.record_write(key)
+
+
+    def stats(self):
+        with self._lock:
+            return {
+                "replicas": len(self.replicas),
+                "primary_reads": self.primary_reads,
+                "replica_reads": sum(replica.reads for replica in self.replicas),
+                "sticky_reads": self.sticky_reads,
+                "in_flight": sum(replica.in_flight for replica in self.replicas),
+                "sticky_sitters": len(self._written),
+            }
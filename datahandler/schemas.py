@@ -1,12 +1,72 @@
-from pydantic import BaseModel, EmailStr, field_validator
+from pydantic import BaseModel, EmailStr, Field, TypeAdapter, field_validator, model_validator
 from datetime import date
-from typing import Optional
-import phonenumbers
+from functools import cache, lru_cache
+from typing import Literal, Optional
 from exceptions import InvalidInputError
+from metrics import timed
 from typing import Any
-
-
-class SitterSchema(BaseModel):
+import os
+
+
+MAX_PAGE_LIMIT = 500
+MAX_BULK_ITEMS = 1000
+MAX_STAY_DAYS = 365
+MAX_AVAILABILITY_DAYS = 366
+MAX_KNOWLEDGE_LEVEL = 10
+MAX_SEARCH_LIMIT = 100
+MAX_SEARCH_TERMS = 8
+MAX_PHONE_NUMBER_LENGTH = 250
+MAX_SELECTED_FIELDS = 32
+PHONE_CACHE_SIZE = int(os.environ.get('PHONE_CACHE_SIZE', 4096))
+
+
+@lru_cache(maxsize=PHONE_CACHE_SIZE)
+def _normalize_phone_number(value):
+    # imported on the first owner write rather than at startup, the module
+    # and its metadata cost more than the rest of this file to import
+    import phonenumbers
+    try:
+        number = phonenumbers.parse(value, "DE")
+    except phonenumbers.NumberParseException:
+        return None, "Phone number could not be validated"
+    if not phonenumbers.is_valid_number(number):
+        return None, "Invalid phone number for Germany"
+    return phonenumbers.format_number(number, phonenumbers.PhoneNumberFormat.E164), None
+
+
+def normalize_phone_number(value):
+    """
+    E.164 form of a German or international phone number. Results, failures
+    included, are memoized for the last PHONE_CACHE_SIZE distinct inputs, so
+    repeated numbers in bulk imports and updates skip phonenumbers entirely.
+    """
+    if not isinstance(value, str) or len(value) > MAX_PHONE_NUMBER_LENGTH:
+        raise InvalidInputError("Phone number could not be validated")
+    phone_number, error = _normalize_phone_number(value)
+    if error:
+        raise InvalidInputError(error)
+    return phone_number
+
+
+@cache
+def list_adapter(schema):
+    # one compiled validator per schema, validating a whole list in one call
+    return TypeAdapter(list[schema])
+
+
+class TimedSchema(BaseModel):
+    """
+    Base for every schema here, so validation time shows up under the
+    validation stage of the request metrics.
+    """
+    @model_validator(mode="wrap")
+    @classmethod
+    def time_validation(cls, data, handler):
+        with timed('validation'):
+            return handler(data)
+
+
+class SitterSchema(TimedSchema):
     first_name: str
     last_name: str
     email: EmailStr
@@ -16,7 +76,7 @@ class SitterSchema(BaseModel):
         from_attributes = True
 
 
-class UpdateSitterSchema(BaseModel):
+class UpdateSitterSchema(TimedSchema):
     first_name: Optional[str] = None
     last_name: Optional[str] = None
     email: Optional[EmailStr] = None
@@ -26,7 +86,7 @@ class UpdateSitterSchema(BaseModel):
         from_attributes = True
 
 
-class LoginSchema(BaseModel):
+class LoginSchema(TimedSchema):
     email: EmailStr
     password: str
 
@@ -34,7 +94,7 @@ class LoginSchema(BaseModel):
         from_attributes = True
 
 
-class OwnerSchema(BaseModel):
+class OwnerSchema(TimedSchema):
     first_name: str
     last_name: str
     email: EmailStr
@@ -43,19 +103,13 @@ class OwnerSchema(BaseModel):
 
     @field_validator("phone_number", mode="before")
     def validate_and_format_phone_number(cls, value: str) -> str:
-        try:
-            number = phonenumbers.parse(value, "DE")
-            if not phonenumbers.is_valid_number(number):
-                raise InvalidInputError("Invalid phone number for Germany")
-            return phonenumbers.format_number(number, phonenumbers.PhoneNumberFormat.E164)
-        except phonenumbers.NumberParseException:
-            raise InvalidInputError("Phone number could not be validated")
+        return normalize_phone_number(value)
 
     class Config:
         from_attribute = True
 
 
-class UpdateOwnerSchema(BaseModel):
+class UpdateOwnerSchema(TimedSchema):
     first_name: Optional[str] = None
     last_name: Optional[str] = None
     email: Optional[EmailStr] = None
@@ -65,19 +119,13 @@ class UpdateOwnerSchema(BaseModel):
     def validate_and_format_phone_number(cls, value: Optional[str]) -> Optional[str]:
         if value is None:
             return None
-        try:
-            number = phonenumbers.parse(value, "DE")
-            if not phonenumbers.is_valid_number(number):
-                raise InvalidInputError("Invalid phone number for Germany")
-            return phonenumbers.format_number(number, phonenumbers.PhoneNumberFormat.E164)
-        except phonenumbers.NumberParseException:
-            raise InvalidInputError("Phone number could not be validated")
+        return normalize_phone_number(value)
 
     class Config:
         from_attribute = True
 
 
-class DogSchema(BaseModel):
+class DogSchema(TimedSchema):
     chip_id: int
     name: str
     birth_date: date
@@ -96,7 +144,7 @@ class DogSchema(BaseModel):
         from_attribute = True
 
 
-class UpdateDogSchema(BaseModel):
+class UpdateDogSchema(TimedSchema):
     chip_id: Optional[int]
     name: Optional[str]
     birth_date: Optional[date]
@@ -113,3 +161,80 @@ class UpdateDogSchema(BaseModel):
 
     class Config:
         from_attribute = True
+
+
+class KnowledgeSchema(TimedSchema):
+    skill_id: int
+    knowledge: int = Field(ge=0, le=MAX_KNOWLEDGE_LEVEL)
+
+
+class StayDatesSchema(TimedSchema):
+    checkin: date
+    checkout: date
+
+    @model_validator(mode="after")
+    def validate_dates(self):
+        if self.checkout <= self.checkin:
+            raise ValueError("checkout must be after checkin")
+        if (self.checkout - self.checkin).days > MAX_STAY_DAYS:
+            raise ValueError(f"A stay can last at most {MAX_STAY_DAYS} days")
+        return self
+
+
+class StaySchema(StayDatesSchema):
+    dog_id: int
+
+
+class AvailabilitySchema(TimedSchema):
+    start: date = Field(alias="from")
+    end: date = Field(alias="to")
+
+    @model_validator(mode="after")
+    def validate_range(self):
+        if self.end < self.start:
+            raise ValueError("to must not be before from")
+        if (self.end - self.start).days >= MAX_AVAILABILITY_DAYS:
+            raise ValueError(f"At most {MAX_AVAILABILITY_DAYS} days per request")
+        return self
+
+
+class PageSchema(TimedSchema):
+    limit: Optional[int] = Field(default=None, ge=1, le=MAX_PAGE_LIMIT)
+    after: Optional[int] = Field(default=None, ge=0)
+
+
+class ImageVariantSchema(TimedSchema):
+    # img_url is swapped for this size in dog listings; None and 'full' keep the original
+    variant: Optional[Literal['thumb', 'card', 'full']] = None
+
+
+class DogFieldsSchema(ImageVariantSchema):
+    # comma separated dog columns to load, e.g. "name,breed,img_url"
+    fields: Optional[tuple[str, ...]] = None
+
+    @field_validator("fields", mode="before")
+    @classmethod
+    def split_fields(cls, value):
+        if isinstance(value, str):
+            value = tuple(name.strip() for name in value.split(','))
+        if value is not None and (not value or len(value) > MAX_SELECTED_FIELDS or not all(value)):
+            raise ValueError("Invalid fields")
+        return value
+
+
+class DogFilterSchema(PageSchema, DogFieldsSchema):
+    breed: Optional[str] = None
+    gender: Optional[str] = None
+    sociable: Optional[bool] = None
+    training: Optional[bool] = None
+
+
+class SearchSchema(DogFieldsSchema):
+    q: str = Field(min_length=1, max_length=200)
+    limit: int = Field(default=20, ge=1, le=MAX_SEARCH_LIMIT)
+
+
+class StayFilterSchema(PageSchema):
+    dog_id: Optional[int] = None
+    start: Optional[date] = Field(default=None, alias="from")
+    end: Optional[date] = Field(default=None, alias="to")
@@ -0,0 +1,51 @@
+from sqlalchemy.inspection import inspect
+from datahandler.models import Sitter, Owner, Dog, Stay, Skill, Knowledge
+from metrics import timed
+
+
+SENSITIVE_FIELDS = {
+    Sitter: ('password',),
+}
+
+
+# derived from other columns and only served on request, see IMAGE_VARIANTS
+DERIVED_FIELDS = {
+    Dog: ('img_thumb_url', 'img_card_url'),
+}
+
+
+class Serializer:
+    """
+    Column layout of one model, resolved once at import time. Queries select
+    `columns` and hand the resulting Row tuples to `from_row`/`from_rows`, so
+    neither ORM objects nor mapper inspection show up on the request path.
+    """
+    def __init__(self, model, sensitive=(), only=None):
+        self.model = model
+        self.keys = tuple(
+            attr.key for attr in inspect(model).column_attrs
+            if attr.key not in sensitive and (only is None or attr.key in only)
+        )
+        self.columns = tuple(getattr(model, key) for key in self.keys)
+
+
+    def from_row(self, row):
+        with timed('serialization'):
+            return dict(zip(self.keys, row))
+
+
+    def from_rows(self, rows):
+        keys = self.keys
+        with timed('serialization'):
+            return [dict(zip(keys, row)) for row in rows]
+
+
+    def from_obj(self, obj):
+        with timed('serialization'):
+            return {key: getattr(obj, key) for key in self.keys}
+
+
+SERIALIZERS = {
+    model: Serializer(model, SENSITIVE_FIELDS.get(model, ()) + DERIVED_FIELDS.get(model, ()))
+    for model in (Sitter, Owner, Dog, Stay, Skill, Knowledge)
+}
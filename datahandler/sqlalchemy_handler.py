@@ -0,0 +1,1089 @@
+import sys
+import os
+
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+
+from abc import abstractmethod
+from sqlalchemy import select, insert, update, delete, literal, or_, exists, func
+from sqlalchemy.orm import sessionmaker, aliased
+from datahandler.abstract_handler import AbstractDataHandler
+from datahandler.models import Sitter, Owner, Dog, Stay, Skill, Knowledge, new_version
+from datahandler.schemas import SitterSchema, UpdateSitterSchema, LoginSchema, OwnerSchema, UpdateOwnerSchema, DogSchema, UpdateDogSchema, PageSchema, DogFilterSchema, DogFieldsSchema, StaySchema, StayDatesSchema, StayFilterSchema, AvailabilitySchema, KnowledgeSchema, SearchSchema, MAX_BULK_ITEMS, MAX_STAY_DAYS, MAX_SEARCH_TERMS, list_adapter
+from sqlalchemy.exc import IntegrityError, OperationalError, TimeoutError as PoolTimeoutError
+from pydantic import ValidationError
+from datetime import timedelta
+from functools import lru_cache
+import re
+from exceptions import NotFoundError, InvalidInputError, DatabaseError, ServiceBusyError
+from datahandler.passwords import PasswordHasher
+from datahandler.serializers import SERIALIZERS, Serializer
+from datahandler.images import IMAGE_VARIANTS, default_image_variants
+from datahandler.replicas import ReplicaRouter
+
+
+sitter_serializer = SERIALIZERS[Sitter]
+owner_serializer = SERIALIZERS[Owner]
+dog_serializer = SERIALIZERS[Dog]
+stay_serializer = SERIALIZERS[Stay]
+knowledge_serializer = SERIALIZERS[Knowledge]
+
+
+DOG_FIELDS = frozenset(dog_serializer.keys)
+# always loaded: pagination and ETags are built from them
+DOG_REQUIRED_FIELDS = frozenset(('dog_id', 'version'))
+
+
+@lru_cache(maxsize=256)
+def _dog_selection(fields, variant):
+    serializer = dog_serializer if fields is None else Serializer(Dog, only=fields | DOG_REQUIRED_FIELDS)
+    columns = tuple(
+        func.coalesce(getattr(Dog, f'img_{variant}_url'), Dog.img_url).label('img_url') if key == 'img_url' and variant in IMAGE_VARIANTS else column
+        for key, column in zip(serializer.keys, serializer.columns)
+    )
+    return columns, serializer
+
+
+def dog_selection(options):
+    """
+    The columns a dog read selects and the serializer for its rows, as
+    narrowed by DogFieldsSchema: only the requested fields plus dog_id and
+    version, with img_url swapped for a stored size variant where one exists.
+    """
+    fields = None
+    if options.fields is not None:
+        fields = frozenset(options.fields)
+        if not fields <= DOG_FIELDS:
+            raise InvalidInputError("Unknown field")
+    return _dog_selection(fields, options.variant)
+
+
+def column_literals(model, values):
+    # typed like their columns, so e.g. chip ids are bound as BIGINT where that matters
+    return [literal(value, model.__table__.c[key].type) for key, value in values.items()]
+
+
+def parse_id(value, name):
+    if isinstance(value, int):
+        return value
+    if not value.isdigit():
+        raise InvalidInputError(f"{name} must be a number")
+    return int(value)
+
+
+def sitter_owner_ids(sitter_id):
+    return select(Owner.owner_id).where(Owner.sitter_id == sitter_id)
+
+
+def sitter_dog_ids(sitter_id):
+    return select(Dog.dog_id).where(Dog.owner_id.in_(sitter_owner_ids(sitter_id)))
+
+
+def stays_overlapping(stays, checkin, checkout):
+    # stays are half-open [checkin, checkout) and last at most MAX_STAY_DAYS,
+    # so the lower bound on checkin keeps this a bounded index range scan
+    return (
+        stays.checkin > checkin - timedelta(days=MAX_STAY_DAYS),
+        stays.checkin < checkout,
+        stays.checkout > checkin
+    )
+
+
+def serialize_stay(row):
+    stay = stay_serializer.from_row(row)
+    stay['checkin'] = stay['checkin'].isoformat()
+    stay['checkout'] = stay['checkout'].isoformat()
+    return stay
+
+
+def search_words(query):
+    """
+    Every word of the query as a tuple of prefixes, any of which may match.
+    Digit groups are joined first and a leading 0 also tries 49, so
+    "0163 243" finds the stored +491632438301.
+    """
+    query = re.sub(r'(?<=\d)[\s/-]+(?=\d)', '', query)
+    words = []
+    for word in re.findall(r'\w+', query)[:MAX_SEARCH_TERMS]:
+        if word.isdigit() and word.startswith('0'):
+            words.append((word, f'49{word[1:]}'))
+        else:
+            words.append((word,))
+    if not words:
+        raise InvalidInputError("Search needs a word or number")
+    return words
+
+
+EXPORT_BATCH_SIZE = 500
+
+
+def export_statements(sitter_id):
+    return (
+        ("owner", owner_serializer, select(*owner_serializer.columns).where(Owner.sitter_id == sitter_id).order_by(Owner.owner_id)),
+        ("dog", dog_serializer, select(*dog_serializer.columns).join(Owner).where(Owner.sitter_id == sitter_id).order_by(Dog.dog_id)),
+        ("stay", stay_serializer, select(*stay_serializer.columns).where(Stay.sitter_id == sitter_id).order_by(Stay.stay_id)),
+        ("knowledge", knowledge_serializer, select(*knowledge_serializer.columns).join(Dog).join(Owner).where(Owner.sitter_id == sitter_id).order_by(Knowledge.knowledge_id)),
+    )
+
+
+class ExportStream:
+    """
+    The records of an export, read lazily from `session`. close() ends the
+    read and hands the replica back to `router`, also when the stream was
+    never iterated; it runs by itself once the records are exhausted.
+    """
+    def __init__(self, router, replica, session, records):
+        self.router = router
+        self.replica = replica
+        self.session = session
+        self._records = records
+        self._closed = False
+
+
+    def __iter__(self):
+        return self
+
+
+    def __next__(self):
+        try:
+            return next(self._records)
+        except BaseException:
+            self.close()
+            raise
+
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._records.close()
+        self.session.close()
+        self.router.release(self.replica)
+
+
+def validate_items(items, schema):
+    if not isinstance(items, list):
+        raise InvalidInputError("Expected a list")
+    if len(items) > MAX_BULK_ITEMS:
+        raise InvalidInputError(f"At most {MAX_BULK_ITEMS} items per request")
+    try:
+        return list(enumerate(list_adapter(schema).validate_python(items))), []
+    except (ValidationError, InvalidInputError):
+        # revalidate item by item only to report which items failed and why
+        pass
+    valid_items = []
+    errors = []
+    for index, item in enumerate(items):
+        try:
+            if not isinstance(item, dict):
+                raise InvalidInputError("Invalid input")
+            valid_items.append((index, schema(**item)))
+        except ValidationError:
+            errors.append({"index": index, "error": "Invalid input"})
+        except InvalidInputError as e:
+            errors.append({"index": index, "error": str(e)})
+    return valid_items, errors
+
+
+def paginate(query, key_column, page):
+    if page.after is not None:
+        query = query.filter(key_column > page.after)
+    query = query.order_by(key_column)
+    if page.limit is None:
+        return query.all(), None
+    rows = query.limit(page.limit + 1).all()
+    if len(rows) > page.limit:
+        rows = rows[:page.limit]
+        return rows, getattr(rows[-1], key_column.key)
+    return rows, None
+
+
+class SQLAlchemyHandler(AbstractDataHandler):
+    """
+    Every request path resolves with a single statement scoped to the sitter
+    from the JWT. Only when that statement comes back empty does
+    _not_found look up which part of the ownership chain is missing.
+    Subclasses provide what differs between databases: the schema setup,
+    the dialect's INSERT ... ON CONFLICT and full-text search.
+    Reads scoped to a sitter go through self.router to the replica_engines,
+    if any, and everything else to the primary engine.
+    """
+    def __init__(self, engine, password_hasher=None, image_variants=None, replica_engines=(), replica_selection=None):
+        self.password_hasher = password_hasher or PasswordHasher()
+        self.image_variants = image_variants or default_image_variants()
+        self.engine = engine
+        self.replica_engines = list(replica_engines)
+        self.Session = sessionmaker(bind=self.engine)
+        self.router = ReplicaRouter(self.Session, [sessionmaker(bind=replica_engine) for replica_engine in self.replica_engines], selection=replica_selection)
+        applied_migrations = self._migrate()
+        self.cascade_deletes = self._cascades_deletes()
+        if 'add_image_variant_columns' in applied_migrations:
+            self.refresh_image_variants()
+
+
+    @abstractmethod
+    def _migrate(self):
+        """
+        Brings the schema up to date and returns the names of the applied
+        migrations.
+        """
+        pass
+
+
+    def _cascades_deletes(self):
+        """
+        True when the database runs the models' ON DELETE CASCADE itself.
+        """
+        return True
+
+
+    @abstractmethod
+    def _upsert(self, model):
+        """
+        The dialect's insert(), the one with on_conflict_do_update.
+        """
+        pass
+
+
+    def _lock_dog_stays(self, session, dog_id):
+        """
+        Keeps other transactions from booking the dog until this one ends,
+        so the overlap check in add_stay and update_stay cannot race. SQLite
+        has a single writer already.
+        """
+        pass
+
+
+    @abstractmethod
+    def _begin_snapshot(self, session):
+        """
+        Starts the session's transaction so that every later read sees the
+        database as of the first one, until the session is closed.
+        """
+        pass
+
+
+    @abstractmethod
+    def _search_rows(self, session, sitter_id, words, limit, dog_columns):
+        """
+        The sitter's (dog rows, owner rows) matching every entry of words,
+        as returned by search_words, best match first.
+        """
+        pass
+
+
+    def _image_variant_values(self, img_url):
+        variants = self.image_variants.build(img_url)
+        return {f'img_{variant}_url': variants[variant] for variant in IMAGE_VARIANTS}
+
+
+    def refresh_image_variants(self):
+        """
+        Rebuilds the stored image variants of every dog, e.g. after the
+        variant builder changed. Dogs whose variants change get a new
+        version so cached listings are revalidated. Returns how many changed.
+        """
+        variant_columns = [getattr(Dog, f'img_{variant}_url') for variant in IMAGE_VARIANTS]
+        try:
+            with self.Session.begin() as session:
+                changed = []
+                for dog_id, img_url, *stored in session.query(Dog.dog_id, Dog.img_url, *variant_columns):
+                    values = self._image_variant_values(img_url)
+                    if list(values.values()) != stored:
+                        changed.append({"dog_id": dog_id, **values, "version": new_version()})
+                if changed:
+                    session.execute(update(Dog), changed)
+                return len(changed)
+        except (OperationalError, PoolTimeoutError):
+            raise DatabaseError("Database unavailable")
+
+
+    def _not_found(self, session, sitter_id, message, owner_id=None):
+        if session.query(Sitter.sitter_id).filter(Sitter.sitter_id == sitter_id).first() is None:
+            return NotFoundError("No sitter found")
+        if owner_id is not None and session.query(Owner.owner_id).filter(Owner.owner_id == owner_id, Owner.sitter_id == sitter_id).first() is None:
+            return NotFoundError("No owner found")
+        return NotFoundError(message)
+
+
+    def _owners_query(self, session, sitter_id, *entities):
+        return session.query(*entities).filter(Owner.sitter_id == sitter_id)
+
+
+    def _dogs_query(self, session, sitter_id, filters, *entities):
+        dogs_query = session.query(*entities).select_from(Dog).join(Owner).filter(Owner.sitter_id == sitter_id)
+        for key, value in filters.model_dump(exclude_none=True, exclude={'limit', 'after', 'variant', 'fields'}).items():
+            dogs_query = dogs_query.filter(getattr(Dog, key) == value)
+        return dogs_query
+
+
+    def authenticate_sitter(self, login_data):
+        try:
+            valid_data = LoginSchema(**login_data)
+        except ValidationError:
+            raise InvalidInputError("Invalid input")
+        password_hash, sitter = self._find_login(valid_data.email)
+        if not self.password_hasher.verify(valid_data.password, password_hash):
+            raise InvalidInputError("Email or password is wrong")
+        if self.password_hasher.needs_rehash(password_hash):
+            try:
+                new_password_hash = self.password_hasher.hash(valid_data.password)
+            except ServiceBusyError:
+                return sitter
+            self._replace_password_hash(sitter['sitter_id'], password_hash, new_password_hash)
+        return sitter
+
+
+    def _find_login(self, email):
+        try:
+            with self.Session() as session:
+                sitter_row = session.query(Sitter.password, *sitter_serializer.columns).filter(Sitter.email == email).first()
+                if not sitter_row:
+                    raise InvalidInputError("Email or password is wrong")
+                return sitter_row[0], sitter_serializer.from_row(sitter_row[1:])
+        except (OperationalError, PoolTimeoutError):
+            raise DatabaseError("Database unavailable")
+
+
+    def _replace_password_hash(self, sitter_id, old_password_hash, new_password_hash):
+        # compare-and-swap, so a password changed meanwhile is never overwritten
+        try:
+            with self.Session.begin() as session:
+                session.execute(
+                    update(Sitter)
+                    .where(Sitter.sitter_id == sitter_id, Sitter.password == old_password_hash)
+                    .values(password=new_password_hash)
+                )
+        except (OperationalError, PoolTimeoutError):
+            raise DatabaseError("Database unavailable")
+        
+        
+    def get_sitter(self, sitter_id):
+        try:
+            sitter_id = parse_id(sitter_id, "sitter_id")
+            with self.router.read(sitter_id) as session:
+                sitter_row = session.query(*sitter_serializer.columns).filter(Sitter.sitter_id == sitter_id).first()
+                if not sitter_row:
+                    raise NotFoundError("No sitter found")
+                sitter = sitter_serializer.from_row(sitter_row)
+                return sitter
+        except (OperationalError, PoolTimeoutError):
+            raise DatabaseError("Database unavailable")
+        
+
+    def add_sitter(self, new_sitter_data):
+        try:
+            valid_data = SitterSchema(**new_sitter_data)
+        except ValidationError:
+            raise InvalidInputError("Invalid input")
+        return self._insert_sitter(valid_data, self.password_hasher.hash(valid_data.password))
+
+
+    def _insert_sitter(self, valid_data, hashed_password):
+        try:
+            with self.Session.begin() as session:
+                new_sitter_row = session.execute(
+                    insert(Sitter)
+                    .values(
+                        first_name=valid_data.first_name,
+                        last_name=valid_data.last_name,
+                        email=valid_data.email,
+                        password=hashed_password
+                    )
+                    .returning(*sitter_serializer.columns)
+                ).first()
+                created_sitter = sitter_serializer.from_row(new_sitter_row)
+            self.router.record_write(created_sitter['sitter_id'])
+            return created_sitter
+        except IntegrityError:
+            raise InvalidInputError("Email already exists")
+        except (OperationalError, PoolTimeoutError):
+            raise DatabaseError("Database unavailable")
+        
+
+    def update_sitter(self, sitter_id, updated_data):
+        try:
+            valid_updated_data = UpdateSitterSchema(**updated_data).model_dump(exclude_unset=True)
+        except ValidationError:
+            raise InvalidInputError("Invalid input")
+        if 'password' in valid_updated_data:
+            valid_updated_data['password'] = self.password_hasher.hash(valid_updated_data['password'])
+        return self._update_sitter_row(sitter_id, valid_updated_data)
+
+
+    def _update_sitter_row(self, sitter_id, valid_updated_data):
+        try:
+            sitter_id = parse_id(sitter_id, "sitter_id")
+            with self.router.write(sitter_id) as session:
+                if valid_updated_data:
+                    updated_sitter_row = session.execute(
+                        update(Sitter)
+                        .where(Sitter.sitter_id == sitter_id)
+                        .values(**valid_updated_data)
+                        .returning(*sitter_serializer.columns)
+                    ).first()
+                else:
+                    updated_sitter_row = session.query(*sitter_serializer.columns).filter(Sitter.sitter_id == sitter_id).first()
+                if not updated_sitter_row:
+                    raise NotFoundError("No sitter found")
+                updated_sitter = sitter_serializer.from_row(updated_sitter_row)
+            return updated_sitter
+        except IntegrityError:
+            raise InvalidInputError("Email already exists")
+        except (OperationalError, PoolTimeoutError):
+            raise DatabaseError("Database unavailable")
+
+
+    def delete_sitter(self, sitter_id):
+        try:
+            sitter_id = parse_id(sitter_id, "sitter_id")
+            with self.router.write(sitter_id) as session:
+                if not self.cascade_deletes:
+                    session.execute(delete(Stay).where(Stay.sitter_id == sitter_id))
+                    session.execute(delete(Knowledge).where(Knowledge.dog_id.in_(sitter_dog_ids(sitter_id))))
+                    session.execute(delete(Dog).where(Dog.owner_id.in_(sitter_owner_ids(sitter_id))))
+                    session.execute(delete(Owner).where(Owner.sitter_id == sitter_id))
+                deleted_sitter_id = session.scalars(delete(Sitter).where(Sitter.sitter_id == sitter_id).returning(Sitter.sitter_id)).first()
+                if deleted_sitter_id is None:
+                    raise NotFoundError("No sitter found")
+        except (OperationalError, PoolTimeoutError):
+            raise DatabaseError("Database unavailable")
+
+
+    def get_all_owners(self, sitter_id, query_params=None):
+        try:
+            sitter_id = parse_id(sitter_id, "sitter_id")
+            with self.router.read(sitter_id) as session:
+                page = PageSchema(**(query_params or {}))
+                owner_rows, next_after = paginate(self._owners_query(session, sitter_id, *owner_serializer.columns), Owner.owner_id, page)
+                if not owner_rows:
+                    raise self._not_found(session, sitter_id, "No owners found")
+                owners = owner_serializer.from_rows(owner_rows)
+                return {"owners": owners, "next_after": next_after}
+        except ValidationError:
+            raise InvalidInputError("Invalid input")
+        except (OperationalError, PoolTimeoutError):
+            raise DatabaseError("Database unavailable")
+        
+    
+    def get_owner(self, sitter_id, owner_id):
+        try:
+            sitter_id = parse_id(sitter_id, "sitter_id")
+            with self.router.read(sitter_id) as session:
+                owner_id = parse_id(owner_id, "owner_id")
+                owner_row = session.query(*owner_serializer.columns).filter(Owner.owner_id == owner_id, Owner.sitter_id == sitter_id).first()
+                if not owner_row:
+                    raise self._not_found(session, sitter_id, "No owner found")
+                owner = owner_serializer.from_row(owner_row)
+                return owner
+        except (OperationalError, PoolTimeoutError):
+            raise DatabaseError("Database unavailable")
+        
+    
+    def add_owner(self, sitter_id, new_owner_data):
+        try:
+            sitter_id = parse_id(sitter_id, "sitter_id")
+            with self.router.write(sitter_id) as session:
+                valid_data = OwnerSchema(**new_owner_data)
+                owner_values = {**valid_data.model_dump(), "version": new_version()}
+                owner_select = select(Sitter.sitter_id, *column_literals(Owner, owner_values)).where(Sitter.sitter_id == sitter_id)
+                new_owner_row = session.execute(
+                    insert(Owner)
+                    .from_select(['sitter_id', *owner_values], owner_select)
+                    .returning(*owner_serializer.columns)
+                ).first()
+                if not new_owner_row:
+                    raise NotFoundError("No sitter found")
+                created_owner = owner_serializer.from_row(new_owner_row)
+                return created_owner
+        except IntegrityError:
+            raise InvalidInputError("Email or phone number already exists")
+        except ValidationError:
+            raise InvalidInputError("Invalid input")
+        except (OperationalError, PoolTimeoutError):
+            raise DatabaseError("Database unavailable")
+
+
+    def add_owners_bulk(self, sitter_id, new_owners_data):
+        try:
+            sitter_id = parse_id(sitter_id, "sitter_id")
+            valid_owners, errors = validate_items(new_owners_data, OwnerSchema)
+            with self.router.write(sitter_id) as session:
+                if session.query(Sitter.sitter_id).filter(Sitter.sitter_id == sitter_id).first() is None:
+                    raise NotFoundError("No sitter found")
+                emails = [owner.email for _, owner in valid_owners]
+                phone_numbers = [owner.phone_number for _, owner in valid_owners]
+                taken = set()
+                for email, phone_number in session.query(Owner.email, Owner.phone_number).filter(or_(Owner.email.in_(emails), Owner.phone_number.in_(phone_numbers))):
+                    taken.update((email, phone_number))
+                owner_rows = []
+                for index, owner in valid_owners:
+                    if owner.email in taken or owner.phone_number in taken:
+                        errors.append({"index": index, "error": "Email or phone number already exists"})
+                        continue
+                    taken.update((owner.email, owner.phone_number))
+                    owner_rows.append({"sitter_id": sitter_id, **owner.model_dump()})
+                created_owners = []
+                if owner_rows:
+                    new_owner_rows = session.execute(
+                        insert(Owner).returning(*owner_serializer.columns, sort_by_parameter_order=True),
+                        owner_rows
+                    ).all()
+                    created_owners = owner_serializer.from_rows(new_owner_rows)
+            errors.sort(key=lambda error: error["index"])
+            return {"created": created_owners, "errors": errors}
+        except IntegrityError:
+            raise InvalidInputError("Email or phone number already exists")
+        except (OperationalError, PoolTimeoutError):
+            raise DatabaseError("Database unavailable")
+
+
+    def update_owner(self, sitter_id, owner_id, updated_data):
+        try:
+            sitter_id = parse_id(sitter_id, "sitter_id")
+            with self.router.write(sitter_id) as session:
+                owner_id = parse_id(owner_id, "owner_id")
+                valid_updated_data = UpdateOwnerSchema(**updated_data).model_dump(exclude_unset=True)
+                if valid_updated_data:
+                    updated_owner_row = session.execute(
+                        update(Owner)
+                        .where(Owner.owner_id == owner_id, Owner.sitter_id == sitter_id)
+                        .values(**valid_updated_data)
+                        .returning(*owner_serializer.columns)
+                    ).first()
+                else:
+                    updated_owner_row = session.query(*owner_serializer.columns).filter(Owner.owner_id == owner_id, Owner.sitter_id == sitter_id).first()
+                if not updated_owner_row:
+                    raise self._not_found(session, sitter_id, "No owner found")
+                updated_owner = owner_serializer.from_row(updated_owner_row)
+            return updated_owner
+        except IntegrityError:
+            raise InvalidInputError("Email or phone number already exists")
+        except ValidationError:
+            raise InvalidInputError("Invalid input")
+        except (OperationalError, PoolTimeoutError):
+            raise DatabaseError("Database unavailable")
+
+
+    def delete_owner(self, sitter_id, owner_id):
+        try:
+            sitter_id = parse_id(sitter_id, "sitter_id")
+            with self.router.write(sitter_id) as session:
+                owner_id = parse_id(owner_id, "owner_id")
+                if not self.cascade_deletes:
+                    owned_owner_ids = sitter_owner_ids(sitter_id).where(Owner.owner_id == owner_id)
+                    owner_dog_ids = select(Dog.dog_id).where(Dog.owner_id.in_(owned_owner_ids))
+                    session.execute(delete(Stay).where(Stay.dog_id.in_(owner_dog_ids)))
+                    session.execute(delete(Knowledge).where(Knowledge.dog_id.in_(owner_dog_ids)))
+                    session.execute(delete(Dog).where(Dog.owner_id.in_(owned_owner_ids)))
+                deleted_owner_id = session.scalars(
+                    delete(Owner)
+                    .where(Owner.owner_id == owner_id, Owner.sitter_id == sitter_id)
+                    .returning(Owner.owner_id)
+                ).first()
+                if deleted_owner_id is None:
+                    raise self._not_found(session, sitter_id, "No owner found")
+        except (OperationalError, PoolTimeoutError):
+            raise DatabaseError("Database unavailable")
+        
+
+    def get_all_dogs(self, sitter_id, query_params=None):
+        try:
+            sitter_id = parse_id(sitter_id, "sitter_id")
+            with self.router.read(sitter_id) as session:
+                filters = DogFilterSchema(**(query_params or {}))
+                columns, serializer = dog_selection(filters)
+                dog_rows, next_after = paginate(self._dogs_query(session, sitter_id, filters, *columns), Dog.dog_id, filters)
+                if not dog_rows:
+                    raise self._not_found(session, sitter_id, "No dogs found")
+                dogs = serializer.from_rows(dog_rows)
+                return {"dogs": dogs, "next_after": next_after}
+        except ValidationError:
+            raise InvalidInputError("Invalid input")
+        except (OperationalError, PoolTimeoutError):
+            raise DatabaseError("Database unavailable")
+        
+
+    def get_dog(self, sitter_id, dog_id, query_params=None):
+        try:
+            sitter_id = parse_id(sitter_id, "sitter_id")
+            with self.router.read(sitter_id) as session:
+                dog_id = parse_id(dog_id, "dog_id")
+                columns, serializer = dog_selection(DogFieldsSchema(**(query_params or {})))
+                dog_row = session.query(*columns).join(Owner).filter(Dog.dog_id == dog_id, Owner.sitter_id == sitter_id).first()
+                if not dog_row:
+                    raise self._not_found(session, sitter_id, "No dog found")
+                dog = serializer.from_row(dog_row)
+                return dog
+        except ValidationError:
+            raise InvalidInputError("Invalid input")
+        except (OperationalError, PoolTimeoutError):
+            raise DatabaseError("Database unavailable")
+
+    
+    def add_dog(self, sitter_id, owner_id, new_dog_data):
+        try:
+            sitter_id = parse_id(sitter_id, "sitter_id")
+            with self.router.write(sitter_id) as session:
+                owner_id = parse_id(owner_id, "owner_id")
+                valid_data = DogSchema(**new_dog_data)
+                dog_values = {**valid_data.model_dump(), **self._image_variant_values(valid_data.img_url), "version": new_version()}
+                dog_select = select(Owner.owner_id, *column_literals(Dog, dog_values)).where(Owner.owner_id == owner_id, Owner.sitter_id == sitter_id)
+                new_dog_row = session.execute(
+                    insert(Dog)
+                    .from_select(['owner_id', *dog_values], dog_select)
+                    .returning(*dog_serializer.columns)
+                ).first()
+                if not new_dog_row:
+                    raise self._not_found(session, sitter_id, "No owner found")
+                created_dog = dog_serializer.from_row(new_dog_row)
+                return created_dog
+        except IntegrityError:
+            raise InvalidInputError("chip id already exists")
+        except ValidationError:
+            raise InvalidInputError("Invalid input")
+        except (OperationalError, PoolTimeoutError):
+            raise DatabaseError("Database unavailable")
+    
+
+    def add_dogs_bulk(self, sitter_id, owner_id, new_dogs_data):
+        try:
+            sitter_id = parse_id(sitter_id, "sitter_id")
+            owner_id = parse_id(owner_id, "owner_id")
+            valid_dogs, errors = validate_items(new_dogs_data, DogSchema)
+            with self.router.write(sitter_id) as session:
+                if session.query(Owner.owner_id).filter(Owner.owner_id == owner_id, Owner.sitter_id == sitter_id).first() is None:
+                    raise self._not_found(session, sitter_id, "No owner found")
+                chip_ids = [dog.chip_id for _, dog in valid_dogs]
+                taken = {chip_id for chip_id, in session.query(Dog.chip_id).filter(Dog.chip_id.in_(chip_ids))}
+                dog_rows = []
+                for index, dog in valid_dogs:
+                    if dog.chip_id in taken:
+                        errors.append({"index": index, "error": "chip id already exists"})
+                        continue
+                    taken.add(dog.chip_id)
+                    dog_rows.append({"owner_id": owner_id, **dog.model_dump(), **self._image_variant_values(dog.img_url)})
+                created_dogs = []
+                if dog_rows:
+                    new_dog_rows = session.execute(
+                        insert(Dog).returning(*dog_serializer.columns, sort_by_parameter_order=True),
+                        dog_rows
+                    ).all()
+                    created_dogs = dog_serializer.from_rows(new_dog_rows)
+            errors.sort(key=lambda error: error["index"])
+            return {"created": created_dogs, "errors": errors}
+        except IntegrityError:
+            raise InvalidInputError("chip id already exists")
+        except (OperationalError, PoolTimeoutError):
+            raise DatabaseError("Database unavailable")
+
+
+    def update_dog(self, sitter_id, dog_id, updated_data):
+        try:
+            sitter_id = parse_id(sitter_id, "sitter_id")
+            with self.router.write(sitter_id) as session:
+                dog_id = parse_id(dog_id, "dog_id")
+                valid_updated_data = UpdateDogSchema(**updated_data).model_dump(exclude_unset=True)
+                if 'img_url' in valid_updated_data:
+                    valid_updated_data.update(self._image_variant_values(valid_updated_data['img_url']))
+                if valid_updated_data:
+                    updated_dog_row = session.execute(
+                        update(Dog)
+                        .where(Dog.dog_id == dog_id, Dog.owner_id.in_(sitter_owner_ids(sitter_id)))
+                        .values(**valid_updated_data)
+                        .returning(*dog_serializer.columns)
+                    ).first()
+                else:
+                    updated_dog_row = session.query(*dog_serializer.columns).join(Owner).filter(Dog.dog_id == dog_id, Owner.sitter_id == sitter_id).first()
+                if not updated_dog_row:
+                    raise self._not_found(session, sitter_id, "No dog found")
+                updated_dog = dog_serializer.from_row(updated_dog_row)
+            return updated_dog
+        except IntegrityError:
+            raise InvalidInputError("chip id already exists")
+        except ValidationError:
+            raise InvalidInputError("Invalid input")
+        except (OperationalError, PoolTimeoutError):
+            raise DatabaseError("Database unavailable")
+
+
+    def delete_dog(self, sitter_id, dog_id):
+        try:
+            sitter_id = parse_id(sitter_id, "sitter_id")
+            with self.router.write(sitter_id) as session:
+                dog_id = parse_id(dog_id, "dog_id")
+                if not self.cascade_deletes:
+                    session.execute(delete(Stay).where(Stay.dog_id == dog_id, Stay.sitter_id == sitter_id))
+                    session.execute(delete(Knowledge).where(Knowledge.dog_id == dog_id, Knowledge.dog_id.in_(sitter_dog_ids(sitter_id))))
+                deleted_dog_id = session.scalars(
+                    delete(Dog)
+                    .where(Dog.dog_id == dog_id, Dog.owner_id.in_(sitter_owner_ids(sitter_id)))
+                    .returning(Dog.dog_id)
+                ).first()
+                if deleted_dog_id is None:
+                    raise self._not_found(session, sitter_id, "No dog found")
+        except (OperationalError, PoolTimeoutError):
+            raise DatabaseError("Database unavailable")
+        
+
+    def get_owner_dogs(self, sitter_id, owner_id, query_params=None):
+        try:
+            sitter_id = parse_id(sitter_id, "sitter_id")
+            with self.router.read(sitter_id) as session:
+                owner_id = parse_id(owner_id, "owner_id")
+                columns, serializer = dog_selection(DogFieldsSchema(**(query_params or {})))
+                owner_dog_rows = session.query(*columns).join(Owner).filter(Owner.owner_id == owner_id, Owner.sitter_id == sitter_id).order_by(Dog.dog_id).all()
+                if not owner_dog_rows:
+                    raise self._not_found(session, sitter_id, "No dogs found", owner_id=owner_id)
+                owner_dogs = serializer.from_rows(owner_dog_rows)
+                return owner_dogs
+        except ValidationError:
+            raise InvalidInputError("Invalid input")
+        except (OperationalError, PoolTimeoutError):
+            raise DatabaseError("Database unavailable")
+
+
+    def get_skill_matrix(self, sitter_id):
+        """
+        Knowledge levels of all the sitter's dogs from one LEFT JOIN, returned
+        column-oriented: dog_ids label the rows of levels and skill_ids (with
+        their calls) the columns, with null where a dog has no level. Only
+        skills some dog has a level for get a column.
+        """
+        try:
+            sitter_id = parse_id(sitter_id, "sitter_id")
+            with self.router.read(sitter_id) as session:
+                level_rows = (
+                    session.query(Dog.dog_id, Skill.skill_id, Skill.call, Knowledge.knowledge)
+                    .select_from(Dog)
+                    .join(Owner)
+                    .outerjoin(Knowledge, Knowledge.dog_id == Dog.dog_id)
+                    .outerjoin(Skill, Skill.skill_id == Knowledge.skill_id)
+                    .filter(Owner.sitter_id == sitter_id)
+                    .order_by(Dog.dog_id)
+                    .all()
+                )
+                if not level_rows:
+                    raise self._not_found(session, sitter_id, "No dogs found")
+            dog_positions = {}
+            calls = {}
+            for dog_id, skill_id, call, _ in level_rows:
+                dog_positions.setdefault(dog_id, len(dog_positions))
+                if skill_id is not None:
+                    calls[skill_id] = call
+            skill_ids = sorted(calls)
+            skill_positions = {skill_id: position for position, skill_id in enumerate(skill_ids)}
+            levels = [[None] * len(skill_ids) for _ in dog_positions]
+            for dog_id, skill_id, _, knowledge in level_rows:
+                if skill_id is not None:
+                    levels[dog_positions[dog_id]][skill_positions[skill_id]] = knowledge
+            return {"dog_ids": list(dog_positions), "skill_ids": skill_ids, "calls": [calls[skill_id] for skill_id in skill_ids], "levels": levels}
+        except (OperationalError, PoolTimeoutError):
+            raise DatabaseError("Database unavailable")
+
+
+    def get_dog_skills(self, sitter_id, dog_id):
+        try:
+            sitter_id = parse_id(sitter_id, "sitter_id")
+            with self.router.read(sitter_id) as session:
+                dog_id = parse_id(dog_id, "dog_id")
+                skill_rows = (
+                    session.query(Skill.skill_id, Skill.call, Knowledge.knowledge)
+                    .select_from(Knowledge)
+                    .join(Skill)
+                    .filter(Knowledge.dog_id == dog_id, Knowledge.dog_id.in_(sitter_dog_ids(sitter_id)))
+                    .order_by(Skill.skill_id)
+                    .all()
+                )
+                if not skill_rows:
+                    if session.query(Dog.dog_id).filter(Dog.dog_id == dog_id, Dog.owner_id.in_(sitter_owner_ids(sitter_id))).first() is None:
+                        raise self._not_found(session, sitter_id, "No dog found")
+                    raise NotFoundError("No skills found")
+                skills = [{"skill_id": skill_id, "call": call, "knowledge": knowledge} for skill_id, call, knowledge in skill_rows]
+                return {"dog_id": dog_id, "skills": skills}
+        except (OperationalError, PoolTimeoutError):
+            raise DatabaseError("Database unavailable")
+
+
+    def update_dog_skills(self, sitter_id, dog_id, skills_data):
+        """
+        Sets the listed knowledge levels with one INSERT ... ON CONFLICT DO
+        UPDATE on the (dog_id, skill_id) unique index. Items for unknown
+        skills are reported in errors and the rest are saved; when a skill is
+        listed twice the later level wins.
+        """
+        try:
+            sitter_id = parse_id(sitter_id, "sitter_id")
+            dog_id = parse_id(dog_id, "dog_id")
+            valid_levels, errors = validate_items(skills_data, KnowledgeSchema)
+            with self.router.write(sitter_id) as session:
+                if session.query(Dog.dog_id).filter(Dog.dog_id == dog_id, Dog.owner_id.in_(sitter_owner_ids(sitter_id))).first() is None:
+                    raise self._not_found(session, sitter_id, "No dog found")
+                skill_ids = {level.skill_id for _, level in valid_levels}
+                known_skill_ids = set(session.scalars(select(Skill.skill_id).where(Skill.skill_id.in_(skill_ids))))
+                knowledge_rows = {}
+                for index, level in valid_levels:
+                    if level.skill_id not in known_skill_ids:
+                        errors.append({"index": index, "error": "No skill found"})
+                        continue
+                    knowledge_rows[level.skill_id] = {"dog_id": dog_id, **level.model_dump()}
+                updated_skills = []
+                if knowledge_rows:
+                    # a single multi-row VALUES, executemany would upsert row by row
+                    upsert = self._upsert(Knowledge).values(list(knowledge_rows.values()))
+                    updated_rows = session.execute(
+                        upsert.on_conflict_do_update(index_elements=[Knowledge.dog_id, Knowledge.skill_id], set_={"knowledge": upsert.excluded.knowledge})
+                        .returning(Knowledge.skill_id, Knowledge.knowledge)
+                    ).all()
+                    updated_skills = [{"skill_id": skill_id, "knowledge": knowledge} for skill_id, knowledge in sorted(updated_rows)]
+            errors.sort(key=lambda error: error["index"])
+            return {"dog_id": dog_id, "updated": updated_skills, "errors": errors}
+        except (OperationalError, PoolTimeoutError):
+            raise DatabaseError("Database unavailable")
+
+
+    def search(self, sitter_id, query_params=None):
+        """
+        The sitter's dogs and owners matching every word of q as a prefix,
+        best rank first.
+        """
+        try:
+            sitter_id = parse_id(sitter_id, "sitter_id")
+            with self.router.read(sitter_id) as session:
+                search = SearchSchema(**(query_params or {}))
+                words = search_words(search.q)
+                dog_columns, dog_row_serializer = dog_selection(search)
+                dog_rows, owner_rows = self._search_rows(session, sitter_id, words, search.limit, dog_columns)
+                if not dog_rows and not owner_rows and session.query(Sitter.sitter_id).filter(Sitter.sitter_id == sitter_id).first() is None:
+                    raise NotFoundError("No sitter found")
+                return {"dogs": dog_row_serializer.from_rows(dog_rows), "owners": owner_serializer.from_rows(owner_rows)}
+        except ValidationError:
+            raise InvalidInputError("Invalid input")
+        except (OperationalError, PoolTimeoutError):
+            raise DatabaseError("Database unavailable")
+
+
+    def _stay_not_saved(self, session, sitter_id, dog_id=None, stay_id=None):
+        if stay_id is not None and session.query(Stay.stay_id).filter(Stay.stay_id == stay_id, Stay.sitter_id == sitter_id).first() is None:
+            return self._not_found(session, sitter_id, "No stay found")
+        if dog_id is not None and session.query(Dog.dog_id).filter(Dog.dog_id == dog_id, Dog.owner_id.in_(sitter_owner_ids(sitter_id))).first() is None:
+            return self._not_found(session, sitter_id, "No dog found")
+        return InvalidInputError("Dog already has a stay in this period")
+
+
+    def get_stays(self, sitter_id, query_params=None):
+        try:
+            sitter_id = parse_id(sitter_id, "sitter_id")
+            with self.router.read(sitter_id) as session:
+                filters = StayFilterSchema(**(query_params or {}))
+                stays_query = session.query(*stay_serializer.columns).filter(Stay.sitter_id == sitter_id)
+                if filters.dog_id is not None:
+                    stays_query = stays_query.filter(Stay.dog_id == filters.dog_id)
+                if filters.start is not None:
+                    stays_query = stays_query.filter(Stay.checkin > filters.start - timedelta(days=MAX_STAY_DAYS), Stay.checkout > filters.start)
+                if filters.end is not None:
+                    stays_query = stays_query.filter(Stay.checkin <= filters.end)
+                stay_rows, next_after = paginate(stays_query, Stay.stay_id, filters)
+                if not stay_rows:
+                    raise self._not_found(session, sitter_id, "No stays found")
+                stays = [serialize_stay(row) for row in stay_rows]
+                return {"stays": stays, "next_after": next_after}
+        except ValidationError:
+            raise InvalidInputError("Invalid input")
+        except (OperationalError, PoolTimeoutError):
+            raise DatabaseError("Database unavailable")
+
+
+    def get_stay(self, sitter_id, stay_id):
+        try:
+            sitter_id = parse_id(sitter_id, "sitter_id")
+            with self.router.read(sitter_id) as session:
+                stay_id = parse_id(stay_id, "stay_id")
+                stay_row = session.query(*stay_serializer.columns).filter(Stay.stay_id == stay_id, Stay.sitter_id == sitter_id).first()
+                if not stay_row:
+                    raise self._not_found(session, sitter_id, "No stay found")
+                stay = serialize_stay(stay_row)
+                return stay
+        except (OperationalError, PoolTimeoutError):
+            raise DatabaseError("Database unavailable")
+
+
+    def add_stay(self, sitter_id, new_stay_data):
+        try:
+            sitter_id = parse_id(sitter_id, "sitter_id")
+            with self.router.write(sitter_id) as session:
+                valid_data = StaySchema(**new_stay_data)
+                booked = aliased(Stay)
+                self._lock_dog_stays(session, valid_data.dog_id)
+                stay_values = select(
+                    Dog.dog_id,
+                    Owner.sitter_id,
+                    *column_literals(Stay, {"checkin": valid_data.checkin, "checkout": valid_data.checkout})
+                ).join(Owner).where(
+                    Dog.dog_id == valid_data.dog_id,
+                    Owner.sitter_id == sitter_id,
+                    ~exists().where(booked.dog_id == Dog.dog_id, *stays_overlapping(booked, valid_data.checkin, valid_data.checkout))
+                )
+                new_stay_row = session.execute(
+                    insert(Stay)
+                    .from_select(['dog_id', 'sitter_id', 'checkin', 'checkout'], stay_values)
+                    .returning(*stay_serializer.columns)
+                ).first()
+                if not new_stay_row:
+                    raise self._stay_not_saved(session, sitter_id, dog_id=valid_data.dog_id)
+                created_stay = serialize_stay(new_stay_row)
+                return created_stay
+        except ValidationError:
+            raise InvalidInputError("Invalid input")
+        except (OperationalError, PoolTimeoutError):
+            raise DatabaseError("Database unavailable")
+
+
+    def update_stay(self, sitter_id, stay_id, updated_data):
+        try:
+            sitter_id = parse_id(sitter_id, "sitter_id")
+            with self.router.write(sitter_id) as session:
+                stay_id = parse_id(stay_id, "stay_id")
+                valid_data = StayDatesSchema(**updated_data)
+                self._lock_dog_stays(session, select(Stay.dog_id).where(Stay.stay_id == stay_id, Stay.sitter_id == sitter_id).scalar_subquery())
+                booked = aliased(Stay)
+                updated_stay_row = session.execute(
+                    update(Stay)
+                    .where(
+                        Stay.stay_id == stay_id,
+                        Stay.sitter_id == sitter_id,
+                        ~exists().where(booked.dog_id == Stay.dog_id, booked.stay_id != Stay.stay_id, *stays_overlapping(booked, valid_data.checkin, valid_data.checkout))
+                    )
+                    .values(checkin=valid_data.checkin, checkout=valid_data.checkout)
+                    .returning(*stay_serializer.columns)
+                ).first()
+                if not updated_stay_row:
+                    raise self._stay_not_saved(session, sitter_id, stay_id=stay_id)
+                updated_stay = serialize_stay(updated_stay_row)
+            return updated_stay
+        except ValidationError:
+            raise InvalidInputError("Invalid input")
+        except (OperationalError, PoolTimeoutError):
+            raise DatabaseError("Database unavailable")
+
+
+    def delete_stay(self, sitter_id, stay_id):
+        try:
+            sitter_id = parse_id(sitter_id, "sitter_id")
+            with self.router.write(sitter_id) as session:
+                stay_id = parse_id(stay_id, "stay_id")
+                deleted_stay_id = session.scalars(
+                    delete(Stay)
+                    .where(Stay.stay_id == stay_id, Stay.sitter_id == sitter_id)
+                    .returning(Stay.stay_id)
+                ).first()
+                if deleted_stay_id is None:
+                    raise self._not_found(session, sitter_id, "No stay found")
+        except (OperationalError, PoolTimeoutError):
+            raise DatabaseError("Database unavailable")
+
+
+    def get_availability(self, sitter_id, query_params=None):
+        """
+        Day-by-day count of dogs staying with the sitter. A stay occupies the
+        days from checkin up to, but not including, checkout. Only the stays
+        touching the range are read, off the (sitter_id, checkin, checkout)
+        index, and a sweep over their start/end deltas turns them into counts.
+        """
+        try:
+            sitter_id = parse_id(sitter_id, "sitter_id")
+            with self.router.read(sitter_id) as session:
+                period = AvailabilitySchema(**(query_params or {}))
+                days = (period.end - period.start).days + 1
+                stay_rows = session.query(Stay.checkin, Stay.checkout).filter(
+                    Stay.sitter_id == sitter_id,
+                    *stays_overlapping(Stay, period.start, period.end + timedelta(days=1))
+                ).all()
+                if not stay_rows and session.query(Sitter.sitter_id).filter(Sitter.sitter_id == sitter_id).first() is None:
+                    raise NotFoundError("No sitter found")
+            deltas = [0] * (days + 1)
+            for checkin, checkout in stay_rows:
+                deltas[max((checkin - period.start).days, 0)] += 1
+                deltas[min((checkout - period.start).days, days)] -= 1
+            occupancy = []
+            occupied = 0
+            for offset in range(days):
+                occupied += deltas[offset]
+                occupancy.append({"date": (period.start + timedelta(days=offset)).isoformat(), "occupied": occupied})
+            return {"from": period.start.isoformat(), "to": period.end.isoformat(), "days": occupancy}
+        except ValidationError:
+            raise InvalidInputError("Invalid input")
+        except (OperationalError, PoolTimeoutError):
+            raise DatabaseError("Database unavailable")
+
+
+    def get_versions(self, sitter_id, resource, resource_id=None, query_params=None):
+        """
+        Returns the (id, version) pairs and next_after that the matching read
+        would produce, without loading whole rows. Missing rows just give an
+        empty list; the read itself reports why.
+        """
+        try:
+            sitter_id = parse_id(sitter_id, "sitter_id")
+            with self.router.read(sitter_id) as session:
+                next_after = None
+                if resource == 'sitter':
+                    versions = session.query(Sitter.sitter_id, Sitter.version).filter(Sitter.sitter_id == sitter_id).all()
+                elif resource == 'owners':
+                    page = PageSchema(**(query_params or {}))
+                    versions, next_after = paginate(self._owners_query(session, sitter_id, Owner.owner_id, Owner.version), Owner.owner_id, page)
+                elif resource == 'owner':
+                    owner_id = parse_id(resource_id, "owner_id")
+                    versions = self._owners_query(session, sitter_id, Owner.owner_id, Owner.version).filter(Owner.owner_id == owner_id).all()
+                elif resource == 'dogs':
+                    filters = DogFilterSchema(**(query_params or {}))
+                    versions, next_after = paginate(self._dogs_query(session, sitter_id, filters, Dog.dog_id, Dog.version), Dog.dog_id, filters)
+                elif resource == 'dog':
+                    dog_id = parse_id(resource_id, "dog_id")
+                    versions = self._dogs_query(session, sitter_id, DogFilterSchema(), Dog.dog_id, Dog.version).filter(Dog.dog_id == dog_id).all()
+                elif resource == 'owner_dogs':
+                    owner_id = parse_id(resource_id, "owner_id")
+                    versions = self._dogs_query(session, sitter_id, DogFilterSchema(), Dog.dog_id, Dog.version).filter(Owner.owner_id == owner_id).order_by(Dog.dog_id).all()
+                else:
+                    raise InvalidInputError(f"Unknown resource {resource}")
+                return {"versions": [tuple(row) for row in versions], "next_after": next_after}
+        except ValidationError:
+            raise InvalidInputError("Invalid input")
+        except (OperationalError, PoolTimeoutError):
+            raise DatabaseError("Database unavailable")
+
+
+    def export_sitter_data(self, sitter_id):
+        sitter_id = parse_id(sitter_id, "sitter_id")
+        # held until the stream is closed, so least_busy counts the export as busy
+        replica = self.router.acquire(sitter_id)
+        session = self.router.session_factory(replica)()
+        try:
+            self._begin_snapshot(session)
+            sitter_row = session.query(*sitter_serializer.columns).filter(Sitter.sitter_id == sitter_id).first()
+            if not sitter_row:
+                raise NotFoundError("No sitter found")
+        except NotFoundError:
+            session.close()
+            self.router.release(replica)
+            raise
+        except (OperationalError, PoolTimeoutError):
+            session.close()
+            self.router.release(replica)
+            raise DatabaseError("Database unavailable")
+        return ExportStream(self.router, replica, session, self._stream_export(session, sitter_serializer.from_row(sitter_row)))
+
+
+    def _stream_export(self, session, sitter):
+        """
+        Reads inside the snapshot export_sitter_data began, so a write made
+        while the export streams is either all in it or not at all.
+        yield_per keeps only one batch of rows alive at a time.
+        """
+        yield "sitter", sitter
+        for record_type, serializer, statement in export_statements(sitter['sitter_id']):
+            for row in session.execute(statement.execution_options(yield_per=EXPORT_BATCH_SIZE)):
+                yield record_type, serializer.from_row(row)
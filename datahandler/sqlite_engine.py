@@ -0,0 +1,73 @@
+import os
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import create_async_engine
+from metrics import instrument_engine
+
+
+DEFAULT_ENGINE_PROFILE = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -64000,
+    "foreign_keys": "ON",
+    "pool_size": 5,
+    "max_overflow": 10,
+    "pool_timeout": 10,
+}
+
+PRAGMAS = ("journal_mode", "synchronous", "busy_timeout", "mmap_size", "cache_size", "foreign_keys")
+POOL_SETTINGS = ("pool_size", "max_overflow", "pool_timeout")
+
+
+def engine_profile_from_env(defaults=DEFAULT_ENGINE_PROFILE, prefix='SQLITE'):
+    """
+    `defaults` overridden by <prefix>_<SETTING> environment variables, e.g.
+    SQLITE_BUSY_TIMEOUT=10000 or SQLITE_POOL_SIZE=20.
+    """
+    profile = dict(defaults)
+    for setting, default in defaults.items():
+        value = os.environ.get(f'{prefix}_{setting.upper()}')
+        if value is not None:
+            profile[setting] = type(default)(value)
+    return profile
+
+
+def _engine_kwargs(profile):
+    engine_kwargs = {setting: profile[setting] for setting in POOL_SETTINGS if profile.get(setting) is not None}
+    if profile.get("busy_timeout") is not None:
+        engine_kwargs["connect_args"] = {"timeout": profile["busy_timeout"] / 1000}
+    return engine_kwargs
+
+
+def _apply_pragmas_on_connect(engine, profile):
+    pragmas = [(pragma, profile[pragma]) for pragma in PRAGMAS if profile.get(pragma) is not None]
+
+    @event.listens_for(engine, "connect")
+    def apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma, value in pragmas:
+            cursor.execute(f"PRAGMA {pragma}={value}")
+        cursor.close()
+
+
+def create_sqlite_engine(url, profile=None):
+    """
+    Settings set to None are left at the SQLite/SQLAlchemy default.
+    """
+    profile = profile if profile is not None else engine_profile_from_env()
+    engine = create_engine(url, **_engine_kwargs(profile))
+    _apply_pragmas_on_connect(engine, profile)
+    instrument_engine(engine)
+    return engine
+
+
+def create_async_sqlite_engine(url, profile=None):
+    """
+    Same profile as create_sqlite_engine, for a sqlite+aiosqlite:// URL.
+    """
+    profile = profile if profile is not None else engine_profile_from_env()
+    engine = create_async_engine(url, **_engine_kwargs(profile))
+    _apply_pragmas_on_connect(engine.sync_engine, profile)
+    instrument_engine(engine.sync_engine)
+    return engine
@@ -7,385 +7,102 @@ if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from datahandler.abstract_handler import AbstractDataHandler
-from datahandler.models import Base, Sitter, Owner, Dog, Stay, Skill, Knowledge
-from sqlalchemy.inspection import inspect
-from datahandler.schemas import SitterSchema, UpdateSitterSchema, LoginSchema, OwnerSchema, UpdateOwnerSchema, DogSchema, UpdateDogSchema
-from sqlalchemy.exc import IntegrityError, OperationalError
-from pydantic import ValidationError
-from exceptions import NotFoundError, InvalidInputError, DatabaseError
-from bcrypt import hashpw, gensalt, checkpw
-
-
-def to_dict(obj):
-    dict_obj = {c.key: getattr(obj, c.key) for c in inspect(obj).mapper.column_attrs}
-    dict_obj.pop('password', None)
-    return dict_obj
-
-
-class SQLiteHandler(AbstractDataHandler):
-    def __init__(self, db_file_name):
-        self.engine = create_engine(f'sqlite:///data/{db_file_name}')
-        self.Session = sessionmaker(bind=self.engine)
-        Base.metadata.create_all(self.engine)
-
-
-    def authenticate_sitter(self, login_data):
-        try:
-            with self.Session.begin() as session:
-                valid_data = LoginSchema(**login_data)
-                sitter_obj = session.query(Sitter).filter(Sitter.email == valid_data.email).first()
-                if not sitter_obj:
-                    raise InvalidInputError("Email or password is wrong")
-                if checkpw(valid_data.password.encode('utf-8'), sitter_obj.password.encode('utf-8')):
-                    sitter = to_dict(sitter_obj)
-                    return sitter
-                else:
-                    raise InvalidInputError("Email or password is wrong")
-        except ValidationError:
-            raise InvalidInputError("Invalid input")
-        except OperationalError:
-            raise DatabaseError("Database unavailable")        
-        
-        
-    def get_sitter(self, sitter_id):
-        try:
-            with self.Session.begin() as session:
-                if not sitter_id.isdigit():
-                    raise InvalidInputError("sitter_id must be a number")
-                sitter_obj = session.query(Sitter).filter(Sitter.sitter_id == sitter_id).first()
-                if not sitter_obj:
-                    raise NotFoundError("No sitter found")
-                sitter = to_dict(sitter_obj)
-                return sitter
-        except OperationalError:
-            raise DatabaseError("Database unavailable")
-        
-
-    def add_sitter(self, new_sitter_data):
-        try:
-            with self.Session.begin() as session:
-                valid_data = SitterSchema(**new_sitter_data)
-                hashed_password = hashpw(valid_data.password.encode('utf-8'), gensalt())
-                new_sitter = Sitter(
-                    first_name=valid_data.first_name,
-                    last_name=valid_data.last_name,
-                    email=valid_data.email,
-                    password=hashed_password.decode('utf-8')
-                )
-                session.add(new_sitter)
-                session.flush()
-                created_sitter = to_dict(new_sitter)
-                return created_sitter
-        except IntegrityError:
-            raise InvalidInputError("Email already exists")
-        except ValidationError:
-            raise InvalidInputError("Invalid input")
-        except OperationalError:
-            raise DatabaseError("Database unavailable")
-        
-
-    def update_sitter(self, sitter_id, updated_data):
-        try:
-            with self.Session.begin() as session:
-                if not sitter_id.isdigit():
-                    raise InvalidInputError("sitter_id must be a number")
-                sitter_to_update = session.query(Sitter).filter(Sitter.sitter_id == sitter_id).first()
-                if not sitter_to_update:
-                    raise NotFoundError("No sitter found")
-                valid_updated_data = UpdateSitterSchema(**updated_data).model_dump(exclude_unset=True)
-                if 'password' in valid_updated_data:
-                    hashed_password = hashpw(valid_updated_data['password'].encode('utf-8'), gensalt())
-                    valid_updated_data['password'] = hashed_password.decode('utf-8')
-                for key, value in valid_updated_data.items():
-                    setattr(sitter_to_update, key, value)
-                updated_sitter = to_dict(sitter_to_update)
-            return updated_sitter
-        except IntegrityError:
-            raise InvalidInputError("Email already exists")
-        except ValidationError:
-            raise InvalidInputError("Invalid input")
-        except OperationalError:
-            raise DatabaseError("Database unavailable")
-
-
-    def delete_sitter(self, sitter_id):
-        try:
-            with self.Session.begin() as session:
-                if not sitter_id.isdigit():
-                    raise InvalidInputError("sitter_id must be a number")
-                sitter_to_delete = session.query(Sitter).filter(Sitter.sitter_id == sitter_id).first()
-                if not sitter_to_delete:
-                    raise NotFoundError("No sitter found")
-                dogs_to_delete = session.query(Dog).join(Owner).filter(Owner.sitter_id == sitter_id).all()
-                for dog in dogs_to_delete:
-                    session.delete(dog)
-                owners_to_delete = session.query(Owner).filter(Owner.sitter_id == sitter_id).all()
-                for owner in owners_to_delete:
-                    session.delete(owner)
-                session.delete(sitter_to_delete)
-                session.commit()
-        except OperationalError:
-            raise DatabaseError("Database unavailable")
-
-
-    def get_all_owners(self, sitter_id):
-        try:
-            with self.Session.begin() as session:
-                if not sitter_id.isdigit():
-                    raise InvalidInputError("sitter_id must be a number")
-                sitter_obj = session.query(Sitter).filter(Sitter.sitter_id == sitter_id).first()
-                if not sitter_obj:
-                    raise NotFoundError("No sitter found")
-                owners_obj = session.query(Owner).filter(Owner.sitter_id == sitter_id).all()
-                if not owners_obj:
-                    raise NotFoundError("No owners found")
-                owners = [to_dict(obj) for obj in owners_obj]
-                return owners
-        except OperationalError:
-            raise DatabaseError("Database unavailable")
-        
-    
-    def get_owner(self, sitter_id, owner_id):
-        try:
-            with self.Session.begin() as session:
-                if not sitter_id.isdigit():
-                    raise InvalidInputError("sitter_id must be a number")
-                sitter_obj = session.query(Sitter).filter(Sitter.sitter_id == sitter_id).first()
-                if not sitter_obj:
-                    raise NotFoundError("No sitter found")
-                if not owner_id.isdigit():
-                    raise InvalidInputError("owner_id must be a number")
-                owner_obj = session.query(Owner).filter(Owner.owner_id == owner_id, Owner.sitter_id == sitter_id).first()
-                if not owner_obj:
-                    raise NotFoundError("No owner found")
-                owner = to_dict(owner_obj)
-                return owner
-        except OperationalError:
-            raise DatabaseError("Database unavailable")
-        
-    
-    def add_owner(self, sitter_id, new_owner_data):
-        try:
-            with self.Session.begin() as session:
-                if not sitter_id.isdigit():
-                    raise InvalidInputError("sitter_id must be a number")
-                sitter_obj = session.query(Sitter).filter(Sitter.sitter_id == sitter_id).first()
-                if not sitter_obj:
-                    raise NotFoundError("No sitter found")
-                valid_data = OwnerSchema(**new_owner_data)
-                new_owner = Owner(
-                    sitter_id=sitter_id,
-                    first_name=valid_data.first_name,
-                    last_name=valid_data.last_name,
-                    email=valid_data.email,
-                    phone_number=valid_data.phone_number
-                )
-                session.add(new_owner)
-                session.flush()
-                created_owner = to_dict(new_owner)
-                return created_owner
-        except IntegrityError:
-            raise InvalidInputError("Email or phone number already exists")
-        except ValidationError:
-            raise InvalidInputError("Invalid input")
-        except OperationalError:
-            raise DatabaseError("Database unavailable")
-
-
-    def update_owner(self, sitter_id, owner_id, updated_data):
-        try:
-            with self.Session.begin() as session:
-                if not sitter_id.isdigit():
-                    raise InvalidInputError("sitter_id must be a number")
-                sitter_obj = session.query(Sitter).filter(Sitter.sitter_id == sitter_id).first()
-                if not sitter_obj:
-                    raise NotFoundError("No sitter found")
-                if not owner_id.isdigit():
-                    raise InvalidInputError("owner_id must be a number")
-                owner_to_update = session.query(Owner).filter(Owner.owner_id == owner_id, Owner.sitter_id == sitter_id).first()
-                if not owner_to_update:
-                    raise NotFoundError("No owner found")
-                valid_updated_data = UpdateOwnerSchema(**updated_data).model_dump(exclude_unset=True)
-                for key, value in valid_updated_data.items():
-                    setattr(owner_to_update, key, value)
-                updated_owner = to_dict(owner_to_update)
-            return updated_owner
-        except IntegrityError:
-            raise InvalidInputError("Email or phone number already exists")
-        except ValidationError:
-            raise InvalidInputError("Invalid input")
-        except OperationalError:
-            raise DatabaseError("Database unavailable")
-
-
-    def delete_owner(self, sitter_id, owner_id):
-        try:
-            with self.Session.begin() as session:
-                if not sitter_id.isdigit():
-                    raise InvalidInputError("sitter_id must be a number")
-                sitter_obj = session.query(Sitter).filter(Sitter.sitter_id == sitter_id).first()
-                if not sitter_obj:
-                    raise NotFoundError("No sitter found")
-                if not owner_id.isdigit():
-                    raise InvalidInputError("owner_id must be a number")
-                owner_to_delete = session.query(Owner).filter(Owner.owner_id == owner_id, Owner.sitter_id == sitter_id).first()
-                if not owner_to_delete:
-                    raise NotFoundError("No owner found")
-                dogs_to_delete = session.query(Dog).filter(Dog.owner_id == owner_id).all()
-                for dog in dogs_to_delete:
-                    session.delete(dog)
-                session.delete(owner_to_delete)
-                session.commit()
-        except OperationalError:
-            raise DatabaseError("Database unavailable")
-        
-
-    def get_all_dogs(self, sitter_id):
-        try:
-            with self.Session.begin() as session:
-                if not sitter_id.isdigit():
-                    raise InvalidInputError("sitter_id must be a number")
-                sitter_obj = session.query(Sitter).filter(Sitter.sitter_id == sitter_id).first()
-                if not sitter_obj:
-                    raise NotFoundError("No sitter found")
-                dogs_obj = session.query(Dog).join(Owner).filter(Owner.sitter_id == sitter_id).all()
-                if not dogs_obj:
-                    raise NotFoundError("No dogs found")
-                dogs = [to_dict(obj) for obj in dogs_obj]
-                return dogs
-        except OperationalError:
-            raise DatabaseError("Database unavailable")
-        
-
-    def get_dog(self, sitter_id, dog_id):
-        try:
-            with self.Session.begin() as session:
-                if not sitter_id.isdigit():
-                    raise InvalidInputError("sitter_id must be a number")
-                sitter_obj = session.query(Sitter).filter(Sitter.sitter_id == sitter_id).first()
-                if not sitter_obj:
-                    raise NotFoundError("No sitter found")
-                if not dog_id.isdigit():
-                    raise InvalidInputError("dog_id must be a number")
-                dog_obj = session.query(Dog).join(Owner).filter(Dog.dog_id == dog_id, Owner.sitter_id == sitter_id).first()
-                if not dog_obj:
-                    raise NotFoundError("No dog found")
-                dog = to_dict(dog_obj)
-                return dog
-        except OperationalError:
-            raise DatabaseError("Database unavailable")
-
-    
-    def add_dog(self, sitter_id, owner_id, new_dog_data):
-        try:
-            with self.Session.begin() as session:
-                if not sitter_id.isdigit():
-                    raise InvalidInputError("sitter_id must be a number")
-                sitter_obj = session.query(Sitter).filter(Sitter.sitter_id == sitter_id).first()
-                if not sitter_obj:
-                    raise NotFoundError("No sitter found")
-                if not owner_id.isdigit():
-                    raise InvalidInputError("owner_id must be a number")
-                owner_obj = session.query(Owner).filter(Owner.owner_id == owner_id, Owner.sitter_id == sitter_id).first()
-                if not owner_obj:
-                    raise NotFoundError("No owner found")
-                valid_data = DogSchema(**new_dog_data)
-                new_dog = Dog(
-                    chip_id=valid_data.chip_id,
-                    owner_id=owner_id,
-                    name=valid_data.name,
-                    birth_date=valid_data.birth_date,
-                    breed=valid_data.breed,
-                    height=valid_data.height,
-                    weight=valid_data.weight,
-                    food_per_day=valid_data.food_per_day,
-                    gender=valid_data.gender,
-                    castrated=valid_data.castrated,
-                    character=valid_data.character,
-                    sociable=valid_data.sociable,
-                    training=valid_data.training,
-                    img_url=valid_data.img_url
-                )
-                session.add(new_dog)
-                session.flush()
-                created_dog = to_dict(new_dog)
-                return created_dog
-        except IntegrityError:
-            raise InvalidInputError("chip id already exists")
-        except ValidationError:
-            raise InvalidInputError("Invalid input")
-        except OperationalError:
-            raise DatabaseError("Database unavailable")
-    
-
-    def update_dog(self, sitter_id, dog_id, updated_data):
-        try:
-            with self.Session.begin() as session:
-                if not sitter_id.isdigit():
-                    raise InvalidInputError("sitter_id must be a number")
-                sitter_obj = session.query(Sitter).filter(Sitter.sitter_id == sitter_id).first()
-                if not sitter_obj:
-                    raise NotFoundError("No sitter found")
-                if not dog_id.isdigit():
-                    raise InvalidInputError("dog_id must be a number")
-                dog_to_update = session.query(Dog).join(Owner).filter(Dog.dog_id == dog_id, Owner.sitter_id == sitter_id).first()
-                if not dog_to_update:
-                    raise NotFoundError("No dog found")
-                valid_updated_data = UpdateDogSchema(**updated_data).model_dump(exclude_unset=True)
-                for key, value in valid_updated_data.items():
-                    setattr(dog_to_update, key, value)
-                updated_dog = to_dict(dog_to_update)
-            return updated_dog
-        except IntegrityError:
-            raise InvalidInputError("chip id already exists")
-        except ValidationError:
-            raise InvalidInputError("Invalid input")
-        except OperationalError:
-            raise DatabaseError("Database unavailable")
-
-
-    def delete_dog(self, sitter_id, dog_id):
-        try:
-            with self.Session.begin() as session:
-                if not sitter_id.isdigit():
-                    raise InvalidInputError("sitter_id must be a number")
-                sitter_obj = session.query(Sitter).filter(Sitter.sitter_id == sitter_id).first()
-                if not sitter_obj:
-                    raise NotFoundError("No sitter found")
-                if not dog_id.isdigit():
-                    raise InvalidInputError("dog_id must be a number")
-                dog_to_delete = session.query(Dog).join(Owner).filter(Dog.dog_id == dog_id, Owner.sitter_id == sitter_id).first()
-                if not dog_to_delete:
-                    raise NotFoundError("No dog found")
-                session.delete(dog_to_delete)
-                session.commit()
-        except OperationalError:
-            raise DatabaseError("Database unavailable")
-        
-
-    def get_owner_dogs(self, sitter_id, owner_id,):
-        try:
-            with self.Session.begin() as session:
-                if not sitter_id.isdigit():
-                    raise InvalidInputError("sitter_id must be a number")
-                sitter_obj = session.query(Sitter).filter(Sitter.sitter_id == sitter_id).first()
-                if not sitter_obj:
-                    raise NotFoundError("No sitter found")
-                if not owner_id.isdigit():
-                    raise InvalidInputError("owner_id must be a number")
-                owner_obj = session.query(Owner).filter(Owner.owner_id == owner_id).first()
-                if not owner_obj:
-                    raise NotFoundError("No owner found")
-                owner_dogs_obj = session.query(Dog).join(Owner).filter(Owner.owner_id == owner_id, Owner.sitter_id == sitter_id).all()
-                if not owner_dogs_obj:
-                    raise NotFoundError("No dogs found")
-                owner_dogs = [to_dict(obj) for obj in owner_dogs_obj]
-                return owner_dogs
-        except OperationalError:
-            raise DatabaseError("Database unavailable")
+from sqlalchemy import literal_column, func, table, column
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from datahandler.models import Dog, Owner
+from datahandler.sqlalchemy_handler import SQLAlchemyHandler, owner_serializer
+from datahandler.sqlite_engine import create_sqlite_engine
+from datahandler.migrations import run_migrations, SEARCH_INDEXES
+
+
+dogs_search = table('dogs_search', column('rowid'))
+owners_search = table('owners_search', column('rowid'))
+# bm25 column weights: name, breed, character / first_name, last_name, email,
+# phone_number, and 0 for the sitter_id token every match shares
+DOG_SEARCH_WEIGHTS = (10.0, 3.0, 1.0, 0.0)
+OWNER_SEARCH_WEIGHTS = (5.0, 5.0, 2.0, 2.0, 0.0)
+
+
+def search_terms(words):
+    """
+    FTS5 expression for search_words. Words are quoted, so FTS5 syntax in
+    the query is taken literally.
+    """
+    return ' AND '.join(
+        f'"{prefixes[0]}"*' if len(prefixes) == 1 else '(' + ' OR '.join(f'"{prefix}"*' for prefix in prefixes) + ')'
+        for prefixes in words
+    )
+
+
+def search_ranked(search_table, sitter_id, terms, weights):
+    columns = ' '.join(SEARCH_INDEXES[search_table.name][2])
+    name = literal_column(search_table.name)
+    return name.op('MATCH')(f'sitter_id : "{sitter_id}" AND {{{columns}}} : ({terms})'), func.bm25(name, *weights)
+
+
+class SQLiteHandler(SQLAlchemyHandler):
+    """
+    replica_file_names are copies of db_file_name in data/, kept up to date
+    by whatever replicates the file. They are read, never migrated.
+    """
+    def __init__(self, db_file_name, password_hasher=None, engine_profile=None, image_variants=None, replica_file_names=(), replica_selection=None):
+        self.db_file_name = db_file_name
+        super().__init__(
+            create_sqlite_engine(f'sqlite:///data/{db_file_name}', engine_profile),
+            password_hasher=password_hasher,
+            image_variants=image_variants,
+            replica_engines=[create_sqlite_engine(f'sqlite:///data/{replica_file_name}', engine_profile) for replica_file_name in replica_file_names],
+            replica_selection=replica_selection
+        )
+
+
+    def _migrate(self):
+        return run_migrations(self.engine)
+
+
+    def _cascades_deletes(self):
+        with self.engine.connect() as connection:
+            # ON DELETE CASCADE only fires while SQLite enforces foreign keys
+            return connection.exec_driver_sql('PRAGMA foreign_keys').scalar() == 1
+
+
+    def _upsert(self, model):
+        return sqlite_insert(model)
+
+
+    def _begin_snapshot(self, session):
+        # pysqlite sends no BEGIN before a SELECT, so without one every query
+        # reads its own snapshot; the first read after it pins the WAL snapshot
+        session.connection().exec_driver_sql('BEGIN')
+
+
+    def _search_rows(self, session, sitter_id, words, limit, dog_columns):
+        """
+        The FTS5 index finds and ranks only the sitter's matching rows by
+        bm25, which are then read by primary key.
+        """
+        terms = search_terms(words)
+        dogs_match, dogs_rank = search_ranked(dogs_search, sitter_id, terms, DOG_SEARCH_WEIGHTS)
+        dog_rows = (
+            session.query(*dog_columns)
+            .select_from(dogs_search)
+            .join(Dog, Dog.dog_id == dogs_search.c.rowid)
+            .filter(dogs_match)
+            .order_by(dogs_rank, Dog.dog_id)
+            .limit(limit)
+            .all()
+        )
+        owners_match, owners_rank = search_ranked(owners_search, sitter_id, terms, OWNER_SEARCH_WEIGHTS)
+        owner_rows = (
+            session.query(*owner_serializer.columns)
+            .select_from(owners_search)
+            .join(Owner, Owner.owner_id == owners_search.c.rowid)
+            .filter(owners_match)
+            .order_by(owners_rank, Owner.owner_id)
+            .limit(limit)
+            .all()
+        )
+        return dog_rows, owner_rows
 
 
 # create database
@@ -0,0 +1,33 @@
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+JSON_MIMETYPE = 'application/json'
+MSGPACK_MIMETYPES = ('application/msgpack', 'application/x-msgpack')
+# JSON first, so */* and a missing Accept header keep getting JSON
+OFFERED_MIMETYPES = (JSON_MIMETYPE, *MSGPACK_MIMETYPES) if msgpack else (JSON_MIMETYPE,)
+
+
+def negotiate(accept):
+    """
+    Picks the response mimetype for a werkzeug MIMEAccept. msgpack is only
+    offered when the package is installed; anything else falls back to JSON.
+    """
+    return accept.best_match(OFFERED_MIMETYPES, default=JSON_MIMETYPE)
+
+
+def encode(body, mimetype):
+    if mimetype in MSGPACK_MIMETYPES:
+        return msgpack.packb(body)
+    if orjson:
+        return orjson.dumps(body)
+    return json.dumps(body, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
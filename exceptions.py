@@ -5,4 +5,15 @@ class InvalidInputError(Exception):
     pass
 
 class DatabaseError(Exception):
-    pass
\ No newline at end of file
+    pass
+
+class ServiceBusyError(Exception):
+    pass
+
+class TooManyRequestsError(Exception):
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class UnauthorizedError(Exception):
+    pass
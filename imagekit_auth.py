@@ -0,0 +1,135 @@
+import hashlib
+import hmac
+import logging
+import os
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import deque
+
+
+logger = logging.getLogger('pawliday.imagekit_auth')
+
+
+class AuthParamsSigner(ABC):
+    """
+    Signs upload parameters for the ImageKit upload widget: a single-use
+    token and its expiry in unix seconds.
+    """
+    @abstractmethod
+    def sign(self, token, expire):
+        """
+        Returns {"token", "expire", "signature"}, or None when no private
+        key is configured.
+        """
+        pass
+
+
+class ImageKitSigner(AuthParamsSigner):
+    def __init__(self, imagekit):
+        self.imagekit = imagekit
+
+
+    def sign(self, token, expire):
+        return self.imagekit.get_authentication_parameters(token=token, expire=expire)
+
+
+class LocalSigner(AuthParamsSigner):
+    """
+    Stand-in for tests and benchmarks: the same HMAC-SHA1 over token and
+    expiry that imagekitio computes, without the client or real keys.
+    """
+    def __init__(self, private_key='private_test_key'):
+        self.private_key = private_key
+
+
+    def sign(self, token, expire):
+        signature = hmac.new(self.private_key.encode('utf-8'), f"{token}{expire}".encode('utf-8'), hashlib.sha1).hexdigest()
+        return {"token": token, "expire": expire, "signature": signature}
+
+
+class AuthParamsPool:
+    """
+    Hands out pre-signed upload parameters. Tokens are signed in batches of
+    up to `size`, valid for `lifetime` seconds, and each one is served once,
+    oldest first. A token with less than `min_remaining` seconds left is
+    dropped instead of served, so an upload always has that long to start.
+    When the pool falls below half, a background thread tops it up; an empty
+    pool signs a batch inline.
+    """
+    def __init__(self, signer, size=None, lifetime=None, min_remaining=None, clock=time.time):
+        self.signer = signer
+        self.size = size if size is not None else int(os.environ.get('IMAGEKIT_AUTH_POOL_SIZE', 64))
+        # ImageKit rejects an expire more than an hour ahead
+        self.lifetime = lifetime if lifetime is not None else int(os.environ.get('IMAGEKIT_AUTH_LIFETIME', 1800))
+        self.min_remaining = min_remaining if min_remaining is not None else int(os.environ.get('IMAGEKIT_AUTH_MIN_REMAINING', 600))
+        self.clock = clock
+        self.issued = 0
+        self.signed = 0
+        self.expired = 0
+        self.refills = 0
+        self._params = deque()
+        self._lock = threading.Lock()
+        self._refilling = False
+
+
+    def _sign_batch(self, count):
+        expire = int(self.clock()) + self.lifetime
+        batch = [self.signer.sign(str(uuid.uuid4()), expire) for _ in range(count)]
+        return [auth_params for auth_params in batch if auth_params]
+
+
+    def _drop_expiring(self):
+        deadline = self.clock() + self.min_remaining
+        while self._params and self._params[0]["expire"] < deadline:
+            self._params.popleft()
+            self.expired += 1
+
+
+    def take(self):
+        with self._lock:
+            self._drop_expiring()
+            if not self._params:
+                batch = self._sign_batch(max(self.size, 1))
+                self.signed += len(batch)
+                self._params.extend(batch)
+            if not self._params:
+                return None
+            auth_params = self._params.popleft()
+            self.issued += 1
+            start_refill = len(self._params) < self.size // 2 and not self._refilling
+            if start_refill:
+                self._refilling = True
+        if start_refill:
+            threading.Thread(target=self._refill, name='imagekit-auth-refill', daemon=True).start()
+        return auth_params
+
+
+    def _refill(self):
+        try:
+            with self._lock:
+                self._drop_expiring()
+                missing = self.size - len(self._params)
+            # signing runs outside the lock so take() keeps serving meanwhile
+            batch = self._sign_batch(missing) if missing > 0 else []
+            with self._lock:
+                self._params.extend(batch)
+                self.signed += len(batch)
+                self.refills += 1
+        except Exception:
+            logger.exception("refilling the ImageKit auth params pool failed")
+        finally:
+            with self._lock:
+                self._refilling = False
+
+
+    def stats(self):
+        with self._lock:
+            return {
+                "pooled": len(self._params),
+                "issued": self.issued,
+                "signed": self.signed,
+                "expired": self.expired,
+                "refills": self.refills,
+            }
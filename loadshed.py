@@ -0,0 +1,128 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+
+
+class LoadShedder:
+    """
+    Admits at most `max_concurrent` requests at a time; the rest queue for
+    a slot. When the time spent queueing stays above `target` seconds for a
+    whole `interval`, the server is overloaded. New requests then wait at
+    most `target` and are turned away after that, instead of piling up
+    behind a queue that only grows. The first request that gets a slot
+    within `target` ends the overload. Outside an overload a request waits
+    up to `interval`, since waiting longer already means overload.
+    """
+    def __init__(self, max_concurrent=None, target=None, interval=None, clock=time.monotonic):
+        self.max_concurrent = max_concurrent if max_concurrent is not None else int(os.environ.get('LOAD_SHED_MAX_CONCURRENT', 32))
+        self.target = target if target is not None else float(os.environ.get('LOAD_SHED_TARGET_MS', 50)) / 1000
+        self.interval = interval if interval is not None else float(os.environ.get('LOAD_SHED_INTERVAL_MS', 500)) / 1000
+        self.clock = clock
+        self.overloaded = False
+        self.admitted = 0
+        self.shed = 0
+        self.active = 0
+        self._above_target_since = None
+        self._slots = threading.BoundedSemaphore(self.max_concurrent)
+        # (loop, future) of the enter_async calls waiting for a slot
+        self._waiters = deque()
+        self._lock = threading.Lock()
+
+
+    def enter(self):
+        """
+        Waits for a slot. Returns True once the request holds one, to be
+        handed back with leave(), or False when it was shed.
+        """
+        started = self.clock()
+        admitted = self._slots.acquire(timeout=self.target if self.overloaded else self.interval)
+        return self._record(started, self.clock(), admitted)
+
+
+    async def enter_async(self):
+        """
+        enter() for the event loop, sharing the same slots and deadlines.
+        The wait happens on the loop: leave() wakes the longest waiting
+        call, which then tries for the slot again.
+        """
+        started = self.clock()
+        deadline = started + (self.target if self.overloaded else self.interval)
+        loop = asyncio.get_running_loop()
+        while not self._slots.acquire(blocking=False):
+            remaining = deadline - self.clock()
+            if remaining <= 0:
+                return self._record(started, self.clock(), False)
+            waiter = (loop, loop.create_future())
+            with self._lock:
+                self._waiters.append(waiter)
+            try:
+                # a leave() since the failed acquire had nobody to wake
+                if self._slots.acquire(blocking=False):
+                    break
+                await asyncio.wait_for(waiter[1], remaining)
+            except asyncio.TimeoutError:
+                pass
+            except asyncio.CancelledError:
+                if waiter[1].done() and not waiter[1].cancelled():
+                    # woken but never got to the slot, wake the next one instead
+                    self._wake_next()
+                raise
+            finally:
+                with self._lock:
+                    if waiter in self._waiters:
+                        self._waiters.remove(waiter)
+        return self._record(started, self.clock(), True)
+
+
+    def _record(self, started, now, admitted):
+        with self._lock:
+            if now - started < self.target:
+                self._above_target_since = None
+                self.overloaded = False
+            else:
+                if self._above_target_since is None:
+                    self._above_target_since = started
+                if now - self._above_target_since >= self.interval:
+                    self.overloaded = True
+            if admitted:
+                self.admitted += 1
+                self.active += 1
+            else:
+                self.shed += 1
+        return admitted
+
+
+    def leave(self):
+        with self._lock:
+            self.active -= 1
+        self._slots.release()
+        self._wake_next()
+
+
+    def _wake_next(self):
+        with self._lock:
+            waiter = self._waiters.popleft() if self._waiters else None
+        if waiter is not None:
+            loop, woken = waiter
+            loop.call_soon_threadsafe(self._wake, woken)
+
+
+    def _wake(self, woken):
+        if woken.done():
+            # that call already gave up, the slot goes to the next one
+            self._wake_next()
+        else:
+            woken.set_result(None)
+
+
+    def stats(self):
+        with self._lock:
+            return {
+                "max_concurrent": self.max_concurrent,
+                "active": self.active,
+                "admitted": self.admitted,
+                "shed": self.shed,
+                "overloaded": int(self.overloaded),
+            }
@@ -0,0 +1,224 @@
+import contextvars
+import logging
+import os
+import random
+import threading
+from bisect import bisect_left
+from time import perf_counter
+from sqlalchemy import event
+
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+
+
+slow_query_logger = logging.getLogger('pawliday.slow_query')
+_current_request = contextvars.ContextVar('pawliday_request_metrics', default=None)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class RequestMetrics:
+    __slots__ = ('started', 'sampled', 'statements', 'db_seconds', 'stage_seconds')
+
+    def __init__(self, sampled):
+        self.started = perf_counter()
+        self.sampled = sampled
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.stage_seconds = {}
+
+
+class _StageTimer:
+    __slots__ = ('request_metrics', 'stage', 'started')
+
+    def __init__(self, request_metrics, stage):
+        self.request_metrics = request_metrics
+        self.stage = stage
+
+
+    def __enter__(self):
+        self.started = perf_counter()
+
+
+    def __exit__(self, *exc_info):
+        stage_seconds = self.request_metrics.stage_seconds
+        stage_seconds[self.stage] = stage_seconds.get(self.stage, 0.0) + perf_counter() - self.started
+
+
+class _NoTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_NO_TIMER = _NoTimer()
+
+
+def timed(stage):
+    """
+    Adds the time spent in the block to `stage` of the current request.
+    Outside a request, or in a request that was not sampled, this is a
+    no-op that costs one context variable lookup.
+    """
+    request_metrics = _current_request.get()
+    if request_metrics is None or not request_metrics.sampled:
+        return _NO_TIMER
+    return _StageTimer(request_metrics, stage)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, **extra):
+    pairs = list(zip(names, values)) + list(extra.items())
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}' if pairs else ''
+
+
+class Metrics:
+    """
+    In-process request metrics, rendered in the Prometheus text format.
+    Route latency and request counts are recorded for every request. SQL
+    statement counts, DB time, stage timings (validation, bcrypt,
+    serialization) and the slow-query log cover a METRICS_SAMPLE_RATE
+    fraction of requests, so the per-statement hooks can stay enabled in
+    production.
+    """
+    def __init__(self, sample_rate=None, slow_query_seconds=None):
+        self.sample_rate = sample_rate if sample_rate is not None else float(os.environ.get('METRICS_SAMPLE_RATE', 1.0))
+        self.slow_query_seconds = slow_query_seconds if slow_query_seconds is not None else float(os.environ.get('METRICS_SLOW_QUERY_MS', 100)) / 1000
+        self.requests = {}
+        self.latency = {}
+        self.statements = {}
+        self.db_seconds = {}
+        self.stage_seconds = {}
+        self.slow_queries = 0
+        self.stats_sources = {}
+        self._lock = threading.Lock()
+
+
+    def start_request(self):
+        sampled = self.sample_rate >= 1 or random.random() < self.sample_rate
+        return _current_request.set(RequestMetrics(sampled))
+
+
+    def finish_request(self, token, route, method, status):
+        request_metrics = _current_request.get()
+        _current_request.reset(token)
+        elapsed = perf_counter() - request_metrics.started
+        with self._lock:
+            key = (route, method, str(status))
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self._histogram(self.latency, (route, method), LATENCY_BUCKETS).observe(elapsed)
+            if request_metrics.sampled:
+                self._histogram(self.statements, (route,), STATEMENT_BUCKETS).observe(request_metrics.statements)
+                self._histogram(self.db_seconds, (route,), LATENCY_BUCKETS).observe(request_metrics.db_seconds)
+                for stage, seconds in request_metrics.stage_seconds.items():
+                    self._histogram(self.stage_seconds, (route, stage), LATENCY_BUCKETS).observe(seconds)
+
+
+    def discard_request(self, token):
+        _current_request.reset(token)
+
+
+    def _histogram(self, histograms, key, buckets):
+        histogram = histograms.get(key)
+        if histogram is None:
+            histogram = histograms[key] = Histogram(buckets)
+        return histogram
+
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        request_metrics = _current_request.get()
+        if request_metrics is not None and request_metrics.sampled:
+            # one value, not a stack: a connection runs one statement at a
+            # time, and a statement that raised is simply overwritten
+            conn.info['metrics_started'] = perf_counter()
+
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        request_metrics = _current_request.get()
+        started = conn.info.pop('metrics_started', None)
+        if request_metrics is None or not request_metrics.sampled or started is None:
+            return
+        elapsed = perf_counter() - started
+        request_metrics.statements += 1
+        request_metrics.db_seconds += elapsed
+        if elapsed >= self.slow_query_seconds:
+            with self._lock:
+                self.slow_queries += 1
+            slow_query_logger.warning("slow query (%.1f ms): %s", elapsed * 1000, statement)
+
+
+    def register_stats(self, name, source):
+        """
+        Exposes the numeric values of the dict returned by `source()` as
+        pawliday_<name>_<key> gauges, e.g. the cache hit and miss counters.
+        """
+        self.stats_sources[name] = source
+
+
+    def render(self):
+        with self._lock:
+            lines = []
+            self._render_counter(lines, 'pawliday_requests_total', 'Requests by route, method and status', ('route', 'method', 'status'), self.requests)
+            self._render_histograms(lines, 'pawliday_request_duration_seconds', 'Request latency by route', ('route', 'method'), self.latency)
+            self._render_histograms(lines, 'pawliday_request_sql_statements', 'SQL statements per sampled request', ('route',), self.statements)
+            self._render_histograms(lines, 'pawliday_request_db_seconds', 'Time spent executing SQL per sampled request', ('route',), self.db_seconds)
+            self._render_histograms(lines, 'pawliday_request_stage_seconds', 'Time spent in validation, bcrypt and serialization per sampled request', ('route', 'stage'), self.stage_seconds)
+            self._render_counter(lines, 'pawliday_slow_queries_total', f'Statements slower than {self.slow_query_seconds * 1000:g} ms', (), {(): self.slow_queries})
+            lines.append('# HELP pawliday_metrics_sample_rate Fraction of requests with SQL and stage instrumentation')
+            lines.append('# TYPE pawliday_metrics_sample_rate gauge')
+            lines.append(f'pawliday_metrics_sample_rate {self.sample_rate}')
+        for name, source in self.stats_sources.items():
+            for key, value in source().items():
+                if isinstance(value, (int, float)):
+                    lines.append(f'# TYPE pawliday_{name}_{key} gauge')
+                    lines.append(f'pawliday_{name}_{key} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+    def _render_counter(self, lines, name, help_text, label_names, values):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} counter')
+        for label_values, value in sorted(values.items()):
+            lines.append(f'{name}{_labels(label_names, label_values)} {value}')
+
+
+    def _render_histograms(self, lines, name, help_text, label_names, histograms):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} histogram')
+        for label_values, histogram in sorted(histograms.items()):
+            cumulative = 0
+            for bucket, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{_labels(label_names, label_values, le=f"{bucket:g}")} {cumulative}')
+            lines.append(f'{name}_bucket{_labels(label_names, label_values, le="+Inf")} {histogram.count}')
+            lines.append(f'{name}_sum{_labels(label_names, label_values)} {histogram.sum}')
+            lines.append(f'{name}_count{_labels(label_names, label_values)} {histogram.count}')
+
+
+metrics = Metrics()
+
+
+def instrument_engine(engine):
+    event.listen(engine, 'before_cursor_execute', metrics.before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', metrics.after_cursor_execute)
@@ -0,0 +1,169 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+
+class MemoryBucketStore:
+    """
+    Token buckets in this process. Only the `max_keys` most recently seen
+    keys keep a bucket, so a flood of distinct clients costs bounded memory;
+    an evicted client simply starts over with a full bucket.
+    """
+    def __init__(self, max_keys=None, clock=time.monotonic):
+        self.max_keys = max_keys if max_keys is not None else int(os.environ.get('RATE_LIMIT_MAX_KEYS', 10000))
+        self.clock = clock
+        self.evictions = 0
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+
+    def take(self, key, rate, burst):
+        """
+        Takes a token from `key`'s bucket. Returns 0 when there was one,
+        otherwise the seconds until the next token.
+        """
+        with self._lock:
+            now = self.clock()
+            tokens, updated = self._buckets.pop(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            if tokens >= 1:
+                tokens -= 1
+                retry_after = 0
+            else:
+                retry_after = (1 - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+                self.evictions += 1
+            return retry_after
+
+
+    def stats(self):
+        with self._lock:
+            return {"clients": len(self._buckets), "evictions": self.evictions}
+
+
+# the same bucket as MemoryBucketStore.take, on the server's clock so hosts
+# with skewed clocks agree; idle buckets expire once they would be full again
+TAKE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(bucket[1]) or burst
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local retry_after = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    retry_after = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(retry_after)
+"""
+
+
+class RedisBucketStore:
+    """
+    Token buckets in Redis, shared by every worker and host, so a client's
+    limit no longer multiplies with the number of processes. Needs
+    `pip install redis`. While Redis is unreachable requests are let through
+    and counted as errors, so the limiter never takes the API down with it.
+    """
+    def __init__(self, url, prefix='pawliday:ratelimit:'):
+        if redis is None:
+            raise RuntimeError("RATE_LIMIT_REDIS_URL needs `pip install redis`")
+        self.client = redis.Redis.from_url(url, socket_timeout=0.05, socket_connect_timeout=0.05)
+        self.prefix = prefix
+        self.errors = 0
+        self._take = self.client.register_script(TAKE_SCRIPT)
+
+
+    def take(self, key, rate, burst):
+        try:
+            return float(self._take(keys=[self.prefix + ':'.join(map(str, key))], args=[rate, burst]))
+        except redis.RedisError:
+            self.errors += 1
+            return 0
+
+
+    def stats(self):
+        return {"errors": self.errors}
+
+
+class RateLimiter:
+    """
+    A token bucket per client key: `burst` requests at once, refilled at
+    `rate` per second. Buckets live in `store`, by default a
+    MemoryBucketStore of this limiter's own; limiters sharing a store are
+    told apart by `name`.
+    """
+    def __init__(self, rate, burst, max_keys=None, clock=time.monotonic, store=None, name=''):
+        self.rate = rate
+        self.burst = burst
+        self.store = store if store is not None else MemoryBucketStore(max_keys, clock)
+        self.name = name
+        self.allowed = 0
+        self.limited = 0
+        self._lock = threading.Lock()
+
+
+    def acquire(self, key):
+        """
+        Takes a token from `key`'s bucket. Returns 0 when the request may
+        go ahead, otherwise the seconds until the next token.
+        """
+        retry_after = self.store.take((self.name, key), self.rate, self.burst)
+        with self._lock:
+            if retry_after:
+                self.limited += 1
+            else:
+                self.allowed += 1
+        return retry_after
+
+
+    def stats(self):
+        with self._lock:
+            return {**self.store.stats(), "allowed": self.allowed, "limited": self.limited}
+
+
+class RouteRateLimits:
+    """
+    The rate limits of each route, as (scope, RateLimiter) pairs keyed by
+    the route rule, e.g. '/api/login'. Scope 'ip' buckets by client address,
+    'sitter' by the logged-in sitter and is skipped for anonymous requests.
+    Routes without an entry get `default`; listing a route with no limits
+    exempts it. One limiter used for several routes shares its buckets
+    between them.
+    """
+    def __init__(self, limits, default=()):
+        self.limits = limits
+        self.default = default
+
+
+    def scopes(self, route):
+        return {scope for scope, _ in self.limits.get(route, self.default)}
+
+
+    def acquire(self, route, client_ip, sitter_id=None):
+        """
+        Returns 0 when every bucket of the route had a token, otherwise the
+        wait the first empty one asks for. Buckets after it are left alone,
+        so a denied request does not also drain the route's other limits.
+        """
+        for scope, limiter in self.limits.get(route, self.default):
+            key = client_ip if scope == 'ip' else sitter_id
+            if key is not None:
+                retry_after = limiter.acquire(key)
+                if retry_after:
+                    return retry_after
+        return 0